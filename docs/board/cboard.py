@@ -19,6 +19,7 @@ import math
 import numpy as np
 import random 
 import copy 
+import types
 from typing import NamedTuple
 # import inspect
 # import cairo 
@@ -31,6 +32,9 @@ import kwargs as kw
 import crtool as crt
 import loggable as log 
 import backupcaller as bc
+import displaylist as dl
+import colormap as cm
+import geometry as geo
 
 # DEFAULT_PPI = 720 
 # DEFAULT_LINE_WIDTH = 1 
@@ -41,6 +45,7 @@ import backupcaller as bc
 ## PARAMS 2022 version
 EMPTY_RECT = (0.0, 0.0, 0.0, 0.0)
 MYCOLS = list(crt.DARKCOL.values())
+DEPTH_COLORMAP = cm.get_colormap('dark') #深さごとの色．MYCOLSと同じ色の分類の色地図
 #MYCOLS = list(crt.MYCOL.values())
 DEFAULT_LINE_WIDTH=1
 
@@ -51,6 +56,16 @@ DEFAULT_LINE_WIDTH=1
 # CMD_MOVE = 0
 # CMD_LINE = 1
 
+## 描画の走査の命令
+DRAW_ENTER = 0
+DRAW_EXIT  = 1
+
+## 描画の間引き: 描画リストの再生での包含矩形の余白．包含矩形の外側に描かれる線幅やマーカーの分を見込む．
+DRAW_CULL_MARGIN = 16.0 * DEFAULT_LINE_WIDTH
+
+## 格子の配置表の初期容量
+GRID_INIT_CAPACITY = 16
+
 def numpair_normalize(margin=None, default=None):
     """マージン指定を正規化する．margin が数の対(float,float)ならばそのまま返し，
     margin が数ならば，(margin,margin)を返す．
@@ -111,7 +126,7 @@ def pair_normalize(pair=None):
 #=====
 # class Board(com.Loggable):
 class BoardBase(log.Loggable):
-    """図形（Board）の描画に関する基本機能を提供するクラス．子孫クラスから呼び出される二つの私的関数`_arrange()`と`_draw(self, cr)`を提供する．
+    """図形（Board）の描画に関する基本機能を提供するクラス．子孫クラスから呼び出される配置関数`_arrange()`と，描画リストを作る関数`compile()`を提供する．
 
     Args: 
          anchor_str (str, tuple(str,str)) : 文字列対によるアンカー表記．それ自体が`None`でも良いし，対の片方または両方の要素が`None`を取っても良い．
@@ -129,10 +144,16 @@ class BoardBase(log.Loggable):
 
          anchor (tuple(float,float)) : 正規化アンカーベクトル `a = (ax,ay) in [0,1]^2`．配置時点での包含矩形に対する原点の相対位置を表す．
 
+         arranged_shape_ (tuple(float,float)) : 前回の配置で親から受け取った形状．変更がなく同じ形状で呼ばれた配置は，保持する配置情報を再利用する．
+
+         measure_cache_ (dict) : 形状をキーとして，その形状での配置で得た包含矩形を保持する辞書．関数`_measure()`が用いる．
+
+         show_origin_, show_box_ (bool) : 生成時に`kwargs`から解決した，原点と包含矩形のデバッグ表示のフラグ．
+
          verbose (bool): ログ出力のフラグ
 
     Notes: 
-          本クラスでは，主ループとして，配置関数`_arrange()`と描画関数`_draw(self, cr)`を提供し，子孫クラスにおいて，これらの以下のサブメソッドを実装することで，独自の振る舞いを定義する．
+          本クラスでは，主ループとして，配置関数`_arrange()`と描画リストを作る関数`compile()`を提供し，子孫クラスにおいて，これらの以下のサブメソッドを実装することで，独自の振る舞いを定義する．
 
          * 関数`_arrange()`のサブメソッド
 
@@ -140,12 +161,18 @@ class BoardBase(log.Loggable):
 
              * `arrange_box_self(self)`: 子全体の包含矩形`self.boxes`と修飾情報(modifiers)から自身の包含矩形を求める．ボードは，修飾情報として，余白やアンカー点の情報をもつ．
 
-         * 関数`_draw()`のサブメソッド: 
+         * 描画のサブメソッド（関数`compile_me_before()`などが，描画リストの代替の命令として呼び出す）: 
 
              * `draw_me_before(self, cr)`: Cairoの文脈オブジェクト`cr`を受け取り，子の描画の前に，自身を描画する手続きを定義する．
 
              * `draw_me_after(self, cr)`: Cairoの文脈オブジェクト`cr`を受け取り，子の描画の後に，自身を描画する手続きを定義する．
 
+         * 関数`compile()`のサブメソッド: 
+
+             * `compile_me_before(self, dlist, ox, oy)`: 描画リスト`dlist`を受け取り，`draw_me_before()`に相当する描画命令を追加する．既定では，`draw_me_before()`の呼び出しを代替の命令として追加する．
+
+             * `compile_me_after(self, dlist, ox, oy)`: 同様に，`draw_me_after()`に相当する描画命令を追加する．
+
     Note: 
 
         アンカー表記の対の要素に`None`を許す．
@@ -185,6 +212,11 @@ class BoardBase(log.Loggable):
         self.trans : crt.GeoTransform = None #自身の変換
         self.box   = None #自身の包含矩形.
         self.boxes = None #子全体の包含矩形.
+        self.arranged_shape_ = None #前回の配置の引数shape
+        self.measure_cache_ = {}    #形状ごとの計測結果（包含矩形）
+        self.world_ = None          #包含矩形の空間から根の空間への変換行列（キャッシュ）
+        self.show_origin_ : bool = kw.get(self.kwargs, key='show_origin', default=False)
+        self.show_box_ : bool = kw.get(self.kwargs, key='show_box', default=False)
         
         if self.verbose:
             self.repo(msg=f'{self.myinfo()}.__init__(): { self.vars() }')
@@ -194,11 +226,11 @@ class BoardBase(log.Loggable):
     # 雑関数
     #=====
 
-    def get_box(self) -> 'tuple(float,float,float,float)':
+    def get_box(self) -> com.Box:
         """保持する自身の包含矩形を返す．
 
         Returns: 
-             (tuple(float,float,float,float)) : 自身の包含矩形．親による自身の配置を規定する．
+             (com.Box) : 自身の包含矩形．親による自身の配置を規定する．配置の後は，検査済みの矩形の型`com.Box`である．
         """
         # _box = self.box 
         com.ensure_box(self.box, name='self.box', nullable=False)
@@ -247,37 +279,91 @@ class BoardBase(log.Loggable):
         Returns: 
              (Board) : 自分自身を返す．
         """
-        self.shape = com.ensure_point(shape, name='shape', nullable=is_nullable)
+        self.shape = com.to_shape(shape, name='shape', nullable=is_nullable)
+        self.mark_dirty() #再配置が必要
         return self 
     
     # exp 基本：配置の計算
     # def _arrange(self):
     def _arrange(self, shape=None):
-        """配置を計算する．配置は，ボトムアップに再帰的に計算される．
+        """配置を計算する．配置は，ボトムアップに計算される．
+        木の深さによらず再帰呼び出しを用いないように，配置タスク`_arrange_task()`を，関数`log.run_task()`で実行する．
 
         Returns: 
         	rect: 計算済みの自身の包含矩形オブジェクト
+
+        Note: 
+            前回の配置以降に自身と子孫に変更がなく（`is_dirty()==False`），同じ形状`shape`で呼ばれたときは，再計算せずに，保持する配置情報`box`, `boxes`, `trans`をそのまま用いる．
+        """
+        return log.run_task(self._arrange_task(shape=shape))
+
+    def _measure(self, shape=None):
+        """形状`shape`で配置したときの自身の包含矩形を返す．
+        同じ形状での計測結果を保持していれば，配置を行わずにそれを返す．
+
+        Args: 
+             shape (tuple(float,float)) : 親から受け取る形状．default=None. 
+
+        Returns: 
+        	rect: 自身の包含矩形
+
+        Note: 
+            関数`_arrange()`と異なり，計測結果を再利用した場合は，自身と子孫の配置情報（`box`, `trans`など）を計測した形状のものに戻さない．よって，計測の後には，描画に用いる形状で`_arrange()`を呼ぶこと．
+        """
+        return log.run_task(self._measure_task(shape=shape))
+
+    def _arrange_task(self, shape=None):
+        """関数`_arrange()`の本体である配置タスク．子の配置は，部分タスク`child._arrange_task()`を`yield`して，後順に行う．
+
+        Note: 
+            サブメソッド`_arrange_apply_children()`と`arrange_box_children()`は，子の配置を要するならばタスク（ジェネレータ）として書き，そうでなければふつうの関数として書く．どちらの場合も，本タスクから呼ばれる．
         """
+        _shape_key = None if shape==None else tuple(shape)
+        if (not self.dirty_ and self.box != None and
+            _shape_key == self.arranged_shape_):
+            return self.box #変更なし: 前回の配置を再利用する
+        if self.dirty_:
+            self.measure_cache_.clear() #変更あり: 計測結果を捨てる
+        
         if self.verbose:
             self.repo(msg=f'@debug0@{self.myinfo()}._arrange(shape={shape}): { self.vars() }')
         if self.shape==None: 
             self.shape = shape #exp
 
-        #子の配置情報を再帰的に得る
-        self._arrange_apply_children(shape=shape)
+        #子の配置情報を得る
+        _task = self._arrange_apply_children(shape=shape)
+        if isinstance(_task, types.GeneratorType):
+            yield from _task
                 
         #子供全てを再配置する．
-        self.arrange_box_children()
+        _task = self.arrange_box_children()
+        if isinstance(_task, types.GeneratorType):
+            yield from _task
             
         #注意：関数arrange_self_transformはサブクラスでオーバーライドする
         self.arrange_box_self()
 
         if False: print(f'@debug:trans:{self.myinfo()}: trans={self.trans}')
-        com.ensure(self.box != None, f'self.box={self.box} != None!')
+        #一度だけ検査して矩形の型にする．以降の検査は型により省かれる．
+        self.box = com.to_box(self.box, name='self.box', nullable=False)
+
+        #配置済みとして記録する
+        self.arranged_shape_ = _shape_key
+        self.measure_cache_[_shape_key] = self.box
+        self.dirty_ = False
         return self.box 
 
+    def _measure_task(self, shape=None):
+        """関数`_measure()`の本体である計測タスク．
+        """
+        _shape_key = None if shape==None else tuple(shape)
+        if not self.dirty_ and _shape_key in self.measure_cache_:
+            return self.measure_cache_[_shape_key]
+        box = yield self._arrange_task(shape=shape)
+        return box
+
     def _arrange_apply_children(self, shape=None):
-        """自身の子すべてに対して，再帰的に配置を行う．
+        """自身の子すべてに対して，配置を行うタスク．
         次の属性を操作する: 
 
         * self.children_: 読み出し
@@ -286,8 +372,7 @@ class BoardBase(log.Loggable):
             trans, child = pair_normalize(pair)
             if self.verbose: self.repo(msg=f'=> call _arrange(shape={shape}) on {idx}-th child={child.myinfo()}', is_child=True, header=False)
             
-            child._arrange(shape=shape) #再帰的に子の配置を実行
-            # child._arrange() #再帰的に子の配置を実行
+            yield child._arrange_task(shape=shape) #子の配置を実行
             
             com.ensure(child.get_box() != None,
                        f'child.get_box()={child.get_box()} != None')
@@ -304,18 +389,20 @@ class BoardBase(log.Loggable):
             * 読み出し: `self.children_`
             * 書き込み: `self.boxes` (非None) 
         """
-        _boxes = EMPTY_RECT
+        _transes, _cboxes = [], []
         for idx, pair in self.children_enumerated(): 
             trans, child = pair_normalize(pair)
-            
-            #自身の包含矩形の更新
-            box = child.get_box()
+            box = child.box
             com.ensure(box != None, f'child.get_box()={box} != None')
-            
-            box = crt.box_apply_trans(box, trans=trans)
-            _boxes = crt.box_union(_boxes, box) #包含矩形の更新
+            _transes.append(trans)
+            _cboxes.append(box)
+
+        #自身の包含矩形の更新: 子の包含矩形を一括して変換し，原点との和をとる
+        _cboxes = geo.as_boxes(_cboxes, name='child boxes')
+        _tboxes = geo.boxes_transform(_cboxes, geo.trans_matrices(_transes))
+        _boxes = geo.boxes_union(_tboxes, initial=EMPTY_RECT)
         
-        self.boxes = com.ensure_box(_boxes, name='_boxes', nullable=False)
+        self.boxes = com.to_box(_boxes, name='_boxes', nullable=False)
         if self.verbose:
             self.repo(msg=f'{self.myinfo()}.arrange_box_children()=> box={ self.boxes }', is_child=True)
         return 
@@ -337,51 +424,141 @@ class BoardBase(log.Loggable):
         
 
     #=====
-    # 描画
+    # 描画リスト
+    #=====
+    def compile(self) -> dl.DisplayList:
+        """配置済みの自身と子孫を平坦化して，描画リスト（display list）を返す．
+        描画リストの再生`dlist.replay(cr)`が，木の描画を行う．
+
+        Returns: 
+             (dl.DisplayList) : 描画リスト
+
+        Note: 
+            走査では，変換を変換行列として合成して，各ボードの変換行列`world_`をキャッシュする．平行移動だけの部分木では，描画命令の座標を自身の空間の絶対座標に直すので，恒等変換，ラッパー，空のボードは，描画リストに何も残さない．回転や拡大縮小をもつ部分木では，変換行列の命令を描画リストに加える．
+        """
+        com.ensure(self.box != None, f'{self.myinfo()}.compile(): must be arranged before compile!')
+        dlist = dl.DisplayList()
+        for op, board, matrix, inner in self._world_traversal():
+            if op == DRAW_ENTER:
+                board.compile_me_before(dlist, *dlist.set_matrix(inner))
+            else: 
+                board.compile_me_after(dlist, *dlist.set_matrix(inner))
+                board.compile_origin_and_box(dlist, *dlist.set_matrix(matrix))
+        return dlist
+
+    def _world_traversal(self):
+        """自身と子孫を前順に走査し，変換行列を合成しながら，四つ組`(op, board, matrix, inner)`を生成する．各ボードの変換行列`world_`を更新する．
+        `op`は`DRAW_ENTER`または`DRAW_EXIT`，`matrix`はボードの包含矩形の空間から根の空間への変換行列，`inner`はそれに自身の変換を合成した変換行列である．
+        """
+        stack = [(DRAW_ENTER, self, crt.MATRIX_IDENTITY)]
+        while stack:
+            op, board, matrix = stack.pop()
+            ## 自身の変換を合成する
+            inner = crt.matrix_multiply(matrix, crt.trans_matrix(board.get_trans()))
+            if op == DRAW_ENTER:
+                board.world_ = matrix #変換行列をキャッシュする
+                stack.append((DRAW_EXIT, board, matrix))
+                yield op, board, matrix, inner
+                
+                #子を逆順に積み，先頭の子から走査する
+                _pairs = []
+                for idx, pair in board.children_enumerated():
+                    trans1, child = pair #分解
+                    if not isinstance(child, BoardBase):
+                        com.panic(f'{board.myinfo()}.compile: child must be a subclass of'+
+                                  f' BoardBase!: {child}: children_={board.children_}')
+                    _pairs.append((DRAW_ENTER, child,
+                                   crt.matrix_multiply(inner, crt.trans_matrix(trans1))))
+                stack.extend(reversed(_pairs))
+            else: 
+                yield op, board, matrix, inner
+        return
+
+    #=====
+    # 根の空間での位置
     #=====
-    def _draw(self, cr):
-        """トップダウンに画像を描画する．
+    def update_world(self):
+        """自身を根とみなして，自身と子孫の変換行列`world_`を更新する．
+        配置の後に関数`compile()`を呼べば，同時に更新されるので，呼ぶ必要はない．
+        """
+        for _ in self._world_traversal():
+            pass
+        return
+
+    def get_world_matrix(self) -> tuple:
+        """自身の包含矩形の空間から根の空間への変換行列を返す．
+        変換の連鎖をたどらず，キャッシュされた行列を返す．未計算ならば，根から一度だけ計算する．
+
+        Returns: 
+             (tuple) : 変換行列`(xx, yx, xy, yy, x0, y0)`．関数`crt.matrix_multiply()`を参照のこと．
+
+        Note: 
+            キャッシュは，直近の関数`compile()`または`update_world()`の時点の配置に対するものである．
+        """
+        if self.world_ == None:
+            root = self
+            while isinstance(root.parent, BoardBase):
+                root = root.parent
+            root.update_world()
+        return self.world_
+
+    def get_world_box(self) -> tuple:
+        """自身の包含矩形を根の空間に写した像の包含矩形を返す．
+        """
+        return crt.matrix_apply_box(self.get_world_matrix(), self.get_box())
+
+    def boards_at(self, x, y) -> list:
+        """根の空間の点`(x, y)`を包含矩形に含む，自身と子孫のボードのリストを，前順（先祖が先）に返す．
+        各ボードのキャッシュされた変換行列の逆行列で点を写して判定するので，変換の連鎖はたどらない．
 
         Args: 
-             trans (crt.GeoTransform) : 空間変換
+             x, y (float) : 根の空間の点
 
-             pm0 (pim.ImageBoard) : 基本描画のプリミティブボード
+        Returns: 
+             (list(BoardBase)) : ボードのリスト．最後の要素が最も深いボードである．
         """
-        if self.verbose:
-            self.repo(is_child=True, msg=f'{self.myinfo()}._draw(): { self.vars() }')
-            
-        ## 自分の空間を開く
-        cr.save()  ##self
-        ## 自身の変換を適用する
-        crt.cr_apply_trans(trans=self.get_trans(), context=cr)
-        if True: print(f'@debug5:draw:self:{self.myinfo()}: apply trans={self.get_trans()}')
-            
-        #必要なら自分の描画を行う
-        self.draw_me_before(cr)
-        
-        #子の描画を行う
-        for idx, pair in self.children_enumerated():
-            trans, child = pair #分解
-            
-            #子の型チェック
-            com.ensure(isinstance(child, BoardBase),
-                       f'{self.myinfo()}.draw: child must be a subclass of'+
-                       f' BoardBase!: {child}: children_={self.children_}')
-            
-            cr.save()    ## 子の空間を開く
-            crt.cr_apply_trans(trans=trans, context=cr) ## 変換を適用する
-            if False: print(f'- @debug:draw:child:{child.myinfo()}: apply trans={trans}')
-            child._draw(cr)
-            cr.restore() ## 子の空間を閉じる
+        self.get_world_matrix()
+        _boards = []
+        stack = [self]
+        while stack:
+            board = stack.pop()
+            if board.box == None or board.world_ == None:
+                continue
+            bx, by = crt.matrix_apply_point(crt.matrix_invert(board.world_), x, y)
+            x0, y0, x1, y1 = board.box
+            if x0 <= bx <= x1 and y0 <= by <= y1:
+                _boards.append(board)
+                stack.extend(reversed([ child for _, (_, child) in board.children_enumerated() ]))
+        return _boards
+
+    def compile_me_before(self, dlist, ox, oy):
+        """関数`draw_me_before()`に相当する描画命令を描画リスト`dlist`に追加する．子孫クラスでオーバーライドすること．
 
-        #必要なら自分の描画を行う
-        self.draw_me_after(cr)
+        Args: 
+             dlist (dl.DisplayList) : 描画リスト
 
-        ## 自分の空間を閉じる
-        cr.restore()  ##self
+             ox, oy (float) : 自身の空間の原点の絶対座標
+        """
+        if type(self).draw_me_before is not BoardBase.draw_me_before:
+            dlist.add_call(self.draw_me_before, ox, oy, box=self.get_world_box())
+        return 
 
-        ## debug: 包含矩形を描画する
-        self.draw_origin_and_box(cr) #自分の原点位置と包含矩形を描画する．
+    def compile_me_after(self, dlist, ox, oy):
+        """関数`draw_me_after()`に相当する描画命令を描画リスト`dlist`に追加する．子孫クラスでオーバーライドすること．
+        """
+        if type(self).draw_me_after is not BoardBase.draw_me_after:
+            dlist.add_call(self.draw_me_after, ox, oy, box=self.get_world_box())
+        return 
+
+    def compile_origin_and_box(self, dlist, ox, oy):
+        """デバッグ表示があれば，関数`draw_origin_and_box()`の呼び出しを描画リスト`dlist`に追加する．
+        """
+        if (self.fetch(key='boundingbox', default=False) or
+            self.show_origin_ or self.show_box_):
+            #原点のマーカーは包含矩形の外にありうるので，原点も含める
+            box = crt.box_union(self.get_box(), com.Box(0.0, 0.0, 0.0, 0.0))
+            dlist.add_call(self.draw_origin_and_box, ox, oy,
+                           box=crt.matrix_apply_box(self.get_world_matrix(), box))
         return
 
     # 派生：Override
@@ -426,7 +603,7 @@ class BoardBase(log.Loggable):
             self.draw_perturbed_box(self.get_box(), context=cr)
             
         #自分の原点位置をマーカーで描画する．
-        if kw.get(self.kwargs, key='show_origin', default=False):
+        if self.show_origin_:
             rgb = kw.get(self.kwargs, key='rgb_origin',
                          default=crt.MYCOL['red'])
             angle = kw.get(self.kwargs, key='angle_origin',
@@ -435,7 +612,7 @@ class BoardBase(log.Loggable):
                                      linewidth=0.5, angle=angle, 
                                      rgb=crt.cr_add_alpha(rgb, alpha=0.5))
         #自分の包含矩形を描画する．
-        if kw.get(self.kwargs, key='show_box', default=False):
+        if self.show_box_:
             rgb = kw.get(self.kwargs, key='rgb_box',
                          default=crt.MYCOL['green'])
             (x0, y0, x1, y1) = self.get_box()
@@ -454,12 +631,11 @@ class BoardBase(log.Loggable):
         x, y = box[0], box[1]
         width, height=(box[2]-box[0]), (box[3]-box[1])
         ## 色を選ぶ
-        rgb = MYCOLS[0]  ## 色
+        rgb = DEPTH_COLORMAP.color(0)  ## 色
         rgb_alpha = 0.25 ## 色の透明度
         # rgb_alpha = 0.5
         if self.depth: 
-            rgb = MYCOLS[self.depth % len(MYCOLS)]  ## 色
-            rgb = (rgb[0], rgb[1], rgb[2], rgb_alpha)
+            rgb = DEPTH_COLORMAP.color(self.depth, alpha=rgb_alpha)  ## 色
         else:
             if self.verbose: print(f'debug: self.depth=None at { self.myinfo() }')
         ## 位置を微小変動させる
@@ -554,7 +730,10 @@ class WrapperBoard(BoardBase):
     def __getattr__(self, name):
         """メソッドが未定義のとき，呼び出される特殊関数．
 		未定義の属性呼び出しのときも呼ばれるので注意．
+		特殊名（`__xxx__`）と，転送先`the_child`の設定前（pickleの復元中など）には転送せず，AttributeErrorを送出する．
         """
+        if (name.startswith('__') and name.endswith('__')) or 'the_child' not in self.__dict__:
+            raise AttributeError(name)
         if self.verbose:
             print(f'\t@WrapperBoard:{self.myinfo()}.__getattr__() is called with method="{name}" ')
         return bc.BackupCaller(self.the_child, name, verbose=False)
@@ -563,7 +742,7 @@ class WrapperBoard(BoardBase):
     # 子のリスト
     #=====
     def _arrange_apply_children(self, shape=None):
-        """自身の子すべてに対して，再帰的に配置を行う．オーバーライド．
+        """唯一の子に対して，配置を行うタスク．オーバーライド．
         次の属性を操作する: 
 
         * self.children_: 読み出し
@@ -579,7 +758,7 @@ class WrapperBoard(BoardBase):
             self.shape = shape #exp
         #self.shape = shape
         shape_child = self.box_propagate_downward(shape=shape)
-        child._arrange(shape=shape_child) #再帰的に子の配置を実行
+        yield child._arrange_task(shape=shape_child) #子の配置を実行
         
         com.ensure_box(child.get_box(), name='child.get_box()', nullable=False)
         return 
@@ -851,9 +1030,9 @@ class Canvas(PlaceBoard):
     Args: 
           imgtype (cairo.Format) : Surfaceフォーマット (default: cairo.FORMAT_ARGB32)
 
-          format (str) : 出力ファイルフォーマット（拡張子 pdf, png）default: "pdf"
+          format (str) : 出力ファイルフォーマット（pdf, png, svg, ps）default: "pdf"
 
-          outfile (str) : 出力ファイル名（拡張子を除く）default: "out"
+          outfile (str, file-like) : 出力ファイル名（拡張子を除く），または，出力先のファイル風オブジェクト．default: "out"
 
           imagesize (str) : 初期の画像サイズ. default: 'XGA'        
 
@@ -864,6 +1043,10 @@ class Canvas(PlaceBoard):
           boundingbox (bool)  : デバッグ用: 包含矩形のデバッグ出力をする
 
           max_perturb (float) : デバッグ用: 包含矩形の摂動幅
+
+          culling (bool) : 描画領域の外にあるボードの描画を省くかのフラグ．default=True.
+
+          validation (str) : 配置と描画リストの生成における検査の水準．`com.VALIDATION_MODES`のいずれか．default=None. Noneならば，プロセス全体の水準（関数`com.set_validation_mode()`）に従う．
     """
     # background (string): 背景色．デバッグ用．default='skyblue', #debug
     def __init__(self,
@@ -877,6 +1060,8 @@ class Canvas(PlaceBoard):
                  ## for debugging
                  boundingbox=False, #デバッグ用: 包含矩形のデバッグ出力をする
                  max_perturb=None,  #デバッグ用: 
+                 culling=True,      #描画領域の外のボードを省く
+                 validation=None,   #検査の水準
                  **kwargs):
         """トップレベルのボードを生成する．描画のためのCairoのSurfaceを保持する．
         """
@@ -890,22 +1075,23 @@ class Canvas(PlaceBoard):
         self.portrait  = portrait
         self.boundingbox = boundingbox #fetchで子孫からアクセス
         self.max_perturb : float = max_perturb #fetchで子孫からアクセス
+        self.culling : bool = culling #描画リストの再生replay()に渡す
+        self.validation : str = validation
+        self.display_list_ : dl.DisplayList = None #前回の描画リスト
+        self.recording_ = None      #前回の記録面．関数record()が作る
+        self.recorded_list_ = None  #記録面の元になった描画リスト
         # self.show_origin = show_origin #fetchで子孫からアクセス
         verbose = kw.get(kwargs, key='verbose', default=False)
         com.ensure(self.format, f'format must be defined!')
+        com.ensure(validation == None or validation in com.VALIDATION_MODES,
+                   f'validation={validation} must be one of {com.VALIDATION_MODES}!')
 
         ##属性
-        self.im  = None   #基礎画像オブジェクト．遅延生成
+        self.im  = None   #基礎画像オブジェクト．show()またはcontext()で遅延生成する
         # self.display_shape = None
 
-        #画像サイズが決まっていれば，画像オブジェクトを生成する．
-        #そうでなければ，配置完了後にshow()中で計算する．
-        if self.imagesize: 
-            if False: print(f'@debug:create_image_object: {self.myinfo(depth=True)}.__init__()')
-            ##画像サイズの設定
-            _display_shape = crt.get_display_shape(shape=self.imagesize, portrait=self.portrait)
-            if _display_shape:
-                self.im = self.create_image_object(_display_shape)
+        #画像オブジェクトは，ここでは生成しない．出力先`outfile`の面を開いてしまうため．
+        #画像サイズは，関数_display_shape()が`imagesize`または配置の包含矩形から求める．
         
         if verbose: 
             self.repo(msg=f'{self.myinfo()}.__init__(): vars={ self.vars() }')
@@ -934,6 +1120,28 @@ class Canvas(PlaceBoard):
     def canvas_size(self) -> 'tuple(int, int)':
         return self.display_shape
 
+    def _update_display_list(self) -> tuple:
+        """配置を計算し，変更があれば描画リストを作り直す．包含矩形を返す．検査の水準`self.validation`の下で行う．
+        """
+        _is_changed = self.is_dirty() or self.display_list_ == None
+        with com.validation_mode(self.validation):
+            box = self._arrange(shape=None)
+            com.ensure(box, 'box={box} must be defined!')
+            if _is_changed:
+                self.display_list_ = self.compile()
+        return box
+
+    def _display_shape(self, box) -> tuple:
+        """画像サイズを返す．画像サイズが未定ならば，包含矩形`box`から求める．
+        """
+        if self.im != None: 
+            return self.im.display_shape
+        if self.imagesize: 
+            _display_shape = crt.get_display_shape(shape=self.imagesize, portrait=self.portrait)
+            if _display_shape: 
+                return _display_shape
+        return crt.box_to_shape(box)
+
     # 基本：画像を表示する
     def show(self, noshow=False, depth=0):
         """配置と描画を行ない，画像をディスプレイに表示する．
@@ -941,40 +1149,340 @@ class Canvas(PlaceBoard):
 
         - ステップ1: 再帰的に子オブジェクトへ _arrange() 命令を送り，ボトムアップに配置の包含矩形 box を計算する
         - ステップ2: 包含矩形情報 box を元に，self.create_pim() 命令を発行して，pillowの画像盤 self.im を生成する．
-        - ステップ3: 再帰的に draw() 命令を発行して，トップダウンに描画を行う
+        - ステップ3: 配置済みの木を描画リストに平坦化して（compile），再生する
         - ステップ4: 自身のもつpillowオブジェクト self.imに show() 命令を送り，画像を表示する
         """
         if self.verbose:
             self.repo(msg=f'{self.myinfo()}.show(): { self.vars() }')
         
-        #ステップ1: ボトムアップに配置を計算する
-        box = self._arrange(shape=None)
-        com.ensure(box, 'box={box} must be defined!')
+        #ステップ1: ボトムアップに配置を計算し，描画リストを作る．変更がなければ前回のものを再生する
+        box = self._update_display_list()
 
         #ステップ1.5: 画像オブジェクトを生成する．
         if self.im==None:
             if False: print(f'@debug:create_image_object: {self.myinfo(depth=True)}.show()')
-            self.im = self.create_image_object(display_shape=crt.box_to_shape(box))
+            self.im = self.create_image_object(display_shape=self._display_shape(box))
         
-        #ステップ2: トップダウンに描画を行う
+        #ステップ2: 描画リストを再生して描画を行う
         cr = self.im.context()
-        self._draw(cr)
+        self.display_list_.replay(cr, culling=self.culling, margin=DRAW_CULL_MARGIN)
         
         #ステップ3: 画像を表示する
         self.im.show(noshow=noshow)  ##pilimage.ImageBoard
+        if not noshow and self.im.backend.is_vector: 
+            self.im = None #書き出し済みのベクトル形式の面は再利用できない
         return
 
+    #=====
+    # 記録面による出力
+    #=====
+    def record(self) -> 'cairo.RecordingSurface':
+        """配置済みの木を一度だけ記録面（cairo.RecordingSurface）に描画し，それを返す．
+        木に変更がなければ，前回の記録面を返す．
+
+        Returns: 
+              (cairo.RecordingSurface) : 画像サイズの範囲をもつ記録面
+        """
+        box = self._update_display_list()
+        if self.recording_ == None or self.recorded_list_ is not self.display_list_:
+            display_list = self.display_list_
+            self.recording_ = crt.cr_record(
+                lambda cr: display_list.replay(cr, culling=self.culling, margin=DRAW_CULL_MARGIN),
+                display_shape=self._display_shape(box))
+            self.recorded_list_ = self.display_list_
+        return self.recording_
+
+    def output(self, outfile=None, format=None, scale=1.0):
+        """記録面を，出力ファイルフォーマットと拡大率を指定して書き出す．
+        木の走査と描画は関数`record()`で一度だけ行い，出力ごとには記録面を再生するだけである．
+
+        Args: 
+              outfile (str, file-like) : 出力ファイル名（拡張子を除く），または，出力先のファイル風オブジェクト．default=None. Noneならば`self.outfile`.
+
+              format (str) : 出力ファイルフォーマット（pdf, png, svg, ps）．default=None. Noneならば`self.format`.
+
+              scale (float) : 拡大率．default=1.0.
+
+        Returns: 
+              (str, file-like) : 出力先．ファイル名ならば拡張子を付けたもの．
+
+        Example::
+
+              CV.output(format='pdf')
+              CV.output(format='png')
+              CV.output(outfile='thumb', format='png', scale=0.25)
+              buf = io.BytesIO(); CV.output(outfile=buf, format='svg')
+        """
+        if outfile == None: 
+            outfile = self.outfile
+        if format == None: 
+            format = self.format
+        if isinstance(outfile, str): 
+            outfile = f'{outfile}.{crt.get_surface_backend(format).ext}'
+        return self._output_to(outfile, format=format, scale=scale)
+
+    def _output_to(self, target, format=None, scale=1.0):
+        com.ensure(scale != None and scale > 0, f'scale={scale} must be positive!')
+        recording = self.record()
+        width, height = self._display_shape(self._arrange(shape=None)) #配置済みならば再利用される
+        surface = crt.cr_create_surface(format=format, outfile=target,
+                                        display_shape=(width*scale, height*scale))
+        crt.cr_replay_recording(recording, surface=surface, scale=scale)
+        crt.cr_write_surface(surface, format=format, outfile=target)
+        return target
+
+    def output_banded(self, outfile=None, scale=1.0, band_height=crt.DEFAULT_BAND_HEIGHT):
+        """PNG画像を，横長の帯ごとに描画して，逐次書き出す．使用メモリは帯一つ分である．
+        cairoの画像面の大きさの上限（`crt.MAX_SURFACE_SIZE`）を超える画像も描ける．
+        各帯では，帯と交わらない描画命令を間引く．
+
+        Args: 
+              outfile (str, file-like) : 出力ファイル名（拡張子を除く），または，出力先のファイル風オブジェクト．default=None. Noneならば`self.outfile`.
+
+              scale (float) : 拡大率．default=1.0.
+
+              band_height (int) : 帯の高さ（画素）．default=crt.DEFAULT_BAND_HEIGHT.
+
+        Returns: 
+              (str, file-like) : 出力先
+        """
+        com.ensure(scale != None and scale > 0, f'scale={scale} must be positive!')
+        if outfile == None: 
+            outfile = self.outfile
+        if isinstance(outfile, str): 
+            outfile = f'{outfile}.png'
+        box = self._update_display_list()
+        display_list = self.display_list_
+        return crt.cr_render_banded(
+            lambda cr: display_list.replay(cr, culling=True, margin=DRAW_CULL_MARGIN),
+            target=outfile, display_shape=self._display_shape(box), scale=scale,
+            band_height=band_height)
+
+    def output_parallel(self, outfile=None, scale=1.0, processes=None,
+                        tile_height=crt.DEFAULT_BAND_HEIGHT):
+        """PNG画像を，タイルに分けてプロセスプールで並列に描画し，書き出す．
+        描画リストを各プロセスに一度だけ送り，各プロセスは共有メモリ上の画像の自分のタイルに直接描く．
+
+        Args: 
+              outfile (str, file-like) : 出力ファイル名（拡張子を除く），または，出力先のファイル風オブジェクト．default=None. Noneならば`self.outfile`.
+
+              scale (float) : 拡大率．default=1.0.
+
+              processes (int) : プロセス数．default=None. Noneならば`os.cpu_count()`．
+
+              tile_height (int) : タイルの高さ（画素）．default=crt.DEFAULT_BAND_HEIGHT.
+
+        Returns: 
+              (str, file-like) : 出力先
+        """
+        com.ensure(scale != None and scale > 0, f'scale={scale} must be positive!')
+        if outfile == None: 
+            outfile = self.outfile
+        if isinstance(outfile, str): 
+            outfile = f'{outfile}.png'
+        box = self._update_display_list()
+        with self.display_list_.render_parallel(display_shape=self._display_shape(box),
+                                                scale=scale, processes=processes,
+                                                tile_height=tile_height,
+                                                margin=DRAW_CULL_MARGIN) as image:
+            image.write_png(outfile)
+        return outfile
+
+    def output_tiles(self, outdir=None, tile_size=256, min_zoom=0, max_zoom=None,
+                     processes=None):
+        """多重解像度のタイルのピラミッド（z/x/y）を，PNG画像`{outdir}/{z}/{x}/{y}.png`として書き出す．
+        一度の配置から全てのズームを描き，空のタイルは配置済みの包含矩形により省く．
+        関数`dl.DisplayList.render_pyramid()`を参照のこと．
+
+        Args: 
+              outdir (str) : 出力先のディレクトリ．default=None. Noneならば`self.outfile`.
+
+              tile_size (int) : タイルの一辺（画素）．default=256.
+
+              min_zoom, max_zoom (int) : ズームの範囲．`max_zoom`で原寸である．default=0, None.
+
+              processes (int) : プロセス数．default=None. Noneならば`os.cpu_count()`．
+
+        Returns: 
+              (list(tuple(int,int,int))) : 書き出したタイル`(z, x, y)`のリスト
+        """
+        if outdir == None: 
+            outdir = self.outfile
+        box = self._update_display_list()
+        return self.display_list_.render_pyramid(outdir=outdir,
+                                                  display_shape=self._display_shape(box),
+                                                  tile_size=tile_size,
+                                                  min_zoom=min_zoom, max_zoom=max_zoom,
+                                                  processes=processes,
+                                                  margin=DRAW_CULL_MARGIN)
+
+    def to_array(self, scale=1.0):
+        """描画した画素を，FORMAT_ARGB32の配列（形`(height, width, 4)`のuint8配列，アルファ乗算済み）として返す．
+        関数`show()`でPNGの画像オブジェクトに描画済みで，`scale==1.0`ならば，その面の複写なしの表示を返す．
+        そうでなければ，記録面を新たな画像面に再生して，その表示を返す．
+
+        Args: 
+              scale (float) : 拡大率．default=1.0.
+
+        Returns: 
+              (numpy.ndarray) : 形`(height, width, 4)`のuint8配列．関数`crt.argb32_to_rgba()`でRGBAに変換できる．
+        """
+        if scale == 1.0 and self.im != None and not self.im.backend.is_vector:
+            return self.im.to_array()
+        com.ensure(scale != None and scale > 0, f'scale={scale} must be positive!')
+        recording = self.record()
+        width, height = self._display_shape(self._arrange(shape=None))
+        surface = crt.cr_create_surface(format='png', display_shape=(width*scale, height*scale))
+        crt.cr_replay_recording(recording, surface=surface, scale=scale)
+        return crt.cr_surface_array(surface)
+
+    def to_rgba(self, scale=1.0):
+        """描画した画素を，アルファ乗算を戻したRGBAの配列（形`(height, width, 4)`のuint8配列）として返す．
+        関数`to_array()`と`crt.argb32_to_rgba()`を参照のこと．
+        """
+        return crt.argb32_to_rgba(self.to_array(scale=scale))
+
+    def __getstate__(self):
+        #pickle用: cairoの面と文脈はpickleできないので，画像オブジェクトと記録面を捨てる
+        state = dict(self.__dict__)
+        state['im'] = None
+        state['recording_'] = None
+        state['recorded_list_'] = None
+        return state
+
     #Cairo.contextオブジェクトの返却
     def context(self) -> 'cairo.Context': 
-        """Cairo.contextオブジェクトを返す．"""
+        """Cairo.contextオブジェクトを返す．画像オブジェクトがなければ，ここで生成する．"""
+        if self.im == None: 
+            box = None if self.imagesize else self._arrange(shape=None)
+            self.im = self.create_image_object(display_shape=self._display_shape(box))
         return self.im.context()  ##Cairo.contextオブジェクト
             
     # 画像をファイルに保存する
-    def save(self, imgfile, **kwargs):
-        """imgfile: 保存する画像ファイルの名前．"""
-        self.im.save(imgfile=imgfile, **kwargs)
+    def save(self, imgfile, format=None, scale=1.0):
+        """画像を保存する．関数`output()`と同様に，記録面を再生して書き出す．
+
+        Args: 
+              imgfile (str, file-like) : 保存する画像ファイルの名前（拡張子を含む），または，出力先のファイル風オブジェクト．
+
+              format (str) : 出力ファイルフォーマット．default=None. Noneならば`imgfile`の拡張子から，それもなければ`self.format`.
+
+              scale (float) : 拡大率．default=1.0.
+        """
+        if format == None: 
+            format = crt.get_surface_format(imgfile, default=self.format)
+        self._output_to(imgfile, format=format, scale=scale)
         return
 
+    def release(self):
+        """子の木，描画リスト，記録面，画像オブジェクトへの参照を捨てる．出力済みのキャンバスのメモリを解放するために用いる．
+        子から自身への参照`parent`も切る．
+        """
+        for _, child in self.children_: 
+            child.parent = None
+        self.children_ = []
+        self.display_list_ = None
+        self.recording_ = None
+        self.recorded_list_ = None
+        self.im = None
+        self.mark_dirty()
+        return
+
+#=====
+# 複数ページの文書
+#=====
+
+PAGED_FORMATS = ('pdf', 'ps') #ページをもつ出力ファイルフォーマット
+
+class Document:
+    """複数のキャンバスを，一つの面（surface）の各ページとして出力する文書のクラス．
+    ページごとにファイルを作って結合する代わりに，一つの面に`show_page()`でページを追加する．
+
+    Args: 
+          outfile (str, file-like) : 出力ファイル名（拡張子を除く），または，出力先のファイル風オブジェクト．default: "out"
+
+          format (str) : 出力ファイルフォーマット．`PAGED_FORMATS`のいずれか．default: "pdf"
+
+          release (bool) : ページの出力後に，キャンバスの木を捨てるか．default=True.
+
+    Attributes: 
+          num_pages (int) : 出力したページ数
+
+    Example::
+
+          with bd.Document(outfile='report') as doc:
+              for i in range(2000):
+                  doc.add_page(make_figure(i))
+
+    Note: 
+          キャンバスの木は，ページの出力後に関数`Canvas.release()`で捨てられるので，生成子で次々にキャンバスを作れば，使用メモリは一定に保たれる．
+    """
+    def __init__(self, outfile="out", format="pdf", release=True, verbose=False):
+        com.ensure(format in PAGED_FORMATS,
+                   f'format={format} must be one of {PAGED_FORMATS}!')
+        self.format : str = format
+        if outfile == None or isinstance(outfile, str):
+            outfile = f'{outfile or "out"}.{crt.get_surface_backend(format).ext}'
+        self.myoutfile = outfile
+        self.release : bool = release
+        self.verbose : bool = verbose
+        self.num_pages : int = 0
+        self.surface_ = None #面．最初のページのサイズで遅延生成する
+        self.cr_ = None
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def add_page(self, canvas) -> int:
+        """キャンバス`canvas`を配置して，新しいページとして出力する．
+
+        Args: 
+              canvas (Canvas) : ページのキャンバス．ページのサイズは，キャンバスの画像サイズである．
+
+        Returns: 
+              (int) : 出力したページの番号（0から）
+        """
+        com.ensure(isinstance(canvas, Canvas), f'canvas={canvas} must be a Canvas!')
+        box = canvas._update_display_list()
+        _display_shape = canvas._display_shape(box)
+        if self.surface_ == None:
+            self.surface_ = crt.cr_create_surface(format=self.format, outfile=self.myoutfile,
+                                                  display_shape=_display_shape)
+            self.cr_ = crt.cr_create_context(self.surface_)
+        else: 
+            crt.cr_set_page_size(self.surface_, display_shape=_display_shape)
+        cr = self.cr_
+        cr.save()
+        canvas.display_list_.replay(cr, culling=canvas.culling, margin=DRAW_CULL_MARGIN)
+        cr.restore()
+        cr.show_page()
+        if self.verbose: 
+            print(f'Document.add_page(): page={self.num_pages} shape={_display_shape}')
+        if self.release: 
+            canvas.release()
+        self.num_pages += 1
+        return self.num_pages - 1
+
+    def add_pages(self, canvases):
+        """キャンバスの列`canvases`を，順にページとして出力する．生成子を渡せば，キャンバスを一つずつ作って捨てられる．
+        """
+        for canvas in canvases: 
+            self.add_page(canvas)
+        return self
+
+    def close(self):
+        """文書を閉じて，出力先に書き出す．ページがなければ何もしない．
+        """
+        if self.surface_ != None: 
+            self.surface_.finish()
+            self.surface_ = self.cr_ = None
+        return 
+
 #=====
 # ボードの実装クラス
 #=====
@@ -986,7 +1494,11 @@ class PackerBoard(CoreBoard):
     Args: 
          orient (str) : 並べる主軸方向の指定．`x`または`y`の値をとる．default='x'
 
-         packing (str) : 内部のボードの詰め方の指定情報. packing in ('even','pack')
+         packing (str) : 内部のボードの詰め方の指定情報．次の値をとる．default=None.
+
+             * `None`または`'even'`: 子の最大長を固定ピッチとして並べる．
+             * `'pack'`: 子の長さだけ進めて，隙間なく詰めて並べる．
+             * `'wrap'`: `'pack'`と同様に詰めて並べ，自身の形状`shape`の主軸方向の長さを超えるときに次の行へ折り返す．形状が未定ならば折り返さない．
 
          width (float) : 自身の幅．default=None. 
 
@@ -1008,12 +1520,15 @@ class PackerBoard(CoreBoard):
         
         #内部変数
         ## マージン設定
+        com.ensure(packing in (None, 'even', 'pack', 'wrap'),
+                   f'packing={packing} must be one of None, even, pack, and wrap!')
         self.packing : str = packing 
         self.cell_margin : tuple = cell_margin
         self.cell_side   : tuple = cell_side
         
         #内部変数
         self.orient : str = orient
+        self.child_boxes_ : list = [] #子の計測された包含矩形のリスト
         
         #debug
         if self.verbose:
@@ -1091,38 +1606,72 @@ class PackerBoard(CoreBoard):
             #子の型チェック
             com.ensure(child != None and isinstance(child, BoardBase),
                        'child must be a subclass of BoardBase!: {child}')
-            child_box = child.get_box()
+            child_box = self.child_boxes_[idx] #計測済みの包含矩形
             triple = trans, child, child_box
             yield idx, triple
             idx += 1
 
+    ##Override
+    def _arrange_apply_children(self, shape=None):
+        """自身の子すべての大きさを計測するタスク．オーバーライド．
+        次の属性を操作する: 
+
+        * self.children_: 読み出し
+        * self.child_boxes_: 書き込み
+
+        Note: 
+            子の形状は自身が関数`arrange_box_children()`で決めるので，親から受け取った形状`shape`は子に渡さず，`shape=None`で計測する．計測結果は子ごとに保持されるので，入れ子のPackerBoardの再配置では，子孫の配置は再計算されない．
+        """
+        _child_boxes = []
+        for idx, pair in self.children_enumerated():
+            trans, child = pair_normalize(pair)
+            if self.verbose: self.repo(msg=f'=> call _measure() on {idx}-th child={child.myinfo()}', is_child=True, header=False)
+            box = yield child._measure_task(shape=None)
+            com.ensure(box != None, f'child._measure()={box} != None')
+            _child_boxes.append(box)
+        self.child_boxes_ = _child_boxes
+        return 
+
     def _accumulate_boxes(boxes): 
-        """包含矩形のリストを受け取り，要素である包含矩形を走査して，
-        サイズの最大と総和を求める副関数
-        
+        """包含矩形の配列を受け取り，サイズの最大と総和を求める副関数
+
         Args: 
-             boxes (list(Box)) : 包含矩形の並び（リスト or iterator）
+             boxes (numpy.ndarray) : 包含矩形`(x0, y0, x1, y1)`を行とする形状`(n,4)`の配列
 
         Returns: 
-             max_shape (tuple(float, float)) : 矩形のx-とy-サイズの最大値の対
-             SUMSZ (tuple(float, float)) : 矩形x-とy-のサイズの総和の対
-             NUM (int) : 矩形の数
-        """
-        max_shape = [0, 0] #サイズの最大値
-        sum_shape = [0, 0] #サイズの総和
-        num_shape = 0
-        # for idx, triple in self.children_box_enumerated():
-        for idx, triple in boxes:
-            trans, child, child_box = triple #分解
-            com.ensure(child_box != None,
-                       f'child_box={child_box} must be non-None')
-            #子の包含矩形の最大サイズを更新
-            cwidth0, cwidth1  = crt.box_to_shape(child_box)
-            max_shape[0], max_shape[1] = max(max_shape[0],cwidth0), max(max_shape[1],cwidth1)
-            sum_shape[0], sum_shape[1] = sum_shape[0] + cwidth0, sum_shape[1] + cwidth1
-            num_shape += 1
-        return max_shape, sum_shape, num_shape
+             max_shape (numpy.ndarray) : 矩形のx-とy-サイズの最大値の対
+             sum_shape (numpy.ndarray) : 矩形x-とy-のサイズの総和の対
+             num_shape (int) : 矩形の数
+        """
+        boxes = geo.as_boxes(boxes)
+        shapes = geo.boxes_shapes(boxes) #子の包含矩形のサイズ
+        max_shape = shapes.max(axis=0, initial=0.0)
+        sum_shape = shapes.sum(axis=0)
+        return max_shape, sum_shape, len(shapes)
 
+    def _break_lines(steps, limit=None):
+        """主軸方向の長さの並びを受け取り，先頭から貪欲に行に分割する副関数．
+        子を順に行に詰めていき，行の長さが`limit`を超えるときに次の行へ折り返す．
+        ただし，行の先頭の子は，長さが`limit`を超えても折り返さない．
+
+        Args: 
+             steps (list(float)) : 子の主軸方向の長さのリスト
+
+             limit (float) : 行の長さの上限．Noneならば折り返さない．default=None.
+
+        Returns: 
+             (numpy.ndarray) : 子ごとの行の添字の配列
+        """
+        lines = np.zeros(len(steps), dtype=int)
+        if limit == None:
+            return lines
+        line, pos = 0, 0.0
+        for idx, step in enumerate(steps): 
+            if pos > 0.0 and pos + step > limit:
+                line, pos = line + 1, 0.0 #次の行へ折り返す
+            lines[idx] = line
+            pos += step
+        return lines
 
     def _get_axes(orient=None):
         """与えられた文字列orient (str)に応じて，主軸と副軸の添字の対 AX_PRI, AX_SEC を返す．
@@ -1134,7 +1683,7 @@ class PackerBoard(CoreBoard):
     
     #To be Override
     def arrange_box_children(self, **kwargs):
-        """自身の子すべてを再配置する．必ず終わりにself.boxesを設定すること．
+        """自身の子すべてを再配置するタスク．必ず終わりにself.boxesを設定すること．
         次の属性を操作する: 
 
         * self.children_
@@ -1144,62 +1693,55 @@ class PackerBoard(CoreBoard):
         ax_pri, ax_sec = PackerBoard._get_axes(self.orient)
 
         # 第1回目のパス: 子の包含矩形のサイズの最大と総和を求める
-        _max_shape, _, _ = PackerBoard._accumulate_boxes(self.children_box_enumerated())
-
-        # 内部の子ボードの形状サイズ指定
-        _ishape = [None, None] #内部のさや(pod)の形状サイズ．可変データ
-        # com.ensure(com.is_typeof_seq(_max_shape, etype=(float,int),
-        #                            dim=2, verbose=True),
-        #            f'max_shape={_max_shape} must be a pair of numbers!')
-        com.ensure_point(_max_shape, name='_max_shape', nullable=False)
-        _ishape = _max_shape
-        if self.packing==None:
-            pass
-        # elif self.packing in ('even'):
-        #     pass
-        # elif self.packing in ('pack'):
-        #     _ishape[ax_pri] = None #primary-axis has unbounded size
-        #     pass
-        else:
-            pass
-
-        # 第2回目のパス
-        _child_pos = [0, 0] #初期値: 子ボードの配置位置
-        _boxes = EMPTY_RECT #包含矩形の初期値
-        for idx, pair in self.children_enumerated():
-            trans, child = pair #分解
-
-            #子配置の変換
-            trans1 = crt.Translate(dest=_child_pos)
-
-            #変換と子を追加
-            self.set_child_by_idx(idx=idx, pair=(trans1, child)) 
-
-            #子の配置情報の計算
-            if True: print(f'@debug00@PackerBoard:child={child.myinfo()} shape=_ishape={_ishape}')
-            child._arrange(shape=_ishape) #再帰的に処理
-
-            #自身の包含矩形の計算
-            box0 = child.get_box()
-            com.ensure(box0 != None, f'box0={box0} is None!')
-            box1 = crt.box_apply_trans(box0, trans=trans1)
-            com.ensure(box1 != None, f'box1={box1} is None!')
-            _boxes = crt.box_union(_boxes, box1) #親の包含矩形の更新
-            if False: print(f'@debug:pack:update:{self.myinfo()} child={box1} => self={_boxes}')
-
-            #次の配置位置を求める
-            _old_child_pos = copy.copy(_child_pos)
-            ## 主軸: 子の主軸長だけ，配置位置を進める
-            if _ishape[ax_pri]!=None: 
-                _child_pos[ax_pri] += _ishape[ax_pri]
-            else:                
-                _child_pos[ax_pri] += crt.box_to_shape(box1)[ax_pri]
-            ## 副軸: 配置位置は変えない．
-                
-            if False: print(f'@debug:pack:orient={self.orient} pos={ _old_child_pos } => pos_new={ _child_pos }')
+        _max_shape, _, _ = PackerBoard._accumulate_boxes(self.child_boxes_)
+
+        # 主軸方向のセルの長さ: 固定ピッチならば最大長，詰めるならば子の長さ
+        _shapes = geo.boxes_shapes(np.asarray(self.child_boxes_, dtype=float).reshape(-1, 4))
+        if self.packing in (None, 'even'):
+            _steps = np.full(len(_shapes), _max_shape[ax_pri])
+        else: #'pack', 'wrap'
+            _steps = _shapes[:, ax_pri]
+
+        # 行分割: 子を行に割り当て，行ごとに副軸方向の長さの最大を求める
+        _limit = None
+        if self.packing == 'wrap' and self.shape != None:
+            _limit = self.shape[ax_pri]
+        _lines = PackerBoard._break_lines(_steps.tolist(), limit=_limit)
+        _num_lines = int(_lines[-1]) + 1 if len(_lines) > 0 else 0
+        _heights = np.zeros(_num_lines)
+        np.maximum.at(_heights, _lines, _shapes[:, ax_sec])
+        _offsets = np.concatenate(([0.0], np.cumsum(_heights)))
+
+        # 配置位置の計算: 主軸方向は行の先頭からの累積和，副軸方向は行の開始位置
+        _starts = np.cumsum(_steps) - _steps
+        _heads = np.flatnonzero(np.diff(_lines, prepend=-1)) #各行の先頭の子の添字
+        _moves = np.zeros((len(_steps), 2))
+        _moves[:, ax_pri] = _starts - _starts[_heads][_lines]
+        _moves[:, ax_sec] = _offsets[_lines]
+
+        # セルの形状: 主軸方向はセルの長さ，副軸方向は行の長さ
+        _ishapes = np.zeros((len(_steps), 2))
+        _ishapes[:, ax_pri] = _steps
+        _ishapes[:, ax_sec] = _heights[_lines]
+
+        # 第2回目のパス: 子をセルの形状で配置し，配置後の包含矩形を集める
+        if False: print(f'@debug00@PackerBoard:{self.myinfo()} shapes=_ishapes={_ishapes}')
+        _children = [ child for _, child in self.children_ ]
+        _cboxes = []
+        for child, ishape in zip(_children, _ishapes.tolist()):
+            box = yield child._arrange_task(shape=ishape) #子の配置を実行
+            _cboxes.append(box)
+        _cboxes = np.array(_cboxes, dtype=float).reshape(-1, 4)
+
+        # 変換を一括して書き込む．親子関係は変わらないので，子の再登録はしない．
+        self.children_[:] = list(zip(crt.translate_many(_moves), _children))
+
+        # 自身の包含矩形の計算: 平行移動した子の包含矩形と原点の和
+        _tboxes = geo.boxes_translate(_cboxes, _moves)
+        _boxes = geo.boxes_union(_tboxes, initial=EMPTY_RECT)
         
         #exp 自身の情報を更新
-        self.boxes = com.ensure_box(_boxes, name='_boxes', nullable=False) 
+        self.boxes = com.to_box(_boxes, name='_boxes', nullable=False) 
         return self.box
     
     pass ##class PackerBoard
@@ -1209,20 +1751,234 @@ class PackerBoard(CoreBoard):
 # サブクラス
 #=====
 class GridPackerBoard(PackerBoard):
-    """描画を行う画盤（board）のクラス．`PackerBoard`のラッパー．
+    """子を2次元の格子状に並べる画盤（board）のクラス．`PackerBoard`のサブクラス．
 
     Args: 
+          num_wrap (int) : 位置を省略して子を追加するときの，主軸方向のセルの個数．この個数で次の行（列）に折り返す．Noneならば折り返さない．default=None. 
+
           **kwargs : 他のキーワード引数．上位クラスに渡される．
+
+    Attributes: 
+          cells_ (numpy.ndarray) : 子ごとの配置`(row, col, rowspan, colspan)`を行とする整数配列．先頭の`num_cells_`行が有効であり，子リスト`children_`と同じ順に並ぶ．容量を倍々に拡張するので，子の追加はならしO(1)時間である．
+
+          num_cells_ (int) : 有効な配置の個数
+
+          occupied_ (numpy.ndarray) : セルが子で占められているかの真理値の2次元配列（ビットマップ）．`cells_`と同じく，容量を倍々に拡張する．
+
+          grid_shape_ (tuple(int,int)) : 格子の行数と列数の対`(num_rows, num_cols)`
+
+          cursor_ (tuple(int,int)) : 位置を省略したときに次に子を置くセル`(row, col)`
+
+    Note: 
+          行は y-軸方向に，列は x-軸方向に並ぶ．各行の高さと各列の幅は，そこに置かれた子の大きさの最大値である．複数のセルにまたがる子については，まず単一セルの子で大きさを決めた後に，不足分をまたがるセルに等分して加える．
+
+    Note: 
+          子が占めるセルは重なってはならない．位置を省略した子は，カーソルから主軸方向に進んで，最初に空いているセルに置く．関数`append()`で直接加えた子も，同様に置く．
     """
-    def __init__(self, **kwargs):
+    def __init__(self, num_wrap=None, **kwargs):
         """画盤オブジェクトを初期化する
         """
         #引数
         super().__init__(**kwargs)
+        self.num_wrap : int = num_wrap
+
+        #内部変数
+        self.cells_ = np.zeros((GRID_INIT_CAPACITY, 4), dtype=int)
+        self.num_cells_ : int = 0
+        self.occupied_ = np.zeros((GRID_INIT_CAPACITY, GRID_INIT_CAPACITY), dtype=bool)
+        self.grid_shape_ : tuple = (0, 0)
+        self.cursor_ : tuple = (0, 0)
         if self.verbose:
             self.repo(msg=f'{self.myinfo()}.__init__(): { self.vars() }')
         return
 
+    def get_grid_shape(self): 
+        """格子の行数と列数の対`(num_rows, num_cols)`を返す．
+        """
+        return self.grid_shape_
+
+    ##Override
+    def add(self, child:BoardBase=None,
+            row=None, col=None, rowspan=1, colspan=1) -> BoardBase: 
+        """子をセル`(row, col)`に追加する．
+
+        Args: 
+            child (Board): 子として追加するBoardオブジェクト
+
+            row (int) : 行の添字．`row`と`col`をともに省略したときは，カーソル`cursor_`から主軸方向に進んで，最初に空いているセルに置く．default=None.
+
+            col (int) : 列の添字．default=None.
+
+            rowspan (int) : 子がまたがる行の個数．default=1.
+
+            colspan (int) : 子がまたがる列の個数．default=1.
+
+        Returns:
+            (Board) : 追加した子
+
+        Note: 
+            既に置かれた子のセルと重なる位置を明示したときは，エラーとする．
+
+        Example::
+        
+        		grid = GridPackerBoard(num_wrap=3)
+        		grid.add(DrawRectangle(width=1, height=1), row=0, col=0, colspan=2)
+        		grid.add(DrawCircle(r=1)) #セル(0,2)に置く
+        """
+        com.ensure(rowspan >= 1 and colspan >= 1,
+                   f'rowspan={rowspan} and colspan={colspan} must be positive!')
+        if row==None and col==None:
+            row, col = self._find_free_cell(*self.cursor_, rowspan, colspan)
+        com.ensure(row!=None and col!=None,
+                   f'row={row} and col={col} must be both given or omitted!')
+        com.ensure(row >= 0 and col >= 0, f'row={row} and col={col} must be non-negative!')
+        self._reserve_cell(row, col, rowspan, colspan)
+
+        #子をラッパーで包んで子リストに加える
+        return super().add(child=child)
+
+    ##Override
+    def append(self, pair=None) -> BoardBase: 
+        """子の対`pair = (trans, child)`を子リストに加える．関数`add()`を経ずに加えた子は，カーソルから最初に空いている一つのセルに置く．
+        """
+        if self.num_cells_ == len(self.children_): #セルが未割り当て
+            self._reserve_cell(*self._find_free_cell(*self.cursor_, 1, 1), 1, 1)
+        return super().append(pair=pair)
+
+    def _reserve_cell(self, row, col, rowspan, colspan): 
+        """子の配置`(row, col, rowspan, colspan)`を配置表に加え，そのセルを占有済みにする．既に占有されたセルと重なればエラーとする．
+        """
+        com.ensure(self._is_free(row, col, rowspan, colspan),
+                   f'cells (row={row}, col={col}, rowspan={rowspan}, colspan={colspan})'+
+                   f' overlap with an already placed child!')
+
+        #配置表と占有表の容量が尽きたら倍に拡張する
+        if self.num_cells_ == len(self.cells_):
+            _cells = np.zeros((2*len(self.cells_), 4), dtype=int)
+            _cells[:self.num_cells_] = self.cells_[:self.num_cells_]
+            self.cells_ = _cells
+        cap_rows, cap_cols = self.occupied_.shape
+        while cap_rows < row + rowspan: cap_rows *= 2
+        while cap_cols < col + colspan: cap_cols *= 2
+        if (cap_rows, cap_cols) != self.occupied_.shape:
+            _occupied = np.zeros((cap_rows, cap_cols), dtype=bool)
+            _occupied[:self.occupied_.shape[0], :self.occupied_.shape[1]] = self.occupied_
+            self.occupied_ = _occupied
+        self.cells_[self.num_cells_] = (row, col, rowspan, colspan)
+        self.occupied_[row:row + rowspan, col:col + colspan] = True
+        self.num_cells_ += 1
+
+        #格子の大きさとカーソルを更新する
+        num_rows, num_cols = self.grid_shape_
+        self.grid_shape_ = (max(num_rows, row + rowspan), max(num_cols, col + colspan))
+        self.cursor_ = self._next_cell(row, col, rowspan, colspan)
+        return
+
+    def _is_free(self, row, col, rowspan, colspan) -> bool: 
+        """セル`(row, col)`から`rowspan`行`colspan`列の範囲が，どの子にも占められていないかを返す．容量の外のセルは空いている．
+        """
+        return not self.occupied_[row:row + rowspan, col:col + colspan].any()
+
+    def _find_free_cell(self, row, col, rowspan, colspan): 
+        """セル`(row, col)`から主軸方向に一つずつ進み，`rowspan`行`colspan`列の範囲が空いている最初のセルを返す．
+        """
+        while not self._is_free(row, col, rowspan, colspan):
+            row, col = self._next_cell(row, col, 1, 1)
+        return row, col
+
+    def _next_cell(self, row, col, rowspan, colspan): 
+        """セル`(row, col)`に置いた子の次に，位置を省略した子を置く候補のセルを返す．
+        """
+        ax_pri, _ = PackerBoard._get_axes(self.orient)
+        if ax_pri == 0: #x-軸方向に進む
+            row, col = row, col + colspan
+            if self.num_wrap!=None and col >= self.num_wrap: row, col = row + 1, 0
+        else:           #y-軸方向に進む
+            row, col = row + rowspan, col
+            if self.num_wrap!=None and row >= self.num_wrap: row, col = 0, col + 1
+        return row, col
+
+    @staticmethod
+    def _span_extents(starts, spans, sizes, num): 
+        """セルの開始添字，幅，大きさの配列を受け取り，各行（列）の長さを求める副関数
+
+        Args: 
+             starts (numpy.ndarray) : 子の開始の行（列）の添字の配列
+
+             spans (numpy.ndarray) : 子がまたがる行（列）の個数の配列
+
+             sizes (numpy.ndarray) : 子の大きさの配列
+
+             num (int) : 行（列）の個数
+
+        Returns: 
+             (numpy.ndarray) : 行（列）の長さの配列
+        """
+        extents = np.zeros(num)
+        #単一セルの子の大きさの最大
+        single = (spans == 1)
+        np.maximum.at(extents, starts[single], sizes[single])
+        
+        #複数セルにまたがる子: 不足分を等分して加える
+        multi = ~single
+        if multi.any():
+            s, k, z = starts[multi], spans[multi], sizes[multi]
+            cum = np.concatenate(([0.0], np.cumsum(extents)))
+            deficit = np.maximum(z - (cum[s + k] - cum[s]), 0.0) / k
+            ## 各子がまたがる行（列）の添字を平坦に並べる
+            heads = np.repeat(np.cumsum(k) - k, k)
+            index = np.repeat(s, k) + (np.arange(k.sum()) - heads)
+            extra = np.zeros(num)
+            np.maximum.at(extra, index, np.repeat(deficit, k))
+            extents += extra
+        return extents
+
+    ##Override
+    def arrange_box_children(self, **kwargs):
+        """自身の子すべてを格子状に再配置するタスク．オーバーライド．
+        次の属性を操作する: 
+
+        * self.children_
+        * self.boxes
+        """
+        _n = self.num_cells_
+        com.ensure(_n == len(self.children_),
+                   f'num_cells_={_n} must equal the number of children={len(self.children_)}!')
+        rows, cols, rowspans, colspans = self.cells_[:_n].T
+        num_rows, num_cols = self.grid_shape_
+
+        # 第1回目のパス: 行の高さと列の幅を求める
+        _boxes = np.asarray(self.child_boxes_, dtype=float).reshape(-1, 4)
+        _shapes = _boxes[:, 2:] - _boxes[:, :2]
+        _widths  = GridPackerBoard._span_extents(cols, colspans, _shapes[:, 0], num_cols)
+        _heights = GridPackerBoard._span_extents(rows, rowspans, _shapes[:, 1], num_rows)
+        _xpos = np.concatenate(([0.0], np.cumsum(_widths)))
+        _ypos = np.concatenate(([0.0], np.cumsum(_heights)))
+
+        # セルの形状と位置
+        _cshapes = np.stack((_xpos[cols + colspans] - _xpos[cols],
+                             _ypos[rows + rowspans] - _ypos[rows]), axis=1)
+        _moves = np.stack((_xpos[cols], _ypos[rows]), axis=1)
+
+        # 第2回目のパス: 子をセルの形状で配置する
+        _children = [ child for _, child in self.children_ ]
+        _cboxes = []
+        for child, cshape in zip(_children, _cshapes.tolist()):
+            box = yield child._arrange_task(shape=cshape) #子の配置を実行
+            _cboxes.append(box)
+        _cboxes = np.array(_cboxes, dtype=float).reshape(-1, 4)
+
+        # 変換を一括して書き込む．
+        self.children_[:] = list(zip(crt.translate_many(_moves), _children))
+
+        # 自身の包含矩形の計算: 格子全体と，平行移動した子の包含矩形の和
+        _tboxes = geo.boxes_translate(_cboxes, _moves)
+        _boxes = geo.boxes_union(_tboxes, initial=(0.0, 0.0, float(_xpos[-1]), float(_ypos[-1])))
+        self.boxes = com.to_box(_boxes, name='_boxes', nullable=False) 
+        return
+
+    pass ##class GridPackerBoard
+
 ##======
 ## 描画演算オブジェクト
 ##======
@@ -1239,6 +1995,15 @@ class DrawCommandBase(CoreBoard):
         cmd (str) : 命令の名前の文字列．default=None. 
 
         kwargs (dict) : コマンドの引数からなる辞書．各コマンドは，この辞書の項目を参照して実装する．
+
+        style (crt.Style) : 生成時に`kwargs`から解決した文脈パラメータの組．描画のたびにキーを検索しないために用いる．
+
+        fill, edge_rgb, preserve, arrow_head : 生成時に`kwargs`から解決した描画のオプション．
+
+        debug_, show_native_origin_ (bool) : 生成時に`kwargs`から解決したデバッグ表示のフラグ．
+
+    Note: 
+        生成時に一度だけ，`kwargs`の文脈パラメータの代替キーを正規名に直す（`crt.STYLE_ALIASES`）．以後の描画では，キーを検索せずに属性を読む．
     """
     def __init__(self,
                  cmd=None, #命令の名前
@@ -1253,6 +2018,14 @@ class DrawCommandBase(CoreBoard):
 
         #命令を格納する
         self.cmd :str = cmd 
+        self.kwargs = crt.STYLE_ALIASES.resolve(self.kwargs)
+        self.style : crt.Style = crt.style_from_kwargs(**self.kwargs)
+        self.fill : str = self.kwargs.get('fill')
+        self.edge_rgb : tuple = self.kwargs.get('edge_rgb')
+        self.preserve : bool = self.kwargs.get('preserve')
+        self.arrow_head : dict = kw.get(self.kwargs, key='arrow_head', default=crt.EMPTY_DICT)
+        self.debug_ : bool = kw.get(self.kwargs, 'debug', default=False)
+        self.show_native_origin_ : bool = kw.get(self.kwargs, 'show_native_origin', default=False)
         # self.kwargs  = kwargs  #exp
         return
 
@@ -1270,6 +2043,22 @@ class DrawCommandBase(CoreBoard):
         """To be implemented 
         """
         return 
+
+    #Override 
+    def compile_me_before(self, dlist, ox, oy):
+        """描画命令を描画リスト`dlist`に追加する．関数`compile_me_impl()`が命令を作れないとき，およびデバッグ表示があるときは，関数`draw_me_before()`の呼び出しを代替の命令として追加する．
+        """
+        if (self.debug_ or self.show_native_origin_ or
+            not self.compile_me_impl(dlist, ox, oy)):
+            dlist.add_call(self.draw_me_before, ox, oy, box=self.get_world_box())
+        return 
+
+    #Override: To be implemented 
+    def compile_me_impl(self, dlist, ox, oy) -> bool:
+        """関数`draw_me_impl()`に相当する描画命令を描画リスト`dlist`に追加する．命令を追加できたら真を返す．
+        To be implemented 
+        """
+        return False
         
     # #Override 
     # def get_kwargs(self):
@@ -1323,19 +2112,27 @@ class DrawRectangle(DrawCommandBase):
         crt.cr_rectangle(x=self.x, y=self.y,
                          # width=self.width, height=self.height, 
                          width=shape[0], height=shape[1], 
-                         context=cr,
+                         context=cr, style=self.style, 
                          **self.kwargs)
-        if kw.get(self.kwargs, 'debug', default=False): 
+        if self.debug_: 
             crt.cr_text(context=cr, ox=0, oy=0,
                         msg=f'{self.get_trans()}', fsize=CFSIZE) #debug
             crt.cr_text(context=cr, ox=0, oy=2*CFSIZE, fsize=CFSIZE,
                         msg=f'box_={ self.box }') #debug
-        if kw.get(self.kwargs, 'show_native_origin', default=False): 
+        if self.show_native_origin_: 
             crt.cr_draw_marker_cross(context=cr, x=0, y=0, 
                                      linewidth=0.5, angle=math.pi*0.0, 
                                      rgb=crt.cr_add_alpha(crt.MYCOL['blue'], alpha=0.5))
         return 
 
+    #Override 
+    def compile_me_impl(self, dlist, ox, oy) -> bool:
+        shape = com.ensure_point(self.shape, name='self.shape', nullable=False)
+        dlist.add_rectangle(ox + self.x, oy + self.y, shape[0], shape[1],
+                            style_id=dlist.intern_style(self.style), 
+                            fill=self.fill, edge_rgb=self.edge_rgb)
+        return True
+
 class DrawCircle(DrawCommandBase):
     """描画演算オブジェクトのクラス．DrawCommandBaseクラスのサブクラス．
 
@@ -1371,18 +2168,25 @@ class DrawCircle(DrawCommandBase):
     #Override 
     def draw_me_impl(self, cr):
         crt.cr_circle(x=self.x, y=self.y, r=self.r, context=cr,
-                      **self.kwargs) 
-        if kw.get(self.kwargs, 'debug', default=False): 
+                      style=self.style, **self.kwargs) 
+        if self.debug_: 
             crt.cr_text(context=cr, ox=0, oy=0,
                         msg=f'{self.get_trans()}', fsize=CFSIZE)#debug
             crt.cr_text(context=cr, ox=0, oy=2*CFSIZE, fsize=CFSIZE,
                         msg=f'box_={ self.box }') #debug
-        if kw.get(self.kwargs, 'show_native_origin', default=False): 
+        if self.show_native_origin_: 
             crt.cr_draw_marker_cross(context=cr, x=0, y=0, 
                                      linewidth=0.5, angle=math.pi*0.0, 
                                      rgb=crt.cr_add_alpha(crt.MYCOL['blue'], alpha=0.5))
         return 
 
+    #Override 
+    def compile_me_impl(self, dlist, ox, oy) -> bool:
+        dlist.add_circle(ox + self.x, oy + self.y, self.r,
+                         style_id=dlist.intern_style(self.style), 
+                         fill=self.fill)
+        return True
+
 
 #======
 # 線分列の描画
@@ -1415,44 +2219,53 @@ class DrawPolyLines(DrawCommandBase):
 
     #Override 
     def arrange_box_self(self):
-        #命令全ての包含長方形を計算する
-        _boxes = EMPTY_RECT
-        for idx, pair in enumerate(self.commands):
-            cmd, x, y, _ = pair #分解
-            box1 = com.ensure_box((x, y, x, y), name='(x, y, x, y)')
-            _boxes = crt.box_union(_boxes, box1)
+        #命令全ての包含長方形を計算する: 点の列の包含矩形と原点の和
+        _points = np.array(self.commands, dtype=float).reshape(-1, 4)[:, 1:3]
+        _boxes = geo.points_bbox(geo.as_points(_points), initial=EMPTY_RECT)
         self.boxes = self.box = _boxes
         if False: print(f'@debug:polyline: self.box={self.box}')
         return 
 
+    def path_arrays(self, ox=0.0, oy=0.0) -> tuple:
+        """線分列の命令を，一つのパスを作るための配列に変換する．
+
+        Args: 
+              ox, oy (float) : 座標に加える原点の位置．default=0.0.
+
+        Returns: 
+              (tuple) : 組`(moves, xs, ys, arrows)`．`moves`, `xs`, `ys`は関数`crt.cr_polylines()`の引数のリスト．`arrows`は，矢印頭を要求した線分`(x_last, y_last, x, y)`のリスト．
+        """
+        if len(self.commands) == 0:
+            return [], [], [], []
+        cmds = np.array(self.commands, dtype=float).reshape(-1, 4)
+        moves = (cmds[:, 0] == CMD_MOVE)
+        xs = cmds[:, 1] + ox
+        ys = cmds[:, 2] + oy
+        ## 矢印頭は，前の点をもつ直線のうち，要求されたものにだけ描く
+        idx = np.flatnonzero(~moves[1:] & (cmds[1:, 3] != 0)) + 1
+        arrows = np.column_stack((xs[idx - 1], ys[idx - 1], xs[idx], ys[idx]))
+        return moves.tolist(), xs.tolist(), ys.tolist(), arrows.tolist()
+
     #Override 
     def draw_me_impl(self, cr):
-        crt.cr_set_context_parameters(context=cr, **self.kwargs)
-        x_last, y_last = None, None 
-        for idx, pair in enumerate(self.commands):
-            cmd, x, y, has_arrow = pair #分解
-            if cmd==CMD_MOVE:
-                if self.verbose:
-                    kwargs={ 'x':x, 'y': y, }
-                    self.repo(is_child=True, msg=f'@debug: cr_move_to: { kwargs }')
-                crt.cr_move_to(x, y, context=cr)
-            elif cmd==CMD_LINE:
-                if self.verbose:
-                    kwargs={ 'x':x, 'y': y, 'has_arrow': has_arrow,
-                             'x_last': x_last, 'y_last': y_last, }
-                    self.repo(is_child=True, msg=f'@debug: cr_line_to: { kwargs }')
-                if x_last != None and y_last != None: 
-                    crt.cr_line_to(x, y, context=cr, 
-                                   x_last=x_last, y_last=y_last,
-                                   has_arrow=has_arrow,
-                                   **self.kwargs)
-            else:
-                com.panic(f'PolyLines.draw_me_impl: no such cmd={cmd}!')
-            x_last, y_last = x, y 
-            pass
+        crt.cr_apply_style(style=self.style, context=cr)
+        moves, xs, ys, arrows = self.path_arrays()
+        if self.verbose:
+            self.repo(is_child=True, msg=f'@debug: cr_polylines: num={len(xs)} arrows={len(arrows)}')
+        crt.cr_polylines(moves, xs, ys, context=cr)
         crt.cr_process_stroke_or_fill(context=cr, **self.kwargs)
+        for x_last, y_last, x, y in arrows:
+            crt.cr_arrow_head(x, y, x_last, y_last, context=cr, **self.arrow_head)
         return
 
+    #Override 
+    def compile_me_impl(self, dlist, ox, oy) -> bool:
+        moves, xs, ys, arrows = self.path_arrays(ox=ox, oy=oy)
+        dlist.add_polylines(moves, xs, ys, style_id=dlist.intern_style(self.style),
+                            fill=self.fill, preserve=self.preserve,
+                            arrows=arrows, arrow_head=self.arrow_head)
+        return True
+
     def move_to(self, x, y) -> BoardBase:
         """ペンを位置`(x,y)`に移動する．直線は引かない．
         Args: 
@@ -1466,6 +2279,7 @@ class DrawPolyLines(DrawCommandBase):
         """
         has_arrow = False
         self.commands.append((CMD_MOVE, x, y, has_arrow))
+        self.mark_dirty() #包含矩形が変わる
         return self #for cascade object interface 
     
     def line_to(self, x, y, has_arrow=False) -> BoardBase:
@@ -1482,6 +2296,7 @@ class DrawPolyLines(DrawCommandBase):
 
         """
         self.commands.append((CMD_LINE, x, y, has_arrow)) 
+        self.mark_dirty() #包含矩形が変わる
         return self #for cascade object interface 
     
     pass 
@@ -1496,8 +2311,7 @@ class DrawMarkerCross(DrawPolyLines):
     """
     def __init__(self, **kwargs):
         self.ticklen = ticklen = kw.get(kwargs, 'ticklen', default=4.0)
-        self.linewidth = linewidth = kw.get(kwargs, key='linewidth',
-                           altkeys=['line_width', 'pen_width'], default=0.75)
+        self.linewidth = linewidth = crt.STYLE_ALIASES.get(kwargs, 'linewidth', default=0.75)
         kwargs['linewidth'] = linewidth
         super().__init__(**kwargs)
         # clen = 5
@@ -1509,6 +2323,219 @@ class DrawMarkerCross(DrawPolyLines):
         self.line_to(ticklen*0.0, ticklen*1.0)
         self.move_to(0, 0)
         self.line_to(ticklen*0.0, ticklen*(-1.0))
+        return
+
+#======
+# 散布図の描画
+#======
+
+class DrawScatter(DrawCommandBase):
+    """多数の点のマーカーを，一つのノードとして描く描画演算オブジェクトのクラス．DrawCommandBaseクラスのサブクラス．
+    点ごとにボードを作らず，NumPy配列のまま保持する．
+
+    Args:
+          x, y (numpy.ndarray) : マーカーの中心の座標の配列．必須．
+
+          size (float, numpy.ndarray) : マーカーの半径，または，点ごとの半径の配列．default=crt.DEFAULT_MARKER_RADIUS.
+
+          marker (str) : マーカーの形．`crt.MARKER_SHAPES`のいずれか．default='circle'.
+
+          rgbs (numpy.ndarray) : 点ごとの色`(r,g,b)`または`(r,g,b,a)`の形`(n, 3)`または`(n, 4)`の配列．default=None.
+
+          values (numpy.ndarray) : 点ごとの値の配列．色地図`cmap`で色付けする．default=None.
+
+          cmap (str, cm.Colormap) : 色地図．関数`cm.get_colormap()`を参照のこと．default=None.
+
+          vmin, vmax (float) : 色地図の両端に対応する値．default=None.
+
+          alpha (float) : `values`で色付けするときの不透明度．default=None.
+
+          **kwargs (dict) : 上位コマンドに渡すオプション引数．`rgbs`と`values`がなければ，全ての点を`rgb`の色で描く．`fill`の既定値は，塗りつぶすマーカー（`crt.FILLED_MARKERS`）ならば'fill'，それ以外は'stroke'．
+
+    Note:
+          生成時に一度だけ，点を色ごとの組に分ける．描画では，色の組ごとに一つのパスを作り，一度だけ書き出す．包含矩形は，配列の最小値と最大値から求める．座標が非数の点，および値が不正な点は描かない．
+
+    Examples::
+
+            #十万個の点を，値で色付けした円で描く
+            S = bd.DrawScatter(x=np.random.rand(100000)*400, y=np.random.rand(100000)*400,
+                               size=1.0, values=np.random.rand(100000), cmap='viridis')
+    """
+    def __init__(self,
+                 x=None,
+                 y=None,
+                 size=None,
+                 marker='circle',
+                 rgbs=None,
+                 values=None,
+                 cmap=None,
+                 vmin=None,
+                 vmax=None,
+                 alpha=None,
+                 **kwargs):
+        com.ensure(x is not None and y is not None, f'x and y must not be None!')
+        com.ensure(marker in crt.MARKER_SHAPES,
+                   f'marker={marker} must be one of {crt.MARKER_SHAPES}!')
+        super().__init__(cmd='scatter', **kwargs)
+        xs = np.asarray(x, dtype=float).ravel()
+        ys = np.asarray(y, dtype=float).ravel()
+        com.ensure(xs.shape == ys.shape, f'x and y must have the same length!')
+        rs = np.broadcast_to(np.asarray(crt.DEFAULT_MARKER_RADIUS if size is None else size,
+                                        dtype=float), xs.shape)
+        keep = np.isfinite(xs) & np.isfinite(ys)
+        self.marker : str = marker
+        self.fill : str = kw.get(self.kwargs, 'fill',
+                                 default=('fill' if marker in crt.FILLED_MARKERS else 'stroke'))
+
+        ## 点を色ごとの組に分ける
+        if values is not None:
+            _cmap = cm.get_colormap(cmap)
+            keys, bad = _cmap.index(np.asarray(values).ravel(), vmin=vmin, vmax=vmax)
+            keep &= ~bad
+            palette = _cmap.lut_float
+            if alpha != None:
+                palette = np.column_stack((palette[:, :3], np.full(len(palette), alpha)))
+            ukeys, inverse = np.unique(keys[keep], return_inverse=True)
+            colors = palette[ukeys]
+        elif rgbs is not None:
+            _rgbs = np.asarray(rgbs, dtype=float).reshape(len(xs), -1)
+            colors, inverse = np.unique(_rgbs[keep], axis=0, return_inverse=True)
+        else:
+            colors, inverse = [ None ], np.zeros(int(keep.sum()), dtype=np.int64)
+        xs, ys, rs = xs[keep], ys[keep], rs[keep]
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind='stable')
+        ends = np.cumsum(np.bincount(inverse, minlength=len(colors)))
+        self.groups_ : list = [] #組`(style, xs, ys, rs)`のリスト
+        for k, color in enumerate(colors):
+            idx = order[(ends[k - 1] if k > 0 else 0):ends[k]]
+            if len(idx) == 0:
+                continue
+            style = self.style
+            if color is not None:
+                style = style._replace(source_rgb=tuple(float(c) for c in color))
+            self.groups_.append((style, xs[idx], ys[idx], rs[idx]))
+        self.extent_ = EMPTY_RECT
+        if len(xs) > 0:
+            self.extent_ = (float((xs - rs).min()), float((ys - rs).min()),
+                            float((xs + rs).max()), float((ys + rs).max()))
+        return
+
+    #Override
+    def arrange_box_self(self):
+        self.box = self.extent_
+        return
+
+    #Override
+    def draw_me_impl(self, cr):
+        finish = crt.cr_resolve_stroke_or_fill(fill=self.fill)
+        for style, xs, ys, rs in self.groups_:
+            crt.cr_apply_style(style=style, context=cr)
+            crt.cr_markers(self.marker, xs, ys, rs, context=cr)
+            getattr(cr, finish)()
+        return
+
+    #Override
+    def compile_me_impl(self, dlist, ox, oy) -> bool:
+        for style, xs, ys, rs in self.groups_:
+            dlist.add_markers(self.marker, xs + ox, ys + oy, rs,
+                              style_id=dlist.intern_style(style), fill=self.fill)
+        return True
+
+#======
+# 画像の描画
+#======
+
+class DrawImage(DrawCommandBase):
+    """画像を描く描画演算オブジェクトのクラス．DrawCommandBaseクラスのサブクラス．
+    NumPy配列の画素を，一つのノードとして，矩形`(x, y, width, height)`に拡大縮小して描く．
+
+    Args: 
+          data (numpy.ndarray) : 形`(h, w, 4)`または`(h, w, 3)`のuint8のRGBA（RGB）配列．必須．
+
+          x, y (float) : 左上の位置．default=0.0. 
+
+          width, height (float) : 描画する大きさ．default=None. Noneならば画素数．
+
+          filter (str) : 拡大縮小の補間の方法（fast, good, best, nearest, bilinear）．default=None. Noneならば'good'．
+
+          alpha (float) : 不透明度．default=None. 
+
+          is_argb32 (bool) : `data`がアルファ乗算済みのFORMAT_ARGB32の配列か．真ならば複写せずに共有する．default=False.
+
+          **kwargs (dict) : 上位コマンドに渡すオプション引数．
+
+    Note: 
+          RGBAの配列は，生成時に一度だけFORMAT_ARGB32に変換する．描画のたびには，変換も複写もしない．
+    """
+    def __init__(self,
+                 data=None, 
+                 x=0.0, 
+                 y=0.0,
+                 width=None, 
+                 height=None, 
+                 filter=None, 
+                 alpha=None, 
+                 is_argb32=False, 
+                 **kwargs):
+        com.ensure(data is not None, f'data must not be None!')
+        self.argb_ = crt.to_argb32_image(data, is_argb32=is_argb32)
+        h, w = self.argb_.shape[:2]
+        self.x : float = x
+        self.y : float = y
+        self.width : float = w if width == None else width
+        self.height : float = h if height == None else height
+        self.filter : str = filter
+        self.alpha : float = alpha
+        super().__init__(cmd='image', **kwargs)
+        return 
+
+    #Override 
+    def arrange_box_self(self):
+        self.box = (self.x, self.y, self.x + self.width, self.y + self.height)
+        return 
+
+    #Override 
+    def draw_me_impl(self, cr):
+        crt.cr_draw_image(self.argb_, self.x, self.y, self.width, self.height,
+                          filter=self.filter, alpha=self.alpha, context=cr)
+        return 
+
+    #Override 
+    def compile_me_impl(self, dlist, ox, oy) -> bool:
+        dlist.add_image(self.argb_, ox + self.x, oy + self.y, self.width, self.height,
+                        filter=self.filter, alpha=self.alpha)
+        return True
+
+class DrawHeatmap(DrawImage):
+    """実数の2次元配列を，色地図で色付けして描く描画演算オブジェクトのクラス．DrawImageクラスのサブクラス．
+
+    Args: 
+          values (numpy.ndarray) : 形`(h, w)`の実数の配列．必須．
+
+          cmap (str, cm.Colormap) : 色地図．関数`cm.get_colormap()`を参照のこと．default=None. Noneならば'grey'.
+
+          colors (list(tuple)) : 色地図の代わりに，連続の色地図を作る色の列．default=None.
+
+          vmin, vmax (float) : 色地図の両端に対応する値．default=None.
+
+          filter (str) : 拡大縮小の補間の方法．default='nearest'.
+
+          **kwargs (dict) : DrawImageクラスに渡すオプション引数（x, y, width, height, alpha）．
+
+    Examples:: 
+    
+            #1000x1000の行列を，400x400の矩形に一つのノードで描く
+            H = bd.DrawHeatmap(values=np.random.rand(1000, 1000), width=400, height=400,
+                               cmap='viridis')
+    """
+    def __init__(self, values=None, cmap=None, colors=None, vmin=None, vmax=None,
+                 filter='nearest', **kwargs):
+        com.ensure(values is not None, f'values must not be None!')
+        com.ensure(getattr(values, 'ndim', 2) == 2, f'values must be a 2-D array!')
+        self.cmap : cm.Colormap = cm.get_colormap(colors if colors is not None else cmap)
+        argb = self.cmap.to_argb32(values, vmin=vmin, vmax=vmax)
+        super().__init__(data=argb, is_argb32=True, filter=filter, **kwargs)
         return 
 
 #======
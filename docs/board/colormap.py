@@ -0,0 +1,230 @@
+# coding: utf_8
+# colormap.py
+"""色地図（colormap）のモジュール．
+
+* 値の配列を，事前計算した色の表（LUT, lookup table）を引くことで，一度のベクトル化された呼び出しで色の配列に写す．要素ごとの色の解決を行わない．
+* 連続（sequential），発散（diverging），分類（categorical）の色地図をもつ．名前で登録し，関数`get_colormap()`で取得する．
+* 結果は，RGBAの配列，アルファ乗算済みのFORMAT_ARGB32の配列（画像のボード用），実数の色の配列（図形の描画用）のいずれでも得られる．
+
+Attributes:
+
+DEFAULT_LUT_SIZE = 256 (int): 連続と発散の色地図の表の大きさ
+
+FINE_LUT_SIZE = 4096 (int): 細かい階調の表の大きさ
+
+KINDS (tuple(str)): 色地図の種類
+
+Example::
+
+     import colormap as cm
+     rgba = cm.get_colormap('viridis')(values)                  #RGBAのuint8配列
+     argb = cm.get_colormap('coolwarm', size=cm.FINE_LUT_SIZE).to_argb32(values)
+     rgb = cm.get_colormap('tab10').color(3)                    #実数の色の組
+"""
+import numpy as np
+
+import common as com
+import crtool as crt
+
+DEFAULT_LUT_SIZE = 256
+FINE_LUT_SIZE = 4096
+KINDS = ('sequential', 'diverging', 'categorical')
+
+#=====
+# 色地図
+#=====
+
+class Colormap:
+    """色の表（LUT）による色地図のクラス．
+
+    Args:
+         colors (list(tuple)) : 色`(r,g,b)`または`(r,g,b,a)`の列．各成分は[0,1]．連続と発散の色地図では，等間隔に並べて区分線形に補間する．分類の色地図では，そのまま表とする．
+
+         kind (str) : 色地図の種類．`KINDS`のいずれか．default='sequential'.
+
+         size (int) : 連続と発散の色地図の表の大きさ．default=DEFAULT_LUT_SIZE.
+
+         name (str) : 名前．default=None.
+
+    Attributes:
+         lut (numpy.ndarray) : 形`(size, 4)`のuint8のRGBAの表
+
+         lut_float (numpy.ndarray) : 形`(size, 4)`の実数のRGBAの表
+
+         lut_argb32 (numpy.ndarray) : 形`(size, 4)`のuint8の，アルファ乗算済みのFORMAT_ARGB32の表
+
+    Note:
+         非数（NaN）などの不正な値は，透明`(0,0,0,0)`に写す．
+    """
+    def __init__(self, colors=None, kind='sequential', size=DEFAULT_LUT_SIZE, name=None):
+        com.ensure(kind in KINDS, f'kind={kind} must be one of {KINDS}!')
+        com.ensure(colors is not None and len(colors) > 0, f'colors must not be empty!')
+        self.name : str = name
+        self.kind : str = kind
+        _colors = np.array([ crt.cr_add_alpha(c, alpha=1.0) for c in colors ], dtype=float)
+        if kind == 'categorical' or len(_colors) == 1:
+            self.lut_float = _colors
+        else:
+            com.ensure(size >= 2, f'size={size} must be >= 2!')
+            t = np.linspace(0.0, 1.0, size)
+            stops = np.linspace(0.0, 1.0, len(_colors))
+            self.lut_float = np.stack([ np.interp(t, stops, _colors[:, k]) for k in range(4) ],
+                                      axis=1)
+        self.lut = np.rint(self.lut_float*255).astype(np.uint8)
+        self.lut_argb32 = crt.rgba_to_argb32(self.lut[np.newaxis])[0]
+        return
+
+    def __len__(self):
+        return len(self.lut)
+
+    def __repr__(self):
+        return f'Colormap(name={self.name}, kind={self.kind}, size={len(self)})'
+
+    def index(self, values, vmin=None, vmax=None) -> tuple:
+        """値の配列`values`を，表の添字の配列に写す．
+
+        Args:
+             values (numpy.ndarray) : 値の配列．分類の色地図では，整数の類番号（表の大きさで剰余をとる）．
+
+             vmin, vmax (float) : 表の両端に対応する値．default=None. Noneならば，有限な値の最小値と最大値．発散の色地図では，0を中心に対称にとる．
+
+        Returns:
+             (tuple) : 組`(idx, bad)`．`idx`は添字の整数配列，`bad`は不正な値を真とする配列．
+        """
+        values = np.asarray(values)
+        n = len(self.lut)
+        if self.kind == 'categorical':
+            if np.issubdtype(values.dtype, np.integer):
+                return values % n, np.zeros(values.shape, dtype=bool)
+            bad = ~np.isfinite(values)
+            return np.where(bad, 0, values).astype(np.int64) % n, bad
+        values = values.astype(float, copy=False)
+        bad = ~np.isfinite(values)
+        if vmin == None or vmax == None:
+            good = values[~bad]
+            lo, hi = (float(good.min()), float(good.max())) if good.size > 0 else (0.0, 1.0)
+            if self.kind == 'diverging':
+                m = max(abs(lo), abs(hi))
+                lo, hi = -m, m
+            if vmin == None: vmin = lo
+            if vmax == None: vmax = hi
+        span = (vmax - vmin) or 1.0
+        with np.errstate(invalid='ignore'):
+            t = np.rint((values - vmin)*((n - 1)/span))
+        idx = np.clip(np.where(bad, 0, t), 0, n - 1).astype(np.int64)
+        return idx, bad
+
+    def __call__(self, values, vmin=None, vmax=None) -> np.ndarray:
+        """値の配列`values`を，RGBAのuint8配列（形`values.shape + (4,)`）に写す．
+        """
+        idx, bad = self.index(values, vmin=vmin, vmax=vmax)
+        rgba = self.lut[idx]
+        rgba[bad] = 0
+        return rgba
+
+    def to_argb32(self, values, vmin=None, vmax=None) -> np.ndarray:
+        """値の配列`values`を，アルファ乗算済みのFORMAT_ARGB32のuint8配列（形`values.shape + (4,)`）に写す．
+        2次元の配列の結果は，`DrawImage(data=..., is_argb32=True)`にそのまま渡せる．
+        """
+        idx, bad = self.index(values, vmin=vmin, vmax=vmax)
+        argb = self.lut_argb32[idx]
+        argb[bad] = 0
+        return argb
+
+    def to_float(self, values, vmin=None, vmax=None, alpha=None) -> np.ndarray:
+        """値の配列`values`を，実数のRGBAの配列（形`values.shape + (4,)`）に写す．図形の描画の色に用いる．
+
+        Args:
+             alpha (float) : 不透明度．default=None. Noneならば表の値．
+        """
+        idx, bad = self.index(values, vmin=vmin, vmax=vmax)
+        rgba = self.lut_float[idx]
+        if alpha != None:
+            rgba[..., 3] = alpha
+        rgba[bad] = 0.0
+        return rgba
+
+    def color(self, value, vmin=0.0, vmax=1.0, alpha=None) -> tuple:
+        """一つの値`value`の色を，実数の組`(r,g,b)`（`alpha`を与えれば`(r,g,b,a)`）で返す．
+        """
+        idx, bad = self.index(np.array([value]), vmin=vmin, vmax=vmax)
+        c = self.lut_float[idx[0]]
+        if alpha == None:
+            return (float(c[0]), float(c[1]), float(c[2]))
+        return (float(c[0]), float(c[1]), float(c[2]), alpha)
+
+    pass ##class Colormap
+
+#=====
+# 登録された色地図
+#=====
+
+def _hex(s):
+    return tuple(int(s[k:k + 2], 16)/255 for k in (0, 2, 4))
+
+COLORMAP_COLORS = {
+    ## sequential
+    'grey': ('sequential', [(0.0, 0.0, 0.0), (1.0, 1.0, 1.0)]),
+    'viridis': ('sequential', [(0.267004, 0.004874, 0.329415), (0.282623, 0.140926, 0.457517),
+                               (0.229739, 0.322361, 0.545706), (0.172719, 0.448791, 0.557885),
+                               (0.127568, 0.566949, 0.550556), (0.157851, 0.683765, 0.501686),
+                               (0.369214, 0.788888, 0.382914), (0.678489, 0.863742, 0.189503),
+                               (0.993248, 0.906157, 0.143936)]),
+    'heat': ('sequential', [(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (1.0, 1.0, 0.0), (1.0, 1.0, 1.0)]),
+    'blues': ('sequential', [(0.97, 0.98, 1.0), (0.42, 0.68, 0.84), (0.03, 0.19, 0.42)]),
+    ## diverging
+    'coolwarm': ('diverging', [(0.230, 0.299, 0.754), (0.865, 0.865, 0.865), (0.706, 0.016, 0.150)]),
+    'bwr': ('diverging', [(0.0, 0.0, 1.0), (1.0, 1.0, 1.0), (1.0, 0.0, 0.0)]),
+    ## categorical
+    'dark': ('categorical', list(crt.DARKCOL.values())),
+    'solid': ('categorical', [ crt.MYCOL[name] for name in crt.solid if name in crt.MYCOL ]),
+    'tab10': ('categorical', [ _hex(s) for s in ('1f77b4', 'ff7f0e', '2ca02c', 'd62728', '9467bd',
+                                                 '8c564b', 'e377c2', '7f7f7f', 'bcbd22', '17becf') ]),
+}
+
+_COLORMAP_CACHE = {} #(名前, 表の大きさ)から色地図への辞書
+
+def register_colormap(name=None, colors=None, kind='sequential'):
+    """色地図を名前`name`で登録する．既に登録されていれば置き換える．
+    """
+    com.ensure(isinstance(name, str), f'name={name} must be str!')
+    com.ensure(kind in KINDS, f'kind={kind} must be one of {KINDS}!')
+    COLORMAP_COLORS[name.lower()] = (kind, list(colors))
+    for key in [ key for key in _COLORMAP_CACHE if key[0] == name.lower() ]:
+        del _COLORMAP_CACHE[key]
+    return
+
+def get_colormap(cmap=None, size=DEFAULT_LUT_SIZE) -> Colormap:
+    """色地図を返す．表は初回に一度だけ計算して，再利用する．
+
+    Args:
+         cmap (str, Colormap, list(tuple)) : 登録された色地図の名前，色地図，または，連続の色地図を作る色の列．default=None. Noneならば'grey'.
+
+         size (int) : 連続と発散の色地図の表の大きさ．default=DEFAULT_LUT_SIZE.
+
+    Returns:
+         (Colormap) : 色地図
+    """
+    if isinstance(cmap, Colormap):
+        return cmap
+    if cmap is None:
+        cmap = 'grey'
+    if not isinstance(cmap, str):
+        return Colormap(colors=cmap, kind='sequential', size=size)
+    key = (cmap.lower(), size)
+    colormap = _COLORMAP_CACHE.get(key)
+    if colormap == None:
+        entry = crt.lookup_dict(COLORMAP_COLORS, key=cmap)
+        if entry == None:
+            com.panic(f'no such a colormap={cmap}!: it must be one of: {", ".join(COLORMAP_COLORS)}')
+        kind, colors = entry
+        colormap = _COLORMAP_CACHE[key] = Colormap(colors=colors, kind=kind, size=size,
+                                                   name=key[0])
+    return colormap
+
+def apply_colormap(values, cmap=None, vmin=None, vmax=None, size=DEFAULT_LUT_SIZE) -> np.ndarray:
+    """値の配列`values`を，色地図`cmap`でRGBAのuint8配列に写す．関数`get_colormap()`と`Colormap.__call__()`を参照のこと．
+    """
+    return get_colormap(cmap, size=size)(values, vmin=vmin, vmax=vmax)
+
+##EOF
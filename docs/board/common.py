@@ -2,8 +2,11 @@
 # coding: utf_8
 # bintree.py
 import sys
+import os
 import random
 import math 
+import contextlib
+from typing import NamedTuple
 # import kwargs as kw
 
 ## constants
@@ -89,6 +92,61 @@ def ensure_defined(value=None, default=None, required=False):
 	else:
 		return value 
           
+##=====
+## 検査の水準
+##=====
+
+VALIDATION_MODES = ('strict', 'debug', 'production')
+_STRICT, _DEBUG, _PRODUCTION = 0, 1, 2
+_validation_level = _DEBUG #VALIDATION_MODESの添字．関数set_validation_mode()で変える
+
+def set_validation_mode(mode='debug') -> str:
+    """プロセス全体の検査の水準を`mode`に設定し，直前の水準を返す．初期値は，環境変数`BOARD_VALIDATION`で与えられる．
+
+    * 'strict' : 全ての検査を行う．検査済みの値の型（`Point`, `Shape`, `Box`）も検査し直し，数値の非数（NaN）と無限大も拒む．
+    * 'debug' : 既定の水準．値の型と長さを検査する．検査済みの値の型は，検査せずに信頼する．
+    * 'production' : 関数`ensure_value()`, `ensure_vector()`, `ensure_point()`, `ensure_box()`は，空値の処理だけを行い，型と長さの検査を省く．
+
+    Args: 
+         mode (str) : 検査の水準．`VALIDATION_MODES`のいずれか．default='debug'.
+
+    Returns: 
+         (str) : 直前の検査の水準
+
+    Note: 
+         引数`to_check_only=True`による判定としての呼び出しと，関数`is_typeof_seq()`, `is_typeof_value()`は，水準によらず検査する．
+    """
+    global _validation_level
+    ensure(mode in VALIDATION_MODES, f'mode={mode} must be one of {VALIDATION_MODES}!')
+    prev = VALIDATION_MODES[_validation_level]
+    _validation_level = VALIDATION_MODES.index(mode)
+    return prev
+
+def get_validation_mode() -> str:
+    """現在の検査の水準を返す．関数`set_validation_mode()`を参照のこと．
+    """
+    return VALIDATION_MODES[_validation_level]
+
+@contextlib.contextmanager
+def validation_mode(mode=None):
+    """文脈の中でだけ，検査の水準を`mode`に変える．Noneならば変えない．
+
+    Example::
+
+         with com.validation_mode('production'):
+              CV.show()
+    """
+    if mode == None:
+        yield
+        return
+    prev = set_validation_mode(mode)
+    try:
+        yield
+    finally:
+        set_validation_mode(prev)
+
+set_validation_mode(os.environ.get('BOARD_VALIDATION', 'debug'))
+
 ##=====
 ## 便利関数：型チェック
 ##=====
@@ -144,6 +202,65 @@ def _normalize_elemtype(etype=None):
         panic(f'normalize_elemtype: etype="{elemetype}" must be a type object!')
     return etypes_
 
+_ELEMTYPE_CACHE = {}  #型指定から，型のタプルへの辞書
+_PREDICATE_CACHE = {} #組(型指定, 長さ)から，判定関数への辞書
+
+def compile_elemtype(etype=None) -> tuple:
+    """型指定etypeを，標準関数isinstance()に渡せる型のタプルに変換して返す．
+    変換は，型指定ごとに初回に一度だけ関数elemtype_normalize()で検査して行い，以降は再利用する．
+
+    Args: 
+         etype (Object) : 基礎型，または，基礎型のタプル（和）
+
+    Returns: 
+         (tuple(型)) : 型のタプル．etype==NoneならばNone．
+    """
+    if etype == None:
+        return None
+    types_ = _ELEMTYPE_CACHE.get(etype) if isinstance(etype, (type, tuple)) else None
+    if types_ == None:
+        types_ = _ELEMTYPE_CACHE[etype] = tuple(elemtype_normalize(etype))
+    return types_
+
+def seq_predicate(etype=None, dim=None):
+    """系列の型指定`(etype, dim)`を，判定関数に翻訳して返す．判定関数は，関数is_typeof_seq()と同じ判定を行う．
+    翻訳は，型指定ごとに初回に一度だけ行い，以降は再利用する．
+
+    Args: 
+         etype (Type) : 要素型，または，型の選言を表すタプル．Noneならば任意の型．
+
+         dim (int) : 系列が満たすべき長さ．Noneならば任意の長さ．
+
+    Returns: 
+         (function) : 一引数の判定関数`pred(L) -> bool`
+
+    Example:: 
+
+       >>> is_pair = com.seq_predicate(etype=(float, int), dim=2)
+       >>> is_pair((1, 2.0))
+       True
+    """
+    key = (etype, dim)
+    pred = _PREDICATE_CACHE.get(key)
+    if pred != None:
+        return pred
+    types_ = compile_elemtype(etype)
+    
+    def pred(L):
+        if not (isinstance(L, tuple) or isinstance(L, list) or hasattr(L, '__iter__')):
+            return False
+        if dim != None and len(L) != dim:
+            return False
+        if types_ == None:
+            return True
+        for elem in L:
+            if not isinstance(elem, types_):
+                return False
+        return True
+    
+    _PREDICATE_CACHE[key] = pred
+    return pred
+
 def is_typeof_seq(L, etype=None, dim=None, verbose=False):
     """オブジェクトLが，指定された型と長さをもつ系列オブジェクトかを真偽で返す．
     さらに系列型であり，etypeがNoneでないときに，系列の全ての要素が型etypeをもつならば`True`，そうでなければ`False`を返す．
@@ -173,42 +290,26 @@ def is_typeof_seq(L, etype=None, dim=None, verbose=False):
        >>> com.is_typeof_seq([1,'b',3], etype=(int, str))     
        True 
     """
-    ## 型引数のテスト
-    etypes_ = elemtype_normalize(etype)
-     
-    ## 系列型かどうかをテスト
-    if isinstance(L, tuple) or isinstance(L, list):
-        isSeq = True
-    elif hasattr(L, '__iter__'):
-        ## iterableかどうかを判定する標準の書き方
-        isSeq = True
-    else:
-        isSeq = False
-
-    ##長さテスト
-    if isSeq and dim!=None and len(L) != dim:
-        if verbose: print(f'warning: common.is_sequence: it must have dim={dim} but len={len(L)}!')
-        return False
-     
-    if not isSeq: 
-        if verbose: print(f'warning: common.is_sequence: the object L is not of sequence type!: L={L}')
-        return False
-    else: ## isSeq==True
-        ## もしtypeが与えられていたら，さらに要素型をテストする
-        if etypes_ == None:
-            return True
-        else:
-            for idx, elem in enumerate(L):
-                res_ = False
-                for ty in etypes_: 
-                    if isinstance(elem, ty):
-                        res_ = True
-                        break
-                if not res_: 
-                    if verbose: print(f'warning: common.is_sequence: the {idx}-th element "{elem}" does not satisfies etype "{etype}" in the sequence {L}!')
-                    return False
-        ## 全ての要素が要素型を満たした
+    if seq_predicate(etype=etype, dim=dim)(L):
         return True
+    if verbose:
+        _warn_seq_mismatch(L, etype=etype, dim=dim)
+    return False
+
+def _warn_seq_mismatch(L, etype=None, dim=None):
+    """関数is_typeof_seq()の補助関数．系列Lが型指定を満たさない理由を警告する．
+    """
+    if not (isinstance(L, tuple) or isinstance(L, list) or hasattr(L, '__iter__')):
+        print(f'warning: common.is_sequence: the object L is not of sequence type!: L={L}')
+    elif dim!=None and len(L) != dim:
+        print(f'warning: common.is_sequence: it must have dim={dim} but len={len(L)}!')
+    else:
+        types_ = compile_elemtype(etype)
+        for idx, elem in enumerate(L):
+            if not isinstance(elem, types_):
+                print(f'warning: common.is_sequence: the {idx}-th element "{elem}" does not satisfies etype "{etype}" in the sequence {L}!')
+                break
+    return
 
 def is_typeof_value(obj, etype=None):
      """オブジェクトobjが空でなく，型etypeをもつとき，`True`を返し，それ以外のとき`False`を返す．
@@ -221,14 +322,9 @@ def is_typeof_value(obj, etype=None):
      Returns: 
           (bool) : オブジェクトobjが，etypeの型指定を満たすならば`True`を, そうでなければ`False`を返す．
      """
-     ## 引数テスト: 型リストに正規化する．単一型tは，単一元リスト(t)とする．
-     etypes_ = _normalize_elemtype(etype=etype)
-     
-     ## 要素型をテストする
-     for ty in etypes_: 
-          if isinstance(obj, ty):  
-               return True  ##型tyを満たした
-     return False ##どの型も満たさない
+     ## 引数テスト: 型のタプルに正規化する．単一型tは，単一元タプル(t,)とする．
+     ensure_defined(etype, required=True)
+     return isinstance(obj, compile_elemtype(etype))
 
 
 ##=====
@@ -247,6 +343,14 @@ def _simple_type_name(etype=None):
             s += f'{_simple_type_name(etype=ty)}'
         return s + ')'
 
+def _is_finite_seq(value) -> bool:
+    """関数ensure_vector()の補助関数．系列valueの実数の要素が，全て有限かを返す．
+    """
+    for elem in value:
+        if isinstance(elem, float) and not math.isfinite(elem):
+            return False
+    return True
+
 def ensure_value(value=None, default=None, etype=None, nullable=True, name='it', typename=None, to_check_only=False):
     """入力として受け取った値`value`が指定された要素型`etype`の値であるかを検査し，条件を満たせば値をそのまま返す．もし指定の条件を満たさなければ，エラーを投げて終了する．
 
@@ -274,17 +378,21 @@ def ensure_value(value=None, default=None, etype=None, nullable=True, name='it',
 
     Note: 
         引数`etype`の組の要素として，`None`の型を与えたい時は，要素型として`type(None)`を与えること．
+
+    Note: 
+        検査の水準が'production'ならば，`to_check_only`が偽のときは空値の処理だけを行う．関数`set_validation_mode()`を参照のこと．
     """
+    #運用時の水準では，空値の処理の他は検査を省く
+    if _validation_level == _PRODUCTION and not to_check_only and value is not None:
+        return value
     ensure(etype!=None, f'etype={etype} must be defined!')
     #判定関数に用いる場合の前処理
     if to_check_only:
         nullable = False
         default = None
-    if typename==None:
-        typename=_simple_type_name(etype)
     
     #値が空な場合の処理
-    if value==None:
+    if value is None:
         if nullable==True:
             if default != None:
                 return default
@@ -292,14 +400,14 @@ def ensure_value(value=None, default=None, etype=None, nullable=True, name='it',
                 return None
         else:
             if to_check_only: return None
-            else: com.panic(f'{name}={value} must be {typename}! case 1: value(={value})==None while nullable={nullable}')
+            else: panic(f'{name}={value} must be {typename or _simple_type_name(etype)}! case 1: value(={value})==None while nullable={nullable}')
         
-    #指定された型の値の対か？
-    if is_typeof_value(value, etype=etype):
+    #指定された型の値か？
+    if isinstance(value, compile_elemtype(etype)):
         return value
     else:
         if to_check_only: return None
-        else: com.panic(f'{name}={value} must be {typename}! case 2: value={value} is not a sequence of specified type={etype}')
+        else: panic(f'{name}={value} must be {typename or _simple_type_name(etype)}! case 2: value={value} is not a sequence of specified type={etype}')
           
 def ensure_vector(value=None, dim=2, default=None, etype=None, nullable=True, name='it', typename=None, to_check_only=False):
     """入力として受け取った値`value`が指定された要素型`etype`と要素数`dim`をもつ数値の組であるかを検査し，条件を満たせば値をそのまま返す．もし指定の条件を満たさなければ，エラーを投げて終了する．
@@ -330,17 +438,21 @@ def ensure_vector(value=None, dim=2, default=None, etype=None, nullable=True, na
 
     Note: 
         引数`etype`の組の要素として，`None`の型を与えたい時は，要素型として`type(None)`を与えること．
+
+    Note: 
+        検査の水準が'production'ならば，`to_check_only`が偽のときは空値の処理だけを行う．関数`set_validation_mode()`を参照のこと．
     """
+    #運用時の水準では，空値の処理の他は検査を省く
+    if _validation_level == _PRODUCTION and not to_check_only and value is not None:
+        return value
     ensure(etype!=None, f'etype={etype} must be non-None!')
     #判定関数に用いる場合の前処理
     if to_check_only:
         nullable = False
         default = None
-    if typename==None:
-        typename=_simple_type_name(etype)
     
     #値が空な場合の処理
-    if value==None:
+    if value is None:
         if nullable==True:
             if default != None:
                 return default
@@ -348,15 +460,18 @@ def ensure_vector(value=None, dim=2, default=None, etype=None, nullable=True, na
                 return None
         else:
             if to_check_only: return None
-            else: com.panic(f'{name}={value} must be {typename}! case 1: value(={value})==None while nullable={nullable}')
+            else: panic(f'{name}={value} must be {typename or _simple_type_name(etype)}! case 1: value(={value})==None while nullable={nullable}')
         
-    #指定された型の値の対か？
-    if not is_typeof_seq(value, etype=etype):
+    #指定された型の値の組か？
+    if not seq_predicate(etype=etype)(value):
         if to_check_only: return None
-        else: com.panic(f'{name}={value} must be {typename}! case 2: value={value} is not a sequence of specified type={etype}')
+        else: panic(f'{name}={value} must be {typename or _simple_type_name(etype)}! case 2: value={value} is not a sequence of specified type={etype}')
     elif len(value) != dim:
         if to_check_only: return None
-        else: com.panic(f'{name}={value} must be {typename}! case 3: value={value} has wrong length where len(value)(={len(value)})==dim(={dim})')
+        else: panic(f'{name}={value} must be {typename or _simple_type_name(etype)}! case 3: value={value} has wrong length where len(value)(={len(value)})==dim(={dim})')
+    elif _validation_level == _STRICT and not _is_finite_seq(value):
+        if to_check_only: return None
+        else: panic(f'{name}={value} must be {typename or _simple_type_name(etype)}! case 4: value={value} has a non-finite number in strict validation mode')
     else:
         return value
           
@@ -379,11 +494,15 @@ def ensure_point(value=None, name=None, nullable=True, default=None, etype=None,
 
          to_check_only (bool) : もし真ならば，型を満たさない時は，エラーを投げずに実行されて，Noneを返す．default is False．ここに，to_check_onlyが真ならば，`nullable==False`および`default = None`に上書きされるので注意．
     """
+    if _validation_level == _PRODUCTION and not to_check_only and value is not None:
+        return value #運用時の水準
     if etype==None:
+        if (type(value) is Point or type(value) is Shape) and _validation_level != _STRICT:
+            return value #生成時に検査済み
         etype = (float,int) #要素型のdefaultは，数値型
         typename='a point'
     else:  
-        typename=_simple_type_name(etype)
+        typename=None #エラー時に求める
         
     return ensure_vector(value=value, default=default,
                          etype=etype, nullable=nullable, 
@@ -411,16 +530,78 @@ def ensure_box(value=None, name=None, nullable=True, default=None, etype=None, t
 
          to_check_only (bool) : もし真ならば，型を満たさない時は，エラーを投げずに実行されて，Noneを返す．default is False．ここに，to_check_onlyが真ならば，`nullable==False`および`default = None`に上書きされるので注意．
     """
+    if _validation_level == _PRODUCTION and not to_check_only and value is not None:
+        return value #運用時の水準
     if etype==None:
+        if type(value) is Box and _validation_level != _STRICT:
+            return value #生成時に検査済み
         etype = (float,int) #要素型のdefaultは，数値型
         typename='a point'
     else:  
-        typename=_simple_type_name(etype)
+        typename=None #エラー時に求める
     return ensure_vector(value=value, default=default,
                          etype=etype, nullable=nullable, 
                          dim=4, name=name, typename=typename,
                          to_check_only=to_check_only)
     
+##=====
+## 値の型：点，形状，矩形
+##=====
+
+class Point(NamedTuple):
+    """点`(x, y)`の値の型．変更不可であり，タプルとして扱える．
+    関数`to_point()`で一度だけ検査して作り，以降は型により信頼する．関数`ensure_point()`は，この型の値を検査せずに返す．
+    """
+    x : float
+    y : float
+
+    def __repr__(self):
+        return tuple.__repr__(self) #タプルと同じ表示
+
+class Shape(NamedTuple):
+    """形状`(width, height)`の値の型．関数`to_shape()`で作る．関数`ensure_point()`は，この型の値を検査せずに返す．
+    """
+    width : float
+    height : float
+
+    def __repr__(self):
+        return tuple.__repr__(self) #タプルと同じ表示
+
+class Box(NamedTuple):
+    """矩形`(x0, y0, x1, y1)`の値の型．関数`to_box()`で作る．関数`ensure_box()`は，この型の値を検査せずに返す．
+    """
+    x0 : float
+    y0 : float
+    x1 : float
+    y1 : float
+
+    def __repr__(self):
+        return tuple.__repr__(self) #タプルと同じ表示
+
+def to_point(value=None, name=None, nullable=True) -> Point:
+    """値`value`を検査して，点`Point`として返す．既に`Point`ならば，検査せずにそのまま返す．Noneは，`nullable`が真ならばNoneを返す．
+    """
+    if type(value) is Point:
+        return value
+    value = ensure_point(value, name=name, nullable=nullable)
+    return None if value is None else Point(*value)
+
+def to_shape(value=None, name=None, nullable=True) -> Shape:
+    """値`value`を検査して，形状`Shape`として返す．既に`Shape`ならば，検査せずにそのまま返す．
+    """
+    if type(value) is Shape:
+        return value
+    value = ensure_point(value, name=name, nullable=nullable)
+    return None if value is None else Shape(*value)
+
+def to_box(value=None, name=None, nullable=True) -> Box:
+    """値`value`を検査して，矩形`Box`として返す．既に`Box`ならば，検査せずにそのまま返す．
+    """
+    if type(value) is Box:
+        return value
+    value = ensure_box(value, name=name, nullable=nullable)
+    return None if value is None else Box(*value)
+
 ##=====
 ## 便利関数：コマンドライン入力
 ##=====
@@ -31,6 +31,9 @@ Attributes:
     * 'round': cairo.LINE_JOIN_ROUND
     * 'bevel': cairo.LINE_JOIN_BEVEL
 
+  STYLE_ALIASES (kwargs.AliasTable) : 
+    文脈パラメータのキーワードの正規名と代替キーの表．関数`cr_set_context_parameters()`を参照のこと．
+
   ANCHOR_X (dict(str, float)) : 
     位置合わせ用のx方向のアンカー値を表す定数の辞書．範囲`[0,1]`の値をとり，辺上の正規化された位置を表す．複数の別名を提供している．
 
@@ -63,7 +66,10 @@ Attributes:
 """
 import sys
 import math 
-from typing import Any, NoReturn
+import struct
+import zlib
+from typing import Any, NoReturn, NamedTuple
+import numpy as np
 import cairo 
 
 import common as com 
@@ -110,6 +116,26 @@ LINE_JOIN = {
     'bevel': cairo.LINE_JOIN_BEVEL,     #pycairo
 }
 
+#文脈パラメータの代替キー
+STYLE_ALIASES = kw.AliasTable({
+    'source_rgb': ['rgb'],
+    'linewidth': ['line_width', 'pen_width'],
+    'linecap': ['line_cap', 'line_end'],
+    'linejoin': ['line_join', 'line_end'],
+    'fontfamily': ['font_family', 'ffamily'],
+    'fontslant': ['font_slant', 'fslant'],
+    'fontweight': ['font_weight', 'fweight'],
+    'fontsize': ['font_size', 'fsize'],
+}, name='style')
+
+FILTER = {
+    'fast': cairo.Filter.FAST,         #pycairo
+    'good': cairo.Filter.GOOD,         #pycairo
+    'best': cairo.Filter.BEST,         #pycairo
+    'nearest': cairo.Filter.NEAREST,   #pycairo
+    'bilinear': cairo.Filter.BILINEAR, #pycairo
+}
+
 #色
 fancy = ['lightskyblue', 'lightgreen', 'lightgrey']
 solid = ['red', 'lightcoral', 'orange', 'darkorchid', 'royalblue', ]
@@ -341,14 +367,14 @@ def box_from_shape(shape=None, origin=None):
         com.ensure_point(origin, name='origin') 
     x0, y0 = origin
     x1, y1 = vt_add(origin, shape)
-    return x0, y0, x1, y1 
+    return com.Box(x0, y0, x1, y1)
 
 def box_to_shape(box):
     """矩形 box = (x0, y0, x1, y1)を受け取り，その幅widthと高さheightを返す．
     """
     x0, y0, x1, y1 = box_normalize(box)
     width, height = x1 - x0, y1 - y0
-    return width, height
+    return com.Shape(width, height)
 
 #長方形の和（最小包含矩形）
 def box_union(boxes, box1, verbose=False):
@@ -370,7 +396,7 @@ def box_union(boxes, box1, verbose=False):
         y0 = min(boxes[1], box1[1])
         x1 = max(boxes[2], box1[2])
         y1 = max(boxes[3], box1[3])
-        return (x0, y0, x1, y1)
+        return com.Box(x0, y0, x1, y1)
 
 #=====
 # アンカー処理
@@ -428,7 +454,7 @@ def anchor_vector(anchor_str=None, default=None, strict=False):
                                      default=default)
     ax = _anchor_str_to_normal_value(adict=ANCHOR_X, key=str_pair[0], strict=strict)
     ay = _anchor_str_to_normal_value(adict=ANCHOR_Y, key=str_pair[1], strict=strict)
-    return (ax, ay)
+    return com.Point(ax, ay)
 
 def anchor_point_by_vector(box=None, vect=None):
     """矩形`box`において，正規化アンカーベクトル`vect`が表すアンカー点を返す．
@@ -440,7 +466,6 @@ def anchor_point_by_vector(box=None, vect=None):
          (tuple(float, float)) : 包含矩形box上の点 a = (ax, ay)
     """
     #boxの準備
-    com.ensure_box(box, name='box', nullable=False)
     com.ensure_point(vect, name='vect', nullable=False)
     x0, y0, x1, y1 = box_normalize(box) 
     # compute x-anchor 
@@ -453,7 +478,7 @@ def anchor_point_by_vector(box=None, vect=None):
         ay = y0
     else:
         ay = y0 * (1.0 - vect[1]) + y1 * (vect[1])
-    return ax, ay
+    return com.Point(ax, ay)
 
 #==========
 # 便利関数
@@ -498,17 +523,19 @@ class ImageBoard:
     Args: 
          imgtype (str) : 画像フォーマット (cairo)
 
-         format (str) : 出力ファイルの描画フォーマット (cairo) in "pdf", "png"
+         format (str) : 出力ファイルの描画フォーマット (cairo)．関数`register_surface_backend()`で登録したもの．default: "pdf", "png", "svg", "ps"
 
          display_shape (tuple(int, int)) : 画像のサイズ `(xsize, ysize)`
 
-         outfile (str) : 出力画像ファイル名の本体を表す文字列．例：`out`
+         outfile (str, file-like) : 出力画像ファイル名の本体を表す文字列．例：`out`．または，出力先のファイル風オブジェクト（`io.BytesIO`など）．
 
          verbose (bool) : デバッグ/実行情報の表示のフラグ
 
     Attributes: 
 
-         ims (cairo.ImageSurface, cairo.PDFSurface) : Cairoの画像オブジェクト（Surface）を保持する．
+         img_surface (cairo.Surface) : Cairoの画像オブジェクト（Surface）を保持する．
+
+         backend (SurfaceBackend) : 出力ファイルフォーマットの面の実装
 
          cr (cairo.Context) : Cairoの文脈オブジェクト．関数`context()`で取得し，各種のCairoの描画操作，または，crtoolの描画操作を適用できる．
 
@@ -524,7 +551,7 @@ class ImageBoard:
         Args: 
              imgtype (str) : 画像フォーマット (cairo)
 
-             format (str) : 出力ファイルの描画フォーマット (cairo) in "pdf", "png"
+             format (str) : 出力ファイルの描画フォーマット (cairo)．関数`register_surface_backend()`で登録したもの．
 
              display_shape (tuple(int, int)) : 画像のサイズ `(xsize, ysize)`
 
@@ -548,46 +575,23 @@ class ImageBoard:
             print(f'option: format={ self.format }')
             
         ## 出力ファイルフォーマット
-        if self.format=="png": 
-            OFILE_EXT = "png"
-        elif self.format=="pdf": 
-            OFILE_EXT = "pdf"
-        else: 
-            print(f'the file format={self.format} is not supported; instead use the default format={ "pdf"  }: ')
-            self.format = OFILE_EXT = "pdf" #default
+        self.backend = get_surface_backend(self.format)
             
         ## 出力ファイル名
-        if outfile:
-            mybody = self.outfile #本体名
+        if outfile == None or isinstance(outfile, str):
+            mybody = self.outfile or "out" #本体名
+            self.myoutfile = mybody + "." + self.backend.ext #ファイル名
         else:
-            mybody = "out"
-        self.myoutfile = mybody + "." + OFILE_EXT #ファイル名
+            self.myoutfile = outfile #ファイル風オブジェクト
 
         ##画像サイズ
         com.ensure(com.is_typeof_seq(self.display_shape, etype=(int, float)),
                    f'display_shape must be a pair of numbers: {display_shape}')
         
         ## Cairoのサーフェースの生成
-        """ class cairo.ImageSurface(format, width, height)
-        Parameters:	
-          format – FORMAT of pixels in the surface to create
-          width – width of the surface, in pixels
-          height – height of the surface, in pixels
-        Returns:	
-          a new ImageSurface
-        Raises :	
-          MemoryError in case of no memory
-        """
-        if self.format == "png": 
-            self.img_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32,
-                                          self.display_shape[0],
-                                          self.display_shape[1]) #image surface
-        elif self.format == "pdf": 
-            self.img_surface = cairo.PDFSurface(self.myoutfile,
-                                        self.display_shape[0],
-                                        self.display_shape[1]) #image surface
-        else:
-            panic(f'no such a file format={ self.format } is supported!')
+        self.img_surface = cr_create_surface(format=self.format,
+                                             outfile=self.myoutfile,
+                                             display_shape=self.display_shape) #image surface
 
         ## CairoのContext (image handle)の生成
         """ class cairo.Context(target)
@@ -608,6 +612,14 @@ class ImageBoard:
             com.panic('画像オブジェクトself.cr==None!')
         return self.cr 
 
+    def to_array(self) -> np.ndarray:
+        """画像面の画素を，複写なしのNumPy配列の表示として返す．関数`cr_surface_array()`を参照のこと．
+        配列は，本オブジェクトが生きている間だけ有効である．
+        """
+        if self.backend.is_vector: 
+            com.panic(f'ImageBoard.to_array(): the format={self.format} has no pixels!')
+        return cr_surface_array(self.img_surface)
+
     #============
     #表示
     #============
@@ -623,16 +635,410 @@ class ImageBoard:
             print(f'ImageBoard.show()...')
             print(f'@printing an image to "{ self.myoutfile }"...')
         
-        if self.format=="png":
-            self.img_surface.write_to_png(self.myoutfile)
-        elif self.format=="pdf":
-            self.cr.show_page()
-        else:
-            panic(f'the file format={ self.format } is not supported!')
-        
+        self.backend.write(self.img_surface, self.myoutfile)
         return 
     pass ##end: class Image
 
+#=====
+#出力面と記録面
+#=====
+
+class SurfaceBackend(NamedTuple):
+    """出力ファイルフォーマットごとの面（surface）の実装．関数`register_surface_backend()`で登録する．
+
+    Attributes: 
+         ext (str) : 出力ファイルの拡張子
+
+         create (callable) : 関数`create(target, width, height)`．面を生成して返す．
+
+         write (callable) : 関数`write(surface, target)`．描画済みの面を書き出す．
+
+         is_vector (bool) : ベクトル形式か．ベクトル形式の面は，生成時に出力先を受け取り，書き出し後には再利用できない．
+
+    Note: 
+         出力先`target`は，ファイル名の文字列，または，メソッド`write()`をもつファイル風オブジェクト（`io.BytesIO`，ソケット，パイプなど）である．
+    """
+    ext : str
+    create : Any
+    write : Any
+    is_vector : bool = False
+
+SURFACE_BACKENDS = {} #出力ファイルフォーマットから面の実装への辞書
+
+def register_surface_backend(format=None, ext=None, create=None, write=None,
+                             is_vector=False):
+    """出力ファイルフォーマット`format`の面の実装を登録する．既に登録されていれば置き換える．
+
+    Args: 
+         format (str) : 出力ファイルフォーマットの名前．大文字小文字の別は無視される．
+
+         ext (str) : 出力ファイルの拡張子．default=None. Noneならば`format`．
+
+         create, write, is_vector : クラス`SurfaceBackend`の属性
+    """
+    com.ensure(isinstance(format, str), f'format={format} must be str!')
+    com.ensure(callable(create) and callable(write),
+               f'create={create} and write={write} must be callable!')
+    SURFACE_BACKENDS[format.lower()] = SurfaceBackend(ext or format.lower(), create, write,
+                                                      is_vector)
+    return 
+
+def get_surface_backend(format=None) -> SurfaceBackend:
+    """出力ファイルフォーマット`format`の面の実装を返す．未登録ならば停止する．
+    """
+    backend = lookup_dict(SURFACE_BACKENDS, key=format)
+    if backend == None: 
+        com.panic(f'no such a file format={ format } is supported!: it must be one of: { ", ".join(SURFACE_BACKENDS) }')
+    return backend
+
+def get_surface_format(filename=None, default=None) -> str:
+    """ファイル名`filename`の拡張子から，出力ファイルフォーマットを返す．見つからなければ`default`を返す．
+    """
+    if isinstance(filename, str) and '.' in filename: 
+        ext = filename.rsplit('.', 1)[1].lower()
+        for format, backend in SURFACE_BACKENDS.items():
+            if backend.ext == ext: 
+                return format
+    return default
+
+def _write_vector_surface(surface, target):
+    surface.show_page()
+    surface.finish() #ファイル風オブジェクトには，ここで書き出される
+    return 
+
+register_surface_backend(
+    format="png",
+    create=lambda target, width, height: cairo.ImageSurface(
+        cairo.FORMAT_ARGB32, int(math.ceil(width)), int(math.ceil(height))),
+    write=lambda surface, target: surface.write_to_png(target))
+register_surface_backend(
+    format="pdf", create=cairo.PDFSurface, write=_write_vector_surface, is_vector=True)
+register_surface_backend(
+    format="svg", create=cairo.SVGSurface, write=_write_vector_surface, is_vector=True)
+register_surface_backend(
+    format="ps", create=cairo.PSSurface, write=_write_vector_surface, is_vector=True)
+
+def cr_create_surface(format="pdf", outfile=None, display_shape=None) -> 'cairo.Surface':
+    """出力ファイルフォーマット`format`の面（surface）を生成する．
+
+    Args: 
+         format (str) : 出力ファイルフォーマット．関数`register_surface_backend()`で登録したもの．default: "pdf", "png", "svg", "ps"
+
+         outfile (str, file-like) : 出力先のファイル名またはファイル風オブジェクト．ベクトル形式では生成時に必要である．
+
+         display_shape (tuple(float, float)) : 画像のサイズ `(xsize, ysize)`．"png"では整数に切り上げる．
+
+    Returns: 
+         (cairo.Surface) : 生成した面
+    """
+    com.ensure(com.is_typeof_seq(display_shape, etype=(int, float)),
+               f'display_shape must be a pair of numbers: {display_shape}')
+    width, height = display_shape
+    return get_surface_backend(format).create(outfile, width, height)
+
+def cr_create_context(surface) -> 'cairo.Context':
+    """面`surface`に描画する文脈オブジェクトを生成する．
+    """
+    return cairo.Context(surface)
+
+def cr_set_page_size(surface, display_shape=None):
+    """ページ付きの面（pdf, ps）の，次のページのサイズを設定する．ページに描画する前に呼ぶこと．
+    """
+    com.ensure(hasattr(surface, 'set_size'), f'surface={surface} must have pages!')
+    surface.set_size(display_shape[0], display_shape[1])
+    return 
+
+def cr_write_surface(surface, format="pdf", outfile=None):
+    """関数`cr_create_surface()`で生成した面を，出力先`outfile`に書き出す．
+    """
+    get_surface_backend(format).write(surface, outfile)
+    return 
+
+#=====
+#帯状の描画とPNGの逐次書き出し
+#=====
+
+MAX_SURFACE_SIZE = 32767    #cairoの画像面の一辺の上限（画素）
+DEFAULT_BAND_HEIGHT = 1024  #帯状の描画での帯の高さ（画素）
+
+def cr_surface_array(surface) -> np.ndarray:
+    """画像面（cairo.ImageSurface, FORMAT_ARGB32）の画素を，複写なしのNumPy配列の表示（view）として返す．
+    配列への書き込みは面に反映される．面に描画した後は，`surface.mark_dirty()`を呼ぶこと．
+
+    Returns: 
+         (numpy.ndarray) : 形`(height, width, 4)`のuint8配列．各画素はネイティブのバイト順の32ビット整数で，アルファ乗算済みである．
+    """
+    surface.flush()
+    width, height, stride = surface.get_width(), surface.get_height(), surface.get_stride()
+    px = np.ndarray((height, width, 4), dtype=np.uint8, buffer=surface.get_data(),
+                    strides=(stride, 4, 1))
+    return px
+
+#チャネルの順: リトルエンディアンではB,G,R,A，ビッグエンディアンではA,R,G,B
+_ARGB32_RGBA_ORDER = (2, 1, 0, 3) if sys.byteorder == 'little' else (1, 2, 3, 0)
+
+#アルファ乗算を戻す表: _UNPREMULTIPLY[a, c] = round(c*255/a)
+_a, _c = np.meshgrid(np.arange(256), np.arange(256), indexing='ij')
+_UNPREMULTIPLY = np.where(_a > 0, np.minimum((_c*255 + _a//2) // np.maximum(_a, 1), 255), 0).astype(np.uint8)
+#アルファ乗算の表: _PREMULTIPLY[a, c] = round(c*a/255)
+_PREMULTIPLY = ((_c*_a + 127) // 255).astype(np.uint8)
+del _a, _c
+
+def argb32_to_rgba(px, out=None) -> np.ndarray:
+    """cairoのFORMAT_ARGB32の画素の配列を，アルファ乗算を戻した（unpremultiplied）RGBAの配列に変換する．
+    画素ごとの除算の代わりに，256x256の表を引く．
+
+    Args: 
+         px (numpy.ndarray) : 形`(height, width, 4)`のuint8配列．関数`cr_surface_array()`の返り値など．
+
+         out (numpy.ndarray) : 結果を書き込む形`(height, width, 4)`のuint8配列．default=None. Noneならば新たに作る．
+
+    Returns: 
+         (numpy.ndarray) : 形`(height, width, 4)`のuint8配列
+    """
+    if out is None: 
+        out = np.empty(px.shape[:2] + (4,), dtype=np.uint8)
+    ir, ig, ib, ia = _ARGB32_RGBA_ORDER
+    a = px[..., ia]
+    out[..., 0] = _UNPREMULTIPLY[a, px[..., ir]]
+    out[..., 1] = _UNPREMULTIPLY[a, px[..., ig]]
+    out[..., 2] = _UNPREMULTIPLY[a, px[..., ib]]
+    out[..., 3] = a
+    return out
+
+def rgba_to_argb32(rgba, out=None) -> np.ndarray:
+    """RGBAの配列を，アルファ乗算した（premultiplied）cairoのFORMAT_ARGB32の画素の配列に変換する．関数`argb32_to_rgba()`の逆である．
+
+    Args: 
+         rgba (numpy.ndarray) : 形`(height, width, 4)`または`(height, width, 3)`のuint8配列．3チャネルならば不透明とする．
+
+         out (numpy.ndarray) : 結果を書き込む形`(height, width, 4)`のuint8配列．関数`cr_surface_array()`の返り値ならば，面に直接書き込む．default=None.
+
+    Returns: 
+         (numpy.ndarray) : 形`(height, width, 4)`のuint8配列
+    """
+    if out is None: 
+        out = np.empty(rgba.shape[:2] + (4,), dtype=np.uint8)
+    ir, ig, ib, ia = _ARGB32_RGBA_ORDER
+    if rgba.shape[2] == 3: 
+        out[..., ir], out[..., ig], out[..., ib] = rgba[..., 0], rgba[..., 1], rgba[..., 2]
+        out[..., ia] = 255
+    else:
+        a = rgba[..., 3]
+        out[..., ir] = _PREMULTIPLY[a, rgba[..., 0]]
+        out[..., ig] = _PREMULTIPLY[a, rgba[..., 1]]
+        out[..., ib] = _PREMULTIPLY[a, rgba[..., 2]]
+        out[..., ia] = a
+    return out
+
+def to_argb32_image(data, is_argb32=False) -> np.ndarray:
+    """画像データ`data`を，関数`cr_draw_image()`で描けるFORMAT_ARGB32の連続な配列にする．
+
+    Args: 
+         data (numpy.ndarray) : 形`(height, width, 4)`または`(height, width, 3)`のuint8のRGBA（RGB）配列
+
+         is_argb32 (bool) : `data`が既にアルファ乗算済みのFORMAT_ARGB32の配列か．真で，連続で書き込み可能ならば，複写せずにそのまま返す．default=False.
+
+    Returns: 
+         (numpy.ndarray) : 形`(height, width, 4)`の連続なuint8配列
+    """
+    data = np.asarray(data)
+    com.ensure(data.ndim == 3 and data.shape[2] in (3, 4) and data.dtype == np.uint8,
+               f'data must be a uint8 array of shape (h, w, 3|4)!: {data.shape} {data.dtype}')
+    if is_argb32: 
+        com.ensure(data.shape[2] == 4, f'argb32 data must have 4 channels!: {data.shape}')
+        if data.flags.c_contiguous and data.flags.writeable: 
+            return data
+        return np.ascontiguousarray(data).copy()
+    return rgba_to_argb32(data)
+
+def cr_surface_to_rgba(surface, out=None) -> np.ndarray:
+    """画像面（cairo.ImageSurface, FORMAT_ARGB32）の画素を，関数`argb32_to_rgba()`でRGBAの配列に変換する．
+    """
+    return argb32_to_rgba(cr_surface_array(surface), out=out)
+
+def cr_format_stride(width) -> int:
+    """幅`width`のFORMAT_ARGB32の画像の，行のバイト数を返す．
+    """
+    return cairo.ImageSurface.format_stride_for_width(cairo.FORMAT_ARGB32, int(width))
+
+def cr_surface_for_data(data, width=None, height=None, stride=None) -> 'cairo.ImageSurface':
+    """バッファ`data`の上に，複写なしにFORMAT_ARGB32の画像面を作る．
+    """
+    return cairo.ImageSurface.create_for_data(data, cairo.FORMAT_ARGB32,
+                                              int(width), int(height), int(stride))
+
+def cr_draw_tile(draw_func, context=None, x0=0, y0=0, width=None, height=None, scale=1.0):
+    """画像全体のうち，左上`(x0, y0)`から大きさ`(width, height)`（画素）の部分を，文脈`context`の原点に描く．
+    部分の外はクリップされるので，関数`draw_func(cr)`は，クリップ領域を見て描画を間引ける．
+    """
+    context.save()
+    context.rectangle(0, 0, width, height)
+    context.clip()
+    context.translate(-x0, -y0)
+    if scale != 1.0: 
+        context.scale(scale, scale)
+    draw_func(context)
+    context.restore()
+    return 
+
+class PngStreamWriter:
+    """PNG画像を，上から順に行の帯ごとに書き出すクラス．画像全体をメモリに置かずに書き出せる．
+
+    Args: 
+         target (str, file-like) : 出力先のファイル名，または，ファイル風オブジェクト
+
+         width, height (int) : 画像のサイズ（画素）
+
+         level (int) : zlibの圧縮レベル．default=6.
+
+    Example::
+
+         with PngStreamWriter('out.png', width, height) as png:
+             for rgba in bands:          #各帯は形(h, width, 4)のuint8配列
+                 png.write_rows(rgba)
+    """
+    SIGNATURE = b'\x89PNG\r\n\x1a\n'
+    
+    def __init__(self, target=None, width=None, height=None, level=6):
+        com.ensure(width != None and width > 0 and height != None and height > 0,
+                   f'width={width} and height={height} must be positive!')
+        self.width, self.height = int(width), int(height)
+        self.to_close_ = isinstance(target, str)
+        self.f_ = open(target, 'wb') if self.to_close_ else target
+        self.zobj_ = zlib.compressobj(level)
+        self.num_rows = 0 #書き出した行数
+        self.f_.write(self.SIGNATURE)
+        #IHDR: 8ビット，RGBA（color type 6），非インターレース
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', self.width, self.height, 8, 6, 0, 0, 0))
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type != None: #例外を置き換えないように，検査と終端の書き出しをせずに閉じる
+            self.abort()
+        else: 
+            self.close()
+        return False
+
+    def _chunk(self, tag, data):
+        self.f_.write(struct.pack('>I', len(data)))
+        self.f_.write(tag)
+        self.f_.write(data)
+        self.f_.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(tag)) & 0xffffffff))
+        return
+
+    def write_rows(self, rgba):
+        """行の帯`rgba`（形`(h, width, 4)`のuint8配列）を書き出す．
+        """
+        h = rgba.shape[0]
+        com.ensure(rgba.shape[1:] == (self.width, 4), f'rgba.shape={rgba.shape} must be (h, {self.width}, 4)!')
+        com.ensure(self.num_rows + h <= self.height,
+                   f'too many rows: {self.num_rows + h} > height={self.height}!')
+        rows = np.zeros((h, 1 + 4*self.width), dtype=np.uint8) #各行の先頭はフィルタ種別0
+        rows[:, 1:] = rgba.reshape(h, -1)
+        data = self.zobj_.compress(rows.tobytes())
+        if data: 
+            self._chunk(b'IDAT', data)
+        self.num_rows += h
+        return
+
+    def close(self):
+        """残りの圧縮データと終端を書き出して閉じる．
+        """
+        if self.zobj_ == None: 
+            return
+        com.ensure(self.num_rows == self.height,
+                   f'num_rows={self.num_rows} must equal height={self.height}!')
+        self._chunk(b'IDAT', self.zobj_.flush())
+        self._chunk(b'IEND', b'')
+        self.zobj_ = None
+        if self.to_close_: 
+            self.f_.close()
+        return
+
+    def abort(self):
+        """終端を書き出さずに閉じる．書き出し途中で失敗したときに用いる．出力は不完全なPNG画像である．
+        """
+        if self.zobj_ == None: 
+            return
+        self.zobj_ = None
+        if self.to_close_: 
+            self.f_.close()
+        return
+
+def cr_render_banded(draw_func, target=None, display_shape=None, scale=1.0,
+                     band_height=DEFAULT_BAND_HEIGHT):
+    """関数`draw_func(cr)`の描画を，横長の帯ごとに画像面に描いて，一つのPNG画像に逐次書き出す．
+    使用メモリは帯一つ分であり，cairoの画像面の大きさの上限を超える画像も描ける．
+
+    Args: 
+         draw_func (callable) : 文脈`cr`を受け取って描画する関数．`cr`の利用者空間は画像全体の座標であり，クリップ領域は帯である．
+
+         target (str, file-like) : 出力先のファイル名，または，ファイル風オブジェクト
+
+         display_shape (tuple(float, float)) : 拡大前の画像のサイズ `(xsize, ysize)`
+
+         scale (float) : 拡大率．default=1.0.
+
+         band_height (int) : 帯の高さ（画素）．default=DEFAULT_BAND_HEIGHT.
+
+    Note: 
+         幅が`MAX_SURFACE_SIZE`を超えるときは，帯をさらに横に分けて描き，行ごとに並べて書き出す．
+    """
+    width = int(math.ceil(display_shape[0]*scale))
+    height = int(math.ceil(display_shape[1]*scale))
+    band_height = max(1, min(int(band_height), MAX_SURFACE_SIZE, height))
+    tile_width = min(width, MAX_SURFACE_SIZE)
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, tile_width, band_height) #帯の間で使い回す
+    rgba = np.empty((band_height, width, 4), dtype=np.uint8)
+    with PngStreamWriter(target, width, height) as png:
+        for y0 in range(0, height, band_height):
+            h = min(band_height, height - y0)
+            for x0 in range(0, width, tile_width):
+                w = min(tile_width, width - x0)
+                cr = cairo.Context(surface)
+                cr.set_operator(cairo.OPERATOR_CLEAR) #前の帯を消す
+                cr.paint()
+                cr.set_operator(cairo.OPERATOR_OVER)
+                cr_draw_tile(draw_func, context=cr, x0=x0, y0=y0, width=w, height=h, scale=scale)
+                rgba[:h, x0:x0 + w] = cr_surface_to_rgba(surface)[:h, :w]
+            png.write_rows(rgba[:h])
+    return target
+
+def cr_record(draw_func, display_shape=None) -> 'cairo.RecordingSurface':
+    """描画命令を記録する面（recording surface）を生成し，関数`draw_func(cr)`の描画を記録する．
+
+    Args: 
+         draw_func (callable) : 記録面の文脈`cr`を受け取って描画する関数
+
+         display_shape (tuple(float, float)) : 記録する範囲 `(xsize, ysize)`．Noneならば範囲を限らない．
+
+    Returns: 
+         (cairo.RecordingSurface) : 描画を記録した面
+    """
+    extents = None
+    if display_shape != None: 
+        extents = cairo.Rectangle(0, 0, display_shape[0], display_shape[1])
+    recording = cairo.RecordingSurface(cairo.Content.COLOR_ALPHA, extents)
+    draw_func(cairo.Context(recording))
+    return recording
+
+def cr_replay_recording(recording, surface=None, scale=1.0):
+    """記録面`recording`の内容を，拡大率`scale`で面`surface`に再生する．
+    ベクトル形式の面には，描画命令のまま再生される．
+    """
+    context = cairo.Context(surface)
+    context.save()
+    if scale != 1.0: 
+        context.scale(scale, scale)
+    context.set_source_surface(recording, 0, 0)
+    context.paint()
+    context.restore()
+    return 
+
 #=====
 #便利関数
 #=====
@@ -711,20 +1117,17 @@ def cr_set_font_face(context=None, **kwargs):
 
     """
     ### fontfamily    
-    ffamily = kw.get(kwargs, key='fontfamily',
-                     altkeys=['font_family', 'ffamily'], default=None)
+    ffamily = STYLE_ALIASES.get(kwargs, 'fontfamily')
     ## ffamily must be at least specified
     if ffamily == None: 
         return
     
     ### fontslant
-    fslant_ = kw.get(kwargs, key='fontslant',
-                    altkeys=['font_slant', 'fslant'], default=None)
+    fslant_ = STYLE_ALIASES.get(kwargs, 'fontslant')
     fslant = lookup_dict(FONT_SLANT, key=fslant_, default=cairo.FontSlant.NORMAL)
 
     ### fontweight
-    fweight_ = kw.get(kwargs, key='fontweight',
-                     altkeys=['font_weight', 'fweight'], default=None)
+    fweight_ = STYLE_ALIASES.get(kwargs, 'fontweight')
     fweight = lookup_dict(FONT_WEIGHT, key=fweight_, default=cairo.FontWeight.NORMAL)
 
     ### select a fontface 
@@ -754,24 +1157,23 @@ def cr_set_context_parameters(context=None, **kwargs):
     com.ensure(context!=None, 'context must be non-None!')
     #===== 共通
     ## 色設定
-    source_rgb = kw.get(kwargs, key='source_rgb', altkeys=['rgb'], default=None)
+    source_rgb = STYLE_ALIASES.get(kwargs, 'source_rgb')
     if source_rgb:
         cr_set_source_rgb(source_rgb=source_rgb, context=context)
     #===== 図形
     ## 線幅
-    linewidth = kw.get(kwargs, key='linewidth',
-                       altkeys=['line_width', 'pen_width'], default=None)
+    linewidth = STYLE_ALIASES.get(kwargs, 'linewidth')
     if linewidth: 
         context.set_line_width(linewidth)
 
     ## 線端 linecap
-    linecap_ = kw.get(kwargs, key='linecap', altkeys=['line_cap', 'line_end'], default=None)
+    linecap_ = STYLE_ALIASES.get(kwargs, 'linecap')
     if linecap_: 
         linecap = lookup_dict(LINE_CAP, key=linecap_, default=cairo.LINE_CAP_SQUARE)
         context.set_line_cap(linecap)
     
     ## 線端 linecap
-    linejoin_ = kw.get(kwargs, key='linejoin', altkeys=['line_join', 'line_end'], default=None)
+    linejoin_ = STYLE_ALIASES.get(kwargs, 'linejoin')
     if linejoin_: 
         linejoin = lookup_dict(LINE_JOIN, key=linejoin_, default=cairo.LINE_JOIN_MITER)
         context.set_line_join(linejoin)
@@ -781,8 +1183,7 @@ def cr_set_context_parameters(context=None, **kwargs):
     cr_set_font_face(context=context, **kwargs)
     
     ## フォントサイズ
-    fsize = kw.get(kwargs, key='fontsize', altkeys=['font_size', 'fsize'],
-                   default=None)
+    fsize = STYLE_ALIASES.get(kwargs, 'fontsize')
     if fsize: 
         context.set_font_size(fsize) #default: font_size = 10
     #===== 終わり
@@ -823,6 +1224,188 @@ def cr_process_stroke_or_fill(context=None,
         context.stroke()
     return 
 
+class Style(NamedTuple):
+    """代替キーと名前の解決を済ませた，描画の文脈パラメータの組．変更不可でハッシュ可能である．
+    関数`style_from_kwargs()`で，キーワード引数から一度だけ作り，描画ごとに使い回す．
+
+    Attributes: 
+         source_rgb (tuple) : 色．`(r,g,b)`または`(r,g,b,a)`
+
+         linewidth (float) : 線幅
+
+         linecap (int) : 線端の形状．cairoの定数
+
+         linejoin (int) : 線の結合部の形状．cairoの定数
+
+         font_face (tuple) : フォント指定の組`(ffamily, fslant, fweight)`
+
+         fontsize (float) : フォントサイズ
+
+    Note: 
+         値がNoneの項目は指定なしを表し，cairo.Contextの設定を変えない．
+    """
+    source_rgb : tuple = None
+    linewidth : float = None
+    linecap : int = None
+    linejoin : int = None
+    font_face : tuple = None
+    fontsize : float = None
+
+EMPTY_STYLE = Style()
+
+def style_from_kwargs(**kwargs) -> Style:
+    """関数`cr_set_context_parameters()`と同じキーワード引数を受け取り，文脈パラメータの組`Style`を返す．
+    """
+    source_rgb = STYLE_ALIASES.get(kwargs, 'source_rgb')
+    if source_rgb: 
+        source_rgb = tuple(source_rgb)
+    else:
+        source_rgb = None
+    linewidth = STYLE_ALIASES.get(kwargs, 'linewidth')
+    linecap_ = STYLE_ALIASES.get(kwargs, 'linecap')
+    linecap = None
+    if linecap_: 
+        linecap = lookup_dict(LINE_CAP, key=linecap_, default=cairo.LINE_CAP_SQUARE)
+    linejoin_ = STYLE_ALIASES.get(kwargs, 'linejoin')
+    linejoin = None
+    if linejoin_: 
+        linejoin = lookup_dict(LINE_JOIN, key=linejoin_, default=cairo.LINE_JOIN_MITER)
+    font_face = None
+    ffamily = STYLE_ALIASES.get(kwargs, 'fontfamily')
+    if ffamily != None: 
+        fslant_ = STYLE_ALIASES.get(kwargs, 'fontslant')
+        fweight_ = STYLE_ALIASES.get(kwargs, 'fontweight')
+        font_face = (ffamily,
+                     lookup_dict(FONT_SLANT, key=fslant_, default=cairo.FontSlant.NORMAL),
+                     lookup_dict(FONT_WEIGHT, key=fweight_, default=cairo.FontWeight.NORMAL))
+    fsize = STYLE_ALIASES.get(kwargs, 'fontsize')
+    return Style(source_rgb, linewidth or None, linecap, linejoin, font_face, fsize or None)
+
+def cr_apply_style(style=None, context=None):
+    """文脈パラメータの組`style`をcairo.Contextに設定する．
+    関数`cr_set_context_parameters()`と同じ設定を，キーの検索なしに行う．
+    """
+    if style.source_rgb:
+        cr_set_source_rgb(source_rgb=style.source_rgb, context=context)
+    if style.linewidth: 
+        context.set_line_width(style.linewidth)
+    if style.linecap != None: 
+        context.set_line_cap(style.linecap)
+    if style.linejoin != None: 
+        context.set_line_join(style.linejoin)
+    if style.font_face != None: 
+        context.select_font_face(*style.font_face)
+    if style.fontsize: 
+        context.set_font_size(style.fontsize)
+    return 
+
+def cr_set_style_or_parameters(context=None, style=None, **kwargs):
+    """文脈パラメータの組`style`が与えられればそれを設定し，そうでなければ関数`cr_set_context_parameters()`でキーワード引数を設定する．描画関数の共通の前処理．
+    """
+    if style != None:
+        cr_apply_style(style=style, context=context)
+    else:
+        cr_set_context_parameters(context=context, **kwargs)
+    return 
+
+class StyleState:
+    """cairo.Contextの現在の文脈パラメータを追跡し，連続する描画の間で変化した項目だけを設定するクラス．
+
+    Args: 
+         context (cairo.Context) : Cairoの文脈オブジェクト．生成時に`context.save()`で基準の状態を保存する．
+
+    Note: 
+         描画ごとに`save()`と`restore()`で囲む場合と同じ結果を得るため，次の描画が指定しない項目が直前までに変更されているときは，`restore()`と`save()`で基準の状態に戻してから設定する．使い終わったら，関数`close()`を呼ぶこと．
+
+    Note: 
+         変換行列も追跡する．関数`set_matrix()`で設定した行列は，基準の状態に戻したあとにも設定し直す．
+    """
+    def __init__(self, context=None):
+        self.context = context
+        self.current : Style = EMPTY_STYLE
+        self.base_matrix_ = context.get_matrix() #基準の変換行列
+        self.matrix_ = None #基準の空間からの変換行列．Noneは恒等変換
+        context.save()
+        return
+
+    def set_matrix(self, matrix=None):
+        """基準の空間に対する変換行列`matrix`を設定する．Noneならば基準の変換行列に戻す．
+        """
+        if matrix == self.matrix_:
+            return
+        self.matrix_ = matrix
+        self._apply_matrix()
+        return
+
+    def _apply_matrix(self):
+        if self.matrix_ == None:
+            self.context.set_matrix(self.base_matrix_)
+        else:
+            self.context.set_matrix(cr_matrix(self.matrix_).multiply(self.base_matrix_))
+        return
+
+    def apply(self, style=None):
+        """文脈パラメータの組`style`を，変化した項目だけ設定する．
+        """
+        cur = self.current
+        if style == cur:
+            return
+        for new, old in zip(style, cur):
+            if new == None and old != None:
+                self.reset()
+                cur = EMPTY_STYLE
+                break
+        context = self.context
+        if style.source_rgb and style.source_rgb != cur.source_rgb:
+            cr_set_source_rgb(source_rgb=style.source_rgb, context=context)
+        if style.linewidth and style.linewidth != cur.linewidth: 
+            context.set_line_width(style.linewidth)
+        if style.linecap != None and style.linecap != cur.linecap: 
+            context.set_line_cap(style.linecap)
+        if style.linejoin != None and style.linejoin != cur.linejoin: 
+            context.set_line_join(style.linejoin)
+        if style.font_face != None and style.font_face != cur.font_face: 
+            context.select_font_face(*style.font_face)
+        if style.fontsize and style.fontsize != cur.fontsize: 
+            context.set_font_size(style.fontsize)
+        self.current = style
+        return
+
+    def reset(self):
+        """基準の状態に戻す．
+        """
+        if self.current != EMPTY_STYLE:
+            self.context.restore()
+            self.context.save()
+            self.current = EMPTY_STYLE
+            if self.matrix_ != None:
+                self._apply_matrix()
+        return
+
+    def close(self):
+        """基準の状態に戻して，生成時の`save()`を閉じる．
+        """
+        self.context.restore()
+        self.current = EMPTY_STYLE
+        return
+
+def cr_resolve_stroke_or_fill(fill=None, preserve=None) -> str:
+    """関数`cr_process_stroke_or_fill()`が呼ぶcairo.Contextのメソッドの名前を返す．
+
+    Returns: 
+         (str) : 'stroke', 'fill', 'stroke_preserve', 'fill_preserve'のいずれか
+    """
+    if not fill:
+        return 'stroke'
+    elif fill=='stroke':
+        return 'stroke_preserve' if preserve else 'stroke'
+    elif fill=='fill': 
+        return 'fill_preserve' if preserve else 'fill'
+    elif fill in ('stroke_preserve', 'fill_preserve'): 
+        return fill
+    else: 
+        com.panic(f'no such fill command={fill}!')
+
 #=====
 #描画関数
 #=====
@@ -972,6 +1555,29 @@ def cr_arrow_head(x, y, x_last, y_last, context=None,
 
 EMPTY_DICT = {}
 
+def cr_polylines(moves, xs, ys, context=None):
+    """線分列を一つのパスとして作る．書き出し（strokeやfill）は行わない．
+
+    Args: 
+         moves (list(bool)) : 各点がペンの移動ならば`True`，直線ならば`False`のリスト
+
+         xs (list(float)) : 各点のx座標のリスト
+
+         ys (list(float)) : 各点のy座標のリスト
+
+         context (cairo.Context) : 文脈オブジェクト
+
+    Note: 
+         関数`cr_line_to()`と異なり，線分ごとに書き出さないので，線の結合部（linejoin）が正しく描かれ，点の多い線分列でも速い．現在点のない直線は，cairoの仕様により，ペンの移動として扱われる．
+    """
+    move_to, line_to = context.move_to, context.line_to
+    for is_move, x, y in zip(moves, xs, ys):
+        if is_move:
+            move_to(x, y)
+        else:
+            line_to(x, y)
+    return 
+
 def cr_line_to(x, y, context=None,
                has_arrow=False, x_last=None, y_last=None, #optional for arrow
                **kwargs):
@@ -1011,6 +1617,7 @@ def cr_rectangle(x=None, y=None, width=None, height=None,
                  context=None, 
                  fill=None,
                  edge_rgb=None,
+                 style=None, 
                  **kwargs):
     """矩形を描く
 
@@ -1026,11 +1633,13 @@ def cr_rectangle(x=None, y=None, width=None, height=None,
 
          fill (bool) : fill if `True` or stroke if `False` (default)
 
+         style (Style) : 解決済みの文脈パラメータ．与えられれば，キーワード引数の代わりに用いる．
+
     Returns: 
          (Rect) : 包含矩形
     """
     ## 文脈パラメータ設定
-    cr_set_context_parameters(context=context, **kwargs)
+    cr_set_style_or_parameters(context=context, style=style, **kwargs)
     com.ensure(com.is_typeof_seq((x,y,width, height), etype=(float, int)),
                f'(x,y,width, height)={(x,y,width, height)} must be numbers!')
     if edge_rgb:
@@ -1049,7 +1658,7 @@ def cr_rectangle(x=None, y=None, width=None, height=None,
     return box
 
 def cr_arc(x=None, y=None, r=None, start=None, end=None,
-           context=None, **kwargs):
+           context=None, style=None, **kwargs):
     """円盤を描く．
 
     Args: 
@@ -1064,13 +1673,14 @@ def cr_arc(x=None, y=None, r=None, start=None, end=None,
 
          fill (bool) : fill (True) or stroke (False, default)
 
+         style (Style) : 解決済みの文脈パラメータ．与えられれば，キーワード引数の代わりに用いる．
+
     Returns: 
 
          (Rect) : 包含矩形
     """
     ## 文脈パラメータ設定
-    cr_set_context_parameters(context=context,
-                              **kwargs)
+    cr_set_style_or_parameters(context=context, style=style, **kwargs)
     context.arc(x, y, r, start, end)
     fill = kw.get(kwargs, 'fill')
     cr_process_stroke_or_fill(fill=fill, context=context)
@@ -1100,7 +1710,7 @@ def cr_circle(x=None, y=None, r=None, context=None, **kwargs):
     box = cr_arc(x, y, r, math.pi*0, math.pi*2.0, context=context, **kwargs)
     return box
 
-def cr_text_extent(ox, oy, msg = None, context=None,
+def cr_text_extent(ox, oy, msg = None, context=None, style=None, 
                    **kwargs):
     """テキストの配置情報を事前に取得する．Cairo.context.text_extents(msg)のラッパー．
 
@@ -1124,7 +1734,7 @@ def cr_text_extent(ox, oy, msg = None, context=None,
       - dx, dy : グリフ位置の増分
 
     """
-    cr_set_context_parameters(context=context, **kwargs)
+    cr_set_style_or_parameters(context=context, style=style, **kwargs)
     
     ## テキストの描画情報
     if msg:
@@ -1133,7 +1743,7 @@ def cr_text_extent(ox, oy, msg = None, context=None,
         panic(f'msg must be non-None!')
     return x, y, width, height, dx, dy
 
-def cr_text(ox, oy, msg = None, context=None,
+def cr_text(ox, oy, msg = None, context=None, style=None, 
             #ffamily="Sans", fsize=10, source_rgb=None
             **kwargs):
     """文脈にテキストを描画する．Cairo.show_text(msg)のラッパー．
@@ -1145,8 +1755,10 @@ def cr_text(ox, oy, msg = None, context=None,
          ox, oy (float) : テキストの配置位置 (ox, oy)
 
          msg (str) : テキスト
+
+         style (Style) : 解決済みの文脈パラメータ．与えられれば，キーワード引数の代わりに用いる．
     """
-    cr_set_context_parameters(context=context, **kwargs)
+    cr_set_style_or_parameters(context=context, style=style, **kwargs)
     ## テキストの描画情報
     if msg:
         fx, fy, width, height, dx, dy = context.text_extents(msg)
@@ -1159,6 +1771,47 @@ def cr_text(ox, oy, msg = None, context=None,
 
 DEFAULT_MARKER_RADIUS=5 
 
+def cr_draw_image(argb, x=0.0, y=0.0, width=None, height=None, filter=None,
+                  alpha=None, context=None):
+    """FORMAT_ARGB32の配列`argb`を，矩形`(x, y, width, height)`に拡大縮小して描く．
+    配列は，`cairo.ImageSurface.create_for_data()`で複写なしに面として包む．
+
+    Args: 
+         argb (numpy.ndarray) : 関数`to_argb32_image()`の返り値
+
+         x, y (float) : 左上の位置
+
+         width, height (float) : 描画する大きさ．Noneならば画素数．
+
+         filter (str) : 拡大縮小の補間の方法．`FILTER`のキー．default=None. Noneならば'good'．
+
+         alpha (float) : 不透明度．default=None. Noneならば1.0．
+
+         context (cairo.Context) : Cairoの文脈オブジェクト
+
+    Returns: 
+         (Rect) : 包含矩形
+    """
+    h, w = argb.shape[:2]
+    if width == None: width = w
+    if height == None: height = h
+    surface = cr_surface_for_data(argb.reshape(-1).data, w, h, 4*w) #連続なので複写しない
+    context.save()
+    context.translate(x, y)
+    context.scale(width/w, height/h)
+    context.set_source_surface(surface, 0, 0)
+    pattern = context.get_source()
+    pattern.set_filter(lookup_dict(FILTER, key=filter, default=cairo.Filter.GOOD))
+    pattern.set_extend(cairo.Extend.PAD) #縁を透明とぼかさない
+    context.rectangle(0, 0, w, h)
+    context.clip()
+    if alpha == None: 
+        context.paint()
+    else:
+        context.paint_with_alpha(alpha)
+    context.restore()
+    return (x, y, x + width, y + height)
+
 def cr_draw_marker_circle(ax, ay, r=None, context=None, **kwargs):
     """円形(circle)のマークを描画する．
 
@@ -1197,7 +1850,7 @@ def cr_draw_marker_cross(x=0.0, y=0.0, angle=math.pi*0.25,
 
          context (cairo.Context) : Cairoの文脈オブジェクト．
     """
-    linewidth = kw.get(kwargs, key='linewidth', altkeys=['line_width', 'pen_width'], default=2)
+    linewidth = STYLE_ALIASES.get(kwargs, 'linewidth', default=2)
     kwargs['linewidth'] = linewidth
     cr = context 
     cr.save()
@@ -1221,29 +1874,156 @@ def cr_draw_marker(ax, ay, r=None, context=None, **kwargs):
     """関数cr_draw_marker_circleのラッパー関数．下位互換性のため．"""
     return cr_draw_marker_circle(ax, ay, r=r, context=context, **kwargs)
 
+#=====
+#多数のマーカーの描画
+#=====
+
+## 多角形のマーカーの型紙．半径1の単位図形の各点の`(is_move, dx, dy)`の列
+MARKER_TEMPLATES = {
+    'square':  ((True, -1.0, -1.0), (False, 1.0, -1.0), (False, 1.0, 1.0),
+                (False, -1.0, 1.0), (False, -1.0, -1.0)),
+    'diamond': ((True, 0.0, -1.0), (False, 1.0, 0.0), (False, 0.0, 1.0),
+                (False, -1.0, 0.0), (False, 0.0, -1.0)),
+    'cross':   ((True, -1.0, -1.0), (False, 1.0, 1.0),
+                (True, -1.0, 1.0), (False, 1.0, -1.0)),
+    'plus':    ((True, -1.0, 0.0), (False, 1.0, 0.0),
+                (True, 0.0, -1.0), (False, 0.0, 1.0)),
+}
+MARKER_SHAPES = ('circle',) + tuple(MARKER_TEMPLATES)
+FILLED_MARKERS = ('circle', 'square', 'diamond') #既定で塗りつぶすマーカー
+
+def marker_path_arrays(marker, xs, ys, rs) -> tuple:
+    """多角形のマーカーの列を，関数`cr_polylines()`の引数の配列に一度に展開する．
+
+    Args:
+         marker (str) : マーカーの形．`MARKER_TEMPLATES`のキー．
+
+         xs, ys (numpy.ndarray) : マーカーの中心の座標の配列
+
+         rs (numpy.ndarray) : マーカーの半径の配列
+
+    Returns:
+         (tuple) : 組`(moves, pxs, pys)`．各点を行優先で並べた配列．
+    """
+    template = np.array(MARKER_TEMPLATES[marker], dtype=float)
+    moves = np.tile(template[:, 0] != 0.0, len(xs))
+    pxs = (xs[:, np.newaxis] + rs[:, np.newaxis]*template[:, 1]).ravel()
+    pys = (ys[:, np.newaxis] + rs[:, np.newaxis]*template[:, 2]).ravel()
+    return moves, pxs, pys
+
+def cr_markers(marker, xs, ys, rs, context=None):
+    """同じ形のマーカーの列を，一つのパスとして作る．書き出し（strokeやfill）は行わない．
+
+    Args:
+         marker (str) : マーカーの形．`MARKER_SHAPES`のいずれか．
+
+         xs, ys (numpy.ndarray) : マーカーの中心の座標の配列
+
+         rs (numpy.ndarray) : マーカーの半径の配列
+
+         context (cairo.Context) : Cairoの文脈オブジェクト
+
+    Note:
+         マーカーごとに書き出さないので，何十万個のマーカーでも，色ごとに一度のstrokeまたはfillで描ける．
+    """
+    if marker == 'circle':
+        new_sub_path, arc = context.new_sub_path, context.arc
+        for x, y, r in zip(xs.tolist(), ys.tolist(), rs.tolist()):
+            new_sub_path()
+            arc(x, y, r, 0.0, 2.0*math.pi)
+    else:
+        moves, pxs, pys = marker_path_arrays(marker, xs, ys, rs)
+        cr_polylines(moves.tolist(), pxs.tolist(), pys.tolist(), context=context)
+    return
+
 ##======
 ## 配置：ボード位置の微調整
 ##======
 
+#=====
+#変換行列
+#=====
+
+MATRIX_IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0) #恒等変換の行列
+
+def matrix_multiply(m1, m2) -> tuple:
+    """二つの変換行列の合成`m1∘m2`を返す．点には，先に`m2`を，次に`m1`を適用する．
+
+    Args: 
+         m1, m2 (tuple) : 変換行列．cairo.Matrixと同じ順の6つ組`(xx, yx, xy, yy, x0, y0)`．点`(x, y)`を`(xx*x + xy*y + x0, yx*x + yy*y + y0)`に写す．
+
+    Returns: 
+         (tuple) : 合成した変換行列
+    """
+    xx1, yx1, xy1, yy1, x01, y01 = m1
+    xx2, yx2, xy2, yy2, x02, y02 = m2
+    return (xx1*xx2 + xy1*yx2, yx1*xx2 + yy1*yx2,
+            xx1*xy2 + xy1*yy2, yx1*xy2 + yy1*yy2,
+            xx1*x02 + xy1*y02 + x01, yx1*x02 + yy1*y02 + y01)
+
+def matrix_is_translation(m) -> bool:
+    """変換行列`m`が平行移動ならば真を返す．
+    """
+    return m[0] == 1.0 and m[1] == 0.0 and m[2] == 0.0 and m[3] == 1.0
+
+def matrix_apply_point(m, x, y) -> tuple:
+    """変換行列`m`を点`(x, y)`に適用した結果を返す．
+    """
+    return m[0]*x + m[2]*y + m[4], m[1]*x + m[3]*y + m[5]
+
+def matrix_apply_box(m, box) -> tuple:
+    """変換行列`m`を矩形`box`に適用した像の包含矩形を返す．回転などで矩形が傾く場合に備えて，四隅の像の包含矩形をとる．
+    """
+    x0, y0, x1, y1 = box
+    xs, ys = zip(matrix_apply_point(m, x0, y0), matrix_apply_point(m, x1, y0),
+                 matrix_apply_point(m, x0, y1), matrix_apply_point(m, x1, y1))
+    return min(xs), min(ys), max(xs), max(ys)
+
+def matrix_invert(m) -> tuple:
+    """変換行列`m`の逆行列を返す．
+    """
+    xx, yx, xy, yy, x0, y0 = m
+    det = xx*yy - yx*xy
+    com.ensure(det != 0.0, f'matrix={m} must be invertible!')
+    ixx, iyx, ixy, iyy = yy/det, -yx/det, -xy/det, xx/det
+    return (ixx, iyx, ixy, iyy, -(ixx*x0 + ixy*y0), -(iyx*x0 + iyy*y0))
+
+def cr_matrix(m) -> cairo.Matrix:
+    """変換行列`m`をcairo.Matrixに変換する．
+    """
+    return cairo.Matrix(*m)
+
+#=====
+#空間変換
+#=====
+
 class GeoTransform():
     """空間変換の抽象クラス．これを継承した具体クラスを作成して用いる．
+    変換は，2x3の変換行列（関数`get_matrix()`）で表される．
     """
     def __init__(self):
         return
 
-    def apply_context(context=None, verbose=False) -> NoReturn:
-        """変換をCairoの文脈contextに適用する．オーバーライドすること．
+    ##Override
+    def get_matrix(self) -> tuple:
+        """変換行列`(xx, yx, xy, yy, x0, y0)`を返す．オーバーライドすること．
+        """
+        return MATRIX_IDENTITY
+
+    def apply_context(self, context=None, verbose=False) -> NoReturn:
+        """変換をCairoの文脈contextに適用する．一度の`context.transform()`で行う．
 
         Args: 
               context (cairo.Context) : 文脈. 
 
               verbose (bool) : デバッグ出力のフラグ．default=False. 
         """
+        com.ensure(context != None, f'context must be non-None!')
+        context.transform(cr_matrix(self.get_matrix()))
         return 
 
-    ##Override
     def apply_point(self, x:float, y:float) -> tuple:
-        """変換を点(x, y)に適用した結果(x1, y1)を返す．オーバーライドすること．
+        """変換を点(x, y)に適用した結果(x1, y1)を返す．
 
         Args: 
               x (float) : 適用対象の点のx座標
@@ -1253,10 +2033,20 @@ class GeoTransform():
         Returns: 
               (tuple(float, float)) : 変換後の点(x1, y1)
         """
-        return x, y
+        return matrix_apply_point(self.get_matrix(), x, y)
+
+    def apply_box(self, box) -> tuple:
+        """変換を矩形`box`に適用した像の包含矩形を返す．四隅の像の包含矩形をとる．
+        """
+        return matrix_apply_box(self.get_matrix(), box)
+
+    def compose(self, trans=None) -> 'Affine':
+        """自身と変換`trans`の合成を返す．点には，先に`trans`を，次に自身を適用する．
+        """
+        return Affine(*matrix_multiply(self.get_matrix(), trans_matrix(trans)))
     
     def __str__(self):
-        return f'GeoTrans[{ self }]'
+        return f'GeoTrans{ self.get_matrix() }'
 
     def __repr__(self):
         return self.__str__()
@@ -1293,7 +2083,13 @@ class Translate(GeoTransform):
     def __str__(self):
         return f'Translate{self.move}'
 
-    def apply_context(context=None, verbose=False):
+    ##Override
+    def get_matrix(self) -> tuple:
+        tx, ty = self.move
+        return (1.0, 0.0, 0.0, 1.0, tx, ty)
+
+    ##Override
+    def apply_context(self, context=None, verbose=False):
         """
         Args: 
               context (cairo.Context) : 文脈. 
@@ -1388,73 +2184,172 @@ class Translate(GeoTransform):
 #     pass 
 
 class Rotate(GeoTransform):
-    """並行移動の変換のクラス
+    """回転の変換のクラス
 
     Args: 
     	  angle (float) : 回転の量．単位はラジアンであり，`math.pi*0.5`, `math.pi/6`などのように指定する．
-    
+
+    	  center (tuple(float,float)) : 回転の中心．default=None. Noneならば原点．
     """
-    def __init__(self, angle=None):
+    def __init__(self, angle=None, center=None):
         com.ensure(angle!=None and isinstance(angle, (float,int)), 
                    f'angle={angle} must be non-None!')
-        com.ensure_point((x, y), name='x and y')
+        if center == None:
+            center = (0.0, 0.0)
+        com.ensure_point(center, name='center')
         self.angle : float = angle
+        self.center : tuple = tuple(center)
         return
 
     def __str__(self):
-        return f'Translate{(self.x, self.y)}'
+        return f'Rotate{(self.angle, self.center)}'
 
-    def apply_context(context=None, verbose=False):
-        """変換を文脈に適用する．
+    ##Override
+    def get_matrix(self) -> tuple:
+        c, s = math.cos(self.angle), math.sin(self.angle)
+        cx, cy = self.center
+        return (c, s, -s, c, cx - c*cx + s*cy, cy - s*cx - c*cy)
+    pass 
 
-        Args: 
-              context (cairo.Context) : 文脈. 
+class Scale(GeoTransform):
+    """拡大縮小の変換のクラス
 
-              verbose (bool) : デバッグ出力のフラグ．default=False. 
-        """
-        com.ensure(context != None, f'context must be non-None!')
-        context.rotate(self.angle)
-        return 
+    Args: 
+    	  sx (float) : x方向の倍率
+
+    	  sy (float) : y方向の倍率．default=None. Noneならば`sx`．
+
+    	  center (tuple(float,float)) : 拡大縮小の中心．default=None. Noneならば原点．
+    """
+    def __init__(self, sx=None, sy=None, center=None):
+        com.ensure(sx!=None and isinstance(sx, (float,int)), 
+                   f'sx={sx} must be a number!')
+        if sy == None:
+            sy = sx
+        if center == None:
+            center = (0.0, 0.0)
+        com.ensure_point(center, name='center')
+        self.factor : tuple = (sx, sy)
+        self.center : tuple = tuple(center)
+        return
+
+    def __str__(self):
+        return f'Scale{(self.factor, self.center)}'
 
     ##Override
-    def apply_point(self, x:float, y:float) -> tuple:
-        """変換を点(x, y)に適用した結果(x1, y1)を返す．
+    def get_matrix(self) -> tuple:
+        sx, sy = self.factor
+        cx, cy = self.center
+        return (sx, 0.0, 0.0, sy, cx - sx*cx, cy - sy*cy)
+    pass 
 
-        Args: 
-              x (float) : 適用対象の点のx座標
+class Affine(GeoTransform):
+    """一般のアフィン変換のクラス．平行移動，回転，拡大縮小の合成を，一つの2x3の変換行列で保持する．
+    引数はcairo.Matrixと同じ順で，点`(x, y)`を`(xx*x + xy*y + x0, yx*x + yy*y + y0)`に写す．
 
-              y (float) : 適用対象の点のy座標
+    Args: 
+         xx, yx, xy, yy, x0, y0 (float) : 変換行列の成分．default=恒等変換．
 
-        Returns: 
-              (tuple(float, float)) : 変換後の点(x1, y1)
+    Attributes: 
+         matrix (tuple) : 変換行列`(xx, yx, xy, yy, x0, y0)`
+
+    Examples:: 
+
+         #子の空間を，(100, 50)に移し，30度回転し，2倍に拡大する
+         trans = crt.Affine().translate(100, 50).rotate(math.pi/6).scale(2.0)
+         parent.put(trans=trans, child=child)
+    """
+    def __init__(self, xx=1.0, yx=0.0, xy=0.0, yy=1.0, x0=0.0, y0=0.0):
+        self.matrix : tuple = (float(xx), float(yx), float(xy), float(yy), float(x0), float(y0))
+        com.ensure(all(map(math.isfinite, self.matrix)),
+                   f'matrix={self.matrix} must be finite!')
+        return
+
+    def __str__(self):
+        return f'Affine{self.matrix}'
+
+    ##Override
+    def get_matrix(self) -> tuple:
+        return self.matrix
+
+    def translate(self, tx=0.0, ty=0.0) -> 'Affine':
+        """平行移動を内側に合成した変換を返す．関数`cairo.Context.translate()`と同じ向きである．
         """
-        com.ensure_point((x, y), name='x and y')
-        #2次元の回転
-        x1 = x*cos(self.angle) + y*(-1)*cos(self.angle)
-        y1 = x*sin(self.angle) + y*cos(self.angle)
-        return x1, y1 
+        return Affine(*matrix_multiply(self.matrix, (1.0, 0.0, 0.0, 1.0, tx, ty)))
+
+    def rotate(self, angle=0.0) -> 'Affine':
+        """回転を内側に合成した変換を返す．関数`cairo.Context.rotate()`と同じ向きである．
+        """
+        return Affine(*matrix_multiply(self.matrix, Rotate(angle=angle).get_matrix()))
+
+    def scale(self, sx=1.0, sy=None) -> 'Affine':
+        """拡大縮小を内側に合成した変換を返す．関数`cairo.Context.scale()`と同じ向きである．
+        """
+        return Affine(*matrix_multiply(self.matrix, Scale(sx=sx, sy=sy).get_matrix()))
+
+    def invert(self) -> 'Affine':
+        """逆変換を返す．
+        """
+        return Affine(*matrix_invert(self.matrix))
     pass 
 
 #=====
 #変換関数
 #=====
 
+def translate_many(moves=None):
+    """並行移動ベクトルの配列を受け取り，対応する並行移動の変換のリストを返す．
+    配列全体を一度だけ検査し，要素ごとの検査を省くので，多数の子を一度に配置する場合に用いる．
+
+    Args: 
+         moves (numpy.ndarray) : 並行移動ベクトル`(tx, ty)`を行とする形状`(n,2)`の配列
+
+    Returns: 
+         (list(Translate)) : 長さnの並行移動の変換のリスト
+    """
+    moves = np.asarray(moves, dtype=float)
+    com.ensure(moves.ndim == 2 and moves.shape[1] == 2,
+               f'moves must be an array of shape (n,2)!: shape={moves.shape}')
+    _transes = []
+    for move in moves.tolist():
+        trans = Translate.__new__(Translate) #検査済みなので生成子を通さない
+        trans.move = tuple(move)
+        _transes.append(trans)
+    return _transes
+
+def trans_matrix(trans=None) -> tuple:
+    """変換`trans`の変換行列を返す．Noneは恒等変換とみなす．
+    """
+    if trans == None:
+        return MATRIX_IDENTITY
+    return trans.get_matrix()
+
+def compose_trans(*transes) -> Affine:
+    """変換の列`transes`を合成した変換を返す．点には，最後の変換から順に適用する．すなわち，入れ子の外側の変換から並べる．Noneは恒等変換とみなす．
+    """
+    matrix = MATRIX_IDENTITY
+    for trans in transes:
+        matrix = matrix_multiply(matrix, trans_matrix(trans))
+    return Affine(*matrix)
+
 def box_apply_trans(box, trans=None, verbose=False): 
-    """変換を適用する
+    """変換を矩形に適用した像の包含矩形を返す．平行移動以外の変換では，四隅の像の包含矩形をとる．
 
     Args: 
-          cr (Cairo.Context) : Cairo.Context
+          box (tuple(float,float,float,float)) : 矩形
 
           trans (GeoTransform) : 空間変換
     """
     x0, y0, x1, y1 = box_normalize(box)
     if trans == None:
         if verbose: print(f'warning: empty trans: do nothing!')
-    elif isinstance(trans, GeoTransform):
+    elif isinstance(trans, Translate):
         x0, y0 = trans.apply_point(x0, y0)
         x1, y1 = trans.apply_point(x1, y1)
-    else: panic(f'trans must be of GeoTransform!: trans={ trans }')
-    return x0, y0, x1, y1
+    elif isinstance(trans, GeoTransform):
+        x0, y0, x1, y1 = trans.apply_box((x0, y0, x1, y1))
+    else: com.panic(f'trans must be of GeoTransform!: trans={ trans }')
+    return com.Box(x0, y0, x1, y1)
 
 def cr_apply_trans(trans=None, context=None, verbose=False): 
     """変換を適用する
@@ -1471,16 +2366,9 @@ def cr_apply_trans(trans=None, context=None, verbose=False):
         return
     else: 
         if isinstance(trans, GeoTransform):
-            if isinstance(trans, Translate):
-                x, y = trans.move
-                context.translate(x, y)
-                # context.translate(trans.x, trans.y)
-            else:
-                panic(f'no such GeoTransform is implemented!')
+            trans.apply_context(context=context, verbose=verbose)
         else: 
-            panic(f'trans must be of GeoTransform!: trans={ trans }')
+            com.panic(f'trans must be of GeoTransform!: trans={ trans }')
         return
 
-
-
 ##EOF
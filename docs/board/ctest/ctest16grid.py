@@ -0,0 +1,112 @@
+# coding: utf_8
+# ctest16grid.py
+# - GridPackerBoardによる2次元の格子配置を試す．
+# - セルの行と列のまたがり（rowspan, colspan）を試す．
+import sys
+from argparse import ArgumentParser
+import cairo 
+import math 
+import random
+
+import common as com 
+##
+import crtool as crt
+import cboard as bd
+
+##=====
+## コマンドライン引数
+##=====
+CMD_NAME = (__file__.split('/'))[-1]
+
+def reading_args_and_options():
+    USAGE_STR = f'Usage: python3 { CMD_NAME } OPTIONS '
+    ap = ArgumentParser(usage=USAGE_STR)
+    ## noshow
+    ap.add_argument('-n', '--noshow', action='store_true', default=False, 
+                    help='supreess to displaying graphics')
+    ## margin 
+    ap.add_argument('-m', '--margin', type=float, 
+                    help='set margin to float in [0,1]')
+    ## orient 
+    ap.add_argument('-o', '--orient', type=str, 
+                    help='set orient to str')
+    ## wrap 
+    ap.add_argument('-w', '--wrap', type=int, default=4, 
+                    help='set the number of cells in a line to int')
+    ## boundingbox
+    ap.add_argument('-b', '--boundingbox', action='store_true', default=False, 
+                    help='show verbose messages')
+    ## verbose 
+    ap.add_argument('-v', '--verbose', action='store_true', default=False, 
+                    help='show verbose messages')
+    ## 
+    args = ap.parse_args()
+    return args, ap
+
+
+##======
+## メイン文
+##======
+
+if __name__ == '__main__':
+    #コマンドラインの引数とオプションの読み込み
+    opt, ap = reading_args_and_options()
+
+    #画像枠の生成
+    CV = bd.Canvas(outfile="out",
+                   imagesize='VGA',
+                   portrait=False,
+                   boundingbox=opt.boundingbox,
+                   max_perturb=bd.DEFAULT_LINE_WIDTH*4.0,
+                   verbose=opt.verbose)
+
+    #====== テスト ==============================
+    uspan = 50 #単位スパン
+    dskip = 0.5*uspan
+    ow, oh = uspan, uspan
+    COLS = list(crt.DARKCOL.values())
+
+    if opt.margin: 
+        m_ratio = opt.margin
+    else:
+        m_ratio = 0.25
+    if not opt.orient: opt.orient = 'x'
+
+    #====== テスト ==============================
+    DrawingPanel = CV.put(trans=crt.Translate(dest=(dskip,dskip)),
+                          child=bd.Board(tags='DrawingPanel'))
+    Grid = DrawingPanel.put(child=bd.GridPackerBoard(orient=opt.orient,
+                                                     num_wrap=opt.wrap, 
+                                                     cell_margin=uspan*m_ratio, 
+                                                     ))
+    
+    #位置を指定して，またがるセルに置く
+    Grid.add(bd.DrawRectangle(width=2*ow, height=oh/2,
+                              source_rgb=COLS[0], tags='Wide'),
+             row=0, col=0, colspan=2)
+    Grid.add(bd.DrawRectangle(width=ow/2, height=2*oh,
+                              source_rgb=COLS[1], tags='Tall'),
+             row=0, col=2, rowspan=2)
+    Grid.add(bd.DrawCircle(r=0.5*ow, source_rgb=COLS[2], tags='Corner'),
+             row=0, col=3)
+    
+    #位置を省略して，カーソルの位置から順に空いているセルに置く．'Tall'が占めるセルは飛ばす
+    for k in range(2*opt.wrap): 
+        C = 0.5 + 0.5*random.random() #[0.5,1]の乱数
+        rgb = COLS[k % len(COLS)]
+        if k % 2 == 0: 
+            Grid.add(bd.DrawRectangle(width=ow*C, height=oh*C,
+                                      source_rgb=rgb, tags=f'Box_{k}'))
+        else:
+            Grid.add(bd.DrawCircle(r=0.5*ow*C,
+                                   source_rgb=rgb, tags=f'Circle_{k}'))
+    #===== 図形のテスト ==============================
+
+    #============
+    #印刷
+    #============
+    CV.show(noshow=opt.noshow)
+    
+    pass 
+
+##EOF
@@ -0,0 +1,84 @@
+# coding: utf_8
+# ctest17heatmap.py
+# - DrawHeatmapにより，2次元配列を一つのノードとして描く．
+# - DrawImageにより，RGBの配列を拡大して描く．補間の方法を試す．
+import sys
+from argparse import ArgumentParser
+import math 
+import numpy as np
+
+import common as com 
+##
+import crtool as crt
+import cboard as bd
+
+##=====
+## コマンドライン引数
+##=====
+CMD_NAME = (__file__.split('/'))[-1]
+
+def reading_args_and_options():
+    USAGE_STR = f'Usage: python3 { CMD_NAME } OPTIONS '
+    ap = ArgumentParser(usage=USAGE_STR)
+    ## noshow
+    ap.add_argument('-n', '--noshow', action='store_true', default=False, 
+                    help='supreess to displaying graphics')
+    ## size 
+    ap.add_argument('-s', '--size', type=int, default=1000, 
+                    help='set the number of rows and columns of the heatmap to int')
+    ## filter 
+    ap.add_argument('-f', '--filter', type=str, default='nearest', 
+                    help='set the filter to one of fast, good, best, nearest, bilinear')
+    ## verbose 
+    ap.add_argument('-v', '--verbose', action='store_true', default=False, 
+                    help='show verbose messages')
+    ## 
+    args = ap.parse_args()
+    return args, ap
+
+
+##======
+## メイン文
+##======
+
+if __name__ == '__main__':
+    #コマンドラインの引数とオプションの読み込み
+    opt, ap = reading_args_and_options()
+
+    #画像枠の生成
+    CV = bd.Canvas(outfile="out",
+                   imagesize='VGA',
+                   portrait=False,
+                   verbose=opt.verbose)
+
+    #====== テスト ==============================
+    uspan = 400 #単位スパン
+    dskip = 20
+
+    ## 熱地図: 2次元のガウス関数の和
+    n = opt.size
+    ys, xs = np.mgrid[0:n, 0:n]/n
+    values = (np.exp(-((xs - 0.3)**2 + (ys - 0.4)**2)/0.02) 
+              + 0.5*np.exp(-((xs - 0.7)**2 + (ys - 0.6)**2)/0.05))
+    CV.put(trans=crt.Translate(dest=(dskip, dskip)),
+           child=bd.DrawHeatmap(values=values, width=uspan, height=uspan,
+                                cmap='viridis',
+                                filter=opt.filter))
+
+    ## 画像: 4x4のRGB配列を拡大する
+    rgb = np.zeros((4, 4, 3), dtype=np.uint8)
+    rgb[::2, ::2] = (255, 128, 0)
+    rgb[1::2, 1::2] = (0, 128, 255)
+    CV.put(trans=crt.Translate(dest=(2*dskip + uspan, dskip)),
+           child=bd.DrawImage(data=rgb, width=uspan/2, height=uspan/2,
+                              filter=opt.filter, alpha=0.8))
+    #===== 図形のテスト ==============================
+
+    #============
+    #印刷
+    #============
+    CV.show(noshow=opt.noshow)
+    
+    pass 
+
+##EOF
@@ -0,0 +1,84 @@
+# coding: utf_8
+# ctest18scatter.py
+# - DrawScatterにより，多数の点のマーカーを一つのノードとして描く．
+# - 値による色付け，点ごとの色，マーカーの形を試す．
+import sys
+from argparse import ArgumentParser
+import math 
+import numpy as np
+
+import common as com 
+##
+import crtool as crt
+import cboard as bd
+
+##=====
+## コマンドライン引数
+##=====
+CMD_NAME = (__file__.split('/'))[-1]
+
+def reading_args_and_options():
+    USAGE_STR = f'Usage: python3 { CMD_NAME } OPTIONS '
+    ap = ArgumentParser(usage=USAGE_STR)
+    ## noshow
+    ap.add_argument('-n', '--noshow', action='store_true', default=False, 
+                    help='supreess to displaying graphics')
+    ## num 
+    ap.add_argument('-N', '--num', type=int, default=100000, 
+                    help='set the number of points to int')
+    ## marker 
+    ap.add_argument('-m', '--marker', type=str, default='circle', 
+                    help='set the marker to one of circle, square, diamond, cross, plus')
+    ## verbose 
+    ap.add_argument('-v', '--verbose', action='store_true', default=False, 
+                    help='show verbose messages')
+    ## 
+    args = ap.parse_args()
+    return args, ap
+
+
+##======
+## メイン文
+##======
+
+if __name__ == '__main__':
+    #コマンドラインの引数とオプションの読み込み
+    opt, ap = reading_args_and_options()
+
+    #画像枠の生成
+    CV = bd.Canvas(outfile="out",
+                   imagesize='VGA',
+                   portrait=False,
+                   verbose=opt.verbose)
+
+    #====== テスト ==============================
+    uspan = 400 #単位スパン
+    dskip = 20
+    rng = np.random.default_rng(0)
+
+    ## 値による色付け: 2次元の正規分布の点を，中心からの距離で色付けする
+    n = opt.num
+    xs, ys = rng.normal(0.5, 0.15, size=(2, n))
+    values = np.hypot(xs - 0.5, ys - 0.5)
+    CV.put(trans=crt.Translate(dest=(dskip, dskip)),
+           child=bd.DrawScatter(x=xs*uspan, y=ys*uspan, size=0.8, marker=opt.marker,
+                                values=values, cmap='viridis', alpha=0.5))
+
+    ## 点ごとの色と大きさ: 分類の色地図の色で描く
+    m = 200
+    cats = rng.integers(0, 5, size=m)
+    rgbs = np.array([ crt.DARKCOL[name] for name in list(crt.DARKCOL)[:5] ])[cats]
+    CV.put(trans=crt.Translate(dest=(2*dskip + uspan, dskip)),
+           child=bd.DrawScatter(x=rng.random(m)*uspan/2, y=rng.random(m)*uspan/2,
+                                size=rng.uniform(2, 6, size=m), marker='cross',
+                                rgbs=rgbs, linewidth=1.0))
+    #===== 図形のテスト ==============================
+
+    #============
+    #印刷
+    #============
+    CV.show(noshow=opt.noshow)
+    
+    pass 
+
+##EOF
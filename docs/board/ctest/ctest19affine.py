@@ -0,0 +1,82 @@
+# coding: utf_8
+# ctest19affine.py
+# - Affine, Rotate, Scaleにより，部分木を回転・拡大して配置する．
+# - 同じ部分木を，角度を変えて並べる．
+import sys
+from argparse import ArgumentParser
+import math 
+
+import common as com 
+##
+import crtool as crt
+import cboard as bd
+
+##=====
+## コマンドライン引数
+##=====
+CMD_NAME = (__file__.split('/'))[-1]
+
+def reading_args_and_options():
+    USAGE_STR = f'Usage: python3 { CMD_NAME } OPTIONS '
+    ap = ArgumentParser(usage=USAGE_STR)
+    ## noshow
+    ap.add_argument('-n', '--noshow', action='store_true', default=False, 
+                    help='supreess to displaying graphics')
+    ## num 
+    ap.add_argument('-N', '--num', type=int, default=12, 
+                    help='set the number of rotated copies to int')
+    ## verbose 
+    ap.add_argument('-v', '--verbose', action='store_true', default=False, 
+                    help='show verbose messages')
+    ## 
+    args = ap.parse_args()
+    return args, ap
+
+def make_flag(idx=0):
+    """回転して並べる部分木：長方形と円と線分列"""
+    B = bd.Board()
+    rgb = list(crt.DARKCOL.values())[idx % len(crt.DARKCOL)]
+    B.put(child=bd.DrawRectangle(x=0, y=-5, width=60, height=10, fill='fill', rgb=rgb))
+    B.put(trans=crt.Translate(dest=(70, 0)), 
+          child=bd.DrawCircle(x=0, y=0, r=6, fill='fill', rgb=rgb))
+    P = bd.DrawPolyLines(linewidth=1.0)
+    P.move_to(0, 8).line_to(60, 8)
+    B.put(child=P)
+    return B
+
+##======
+## メイン文
+##======
+
+if __name__ == '__main__':
+    #コマンドラインの引数とオプションの読み込み
+    opt, ap = reading_args_and_options()
+
+    #画像枠の生成
+    CV = bd.Canvas(outfile="out",
+                   imagesize='VGA',
+                   portrait=False,
+                   verbose=opt.verbose)
+
+    #====== テスト ==============================
+    ## 中心のまわりに回転して並べる
+    for idx in range(opt.num):
+        angle = 2*math.pi*idx/opt.num
+        CV.put(trans=crt.Affine().translate(200, 240).rotate(angle).scale(1.0 + 0.5*idx/opt.num),
+               child=make_flag(idx))
+
+    ## 拡大縮小と回転の中心を指定する
+    CV.put(trans=crt.compose_trans(crt.Translate(dest=(420, 100)),
+                                   crt.Rotate(angle=math.pi/6, center=(30, 0)),
+                                   crt.Scale(sx=2.0, sy=0.5)),
+           child=make_flag(0))
+    #===== 図形のテスト ==============================
+
+    #============
+    #印刷
+    #============
+    CV.show(noshow=opt.noshow)
+    
+    pass 
+
+##EOF
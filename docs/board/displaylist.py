@@ -0,0 +1,542 @@
+# coding: utf_8
+# displaylist.py
+"""描画リスト（display list）のモジュール．
+
+* 配置済みのボードの木を平坦化した描画命令の列を保持し，cairo.Contextの上で再生する．
+* 描画命令は，命令コード，根の空間での絶対座標，共有された（interned）文脈パラメータの番号からなる．
+* 再生では，ボードの木の走査，子の対の分解，型検査，キーワードの検索を一切行わない．同じ配置を多数の面（surface）に描画するときは，一度だけ描画リストを作り，繰り返し再生すると良い．
+* 再生では，クラス`crt.StyleState`により現在の文脈パラメータを追跡し，直前の命令から変化した項目だけをcairo.Contextに設定する．命令ごとの`save()`と`restore()`も行わない．
+
+Attributes:
+
+OP_RECT = 0 (int): 矩形の命令コード．引数は`(x, y, width, height, finish, edge_rgb)`
+
+OP_CIRCLE = 1 (int): 円の命令コード．引数は`(x, y, r, finish)`
+
+OP_POLYLINES = 2 (int): 線分列の命令コード．引数は`(moves, xs, ys, finish, arrows, arrow_head)`
+
+OP_CALL = 3 (int): 代替の命令コード．引数は`(func, ox, oy)`．原点を`(ox, oy)`に移して，関数`func(cr)`を呼ぶ．
+
+OP_IMAGE = 4 (int): 画像の命令コード．引数は`(argb, x, y, width, height, filter, alpha)`
+
+OP_MARKERS = 5 (int): 同じ色と形のマーカーの列の命令コード．引数は`(marker, xs, ys, rs, finish)`．座標と半径はNumPy配列．
+
+OP_MATRIX = 6 (int): 変換行列の命令コード．引数は`matrix`．以降の命令の座標を，根の空間への変換行列`matrix`で写す．Noneは恒等変換である．平行移動以外の変換（回転や拡大縮小）をもつ部分木でだけ用いる．
+
+* 関数`DisplayList.render_parallel()`で，プロセスプールによりタイルごとに並列に描画できる．プロセスの開始方法は`TILE_START_METHOD`である．代替の命令（OP_CALL）はボードのメソッドを保持してpickleできないので，これを含む描画リストは，開始方法が`'fork'`でなければ，このプロセスだけで描く．
+
+TILE_START_METHOD (str): タイルを描くプロセスプールの開始方法．`'fork'`が使えればそれを，そうでなければ`'spawn'`を用いる．
+"""
+import os
+import math
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import common as com
+import crtool as crt
+import geometry as geo
+
+## 命令コード
+OP_RECT      = 0
+OP_CIRCLE    = 1
+OP_POLYLINES = 2
+OP_CALL      = 3
+OP_IMAGE     = 4
+OP_MARKERS   = 5
+OP_MATRIX    = 6
+
+## 包含矩形をもたなければ何も描かない命令．OP_MATRIXは状態だけを変え，OP_POLYLINESとOP_MARKERSは点がないときに限り包含矩形をもたない
+_NOOP_WITHOUT_BOX = (OP_MATRIX, OP_POLYLINES, OP_MARKERS)
+
+## プロセスプールの開始方法．forkならば描画リストをpickleせずに子プロセスへ引き継ぐ
+TILE_START_METHOD = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+
+#=====
+# 描画リスト
+#=====
+
+class DisplayList:
+    """描画リストのクラス．関数`BoardBase.compile()`により生成される．
+
+    Attributes:
+         ops (list(tuple)) : 描画命令`(opcode, style_id, args)`のリスト
+
+         styles (list(crt.Style)) : 共有された文脈パラメータの組のリスト
+
+    Example::
+
+         dlist = canvas.compile() #一度だけ平坦化する
+         for cr in contexts:
+             dlist.replay(cr)     #繰り返し再生する
+    """
+    def __init__(self):
+        self.ops : list = []
+        self.styles : list = []
+        self.style_ids_ : dict = {} #文脈パラメータの組から番号への辞書
+        self.boxes_ : list = []     #命令ごとの絶対座標の包含矩形．Noneは間引かない．
+        self.box_array_ = None      #間引き用の包含矩形の配列．関数`replay()`が作る
+        self.matrix_ = None         #現在の変換行列．Noneは恒等変換
+        return
+
+    def __len__(self):
+        return len(self.ops)
+
+    def intern_style(self, style=None) -> int:
+        """文脈パラメータの組`style`を共有し，その番号を返す．
+
+        Args:
+             style (crt.Style) : 文脈パラメータの組．Noneならば指定なしの組とする．
+        """
+        if style == None:
+            style = crt.EMPTY_STYLE
+        style_id = self.style_ids_.get(style)
+        if style_id == None:
+            style_id = len(self.styles)
+            self.styles.append(style)
+            self.style_ids_[style] = style_id
+        return style_id
+
+    def _append(self, opcode, style_id, args, box, is_root=False):
+        #is_root: 包含矩形boxが，既に根の空間のものか
+        if box != None and self.matrix_ != None and not is_root:
+            box = crt.matrix_apply_box(self.matrix_, box) #根の空間の包含矩形に直す
+        self.ops.append((opcode, style_id, args))
+        self.boxes_.append(box)
+        self.box_array_ = None
+        return
+
+    def set_matrix(self, matrix=None) -> tuple:
+        """以降に追加する命令の空間から根の空間への変換行列を`matrix`にし，命令の座標に加える原点の位置`(ox, oy)`を返す．
+        平行移動ならば，命令を追加せずに，その移動量を原点として返す．そうでなければ，変化したときだけ変換行列の命令を追加し，原点`(0.0, 0.0)`を返す．
+
+        Args:
+             matrix (tuple) : 変換行列`(xx, yx, xy, yy, x0, y0)`．関数`crt.matrix_multiply()`を参照のこと．
+
+        Returns:
+             (tuple(float,float)) : 原点の位置`(ox, oy)`
+        """
+        ox, oy = 0.0, 0.0
+        if crt.matrix_is_translation(matrix):
+            ox, oy = matrix[4], matrix[5]
+            matrix = None
+        if matrix != self.matrix_:
+            self._append(OP_MATRIX, None, matrix, None)
+            self.matrix_ = matrix
+        return ox, oy
+
+    #=====
+    # 命令の追加
+    #=====
+    def add_rectangle(self, x, y, width, height, style_id=None,
+                      fill=None, edge_rgb=None):
+        """矩形の命令を追加する．関数`crt.cr_rectangle()`に相当する．座標は根の空間の絶対座標である．
+        """
+        finish = crt.cr_resolve_stroke_or_fill(fill=fill)
+        self._append(OP_RECT, style_id,
+                     (x, y, width, height, finish, edge_rgb or None),
+                     (x, y, x + width, y + height))
+        return
+
+    def add_circle(self, x, y, r, style_id=None, fill=None):
+        """円の命令を追加する．関数`crt.cr_circle()`に相当する．座標は根の空間の絶対座標である．
+        """
+        finish = crt.cr_resolve_stroke_or_fill(fill=fill)
+        self._append(OP_CIRCLE, style_id, (x, y, r, finish),
+                     (x - r, y - r, x + r, y + r))
+        return
+
+    def add_polylines(self, moves, xs, ys, style_id=None, fill=None, preserve=None,
+                      arrows=None, arrow_head=None):
+        """線分列の命令を追加する．座標は根の空間の絶対座標である．
+
+        Args:
+             moves, xs, ys (list) : 関数`crt.cr_polylines()`の引数．線分列全体を一つのパスとして，一度だけ書き出す．
+
+             arrows (list(tuple)) : 矢印頭を描く線分`(x_last, y_last, x, y)`のリスト．default=None.
+
+             arrow_head (dict) : 関数`crt.cr_arrow_head()`に渡すキーワード引数．default=None.
+        """
+        finish = crt.cr_resolve_stroke_or_fill(fill=fill, preserve=preserve)
+        box = None
+        if len(xs) > 0:
+            box = geo.points_bbox(np.column_stack((xs, ys)))
+        self._append(OP_POLYLINES, style_id,
+                     (moves, xs, ys, finish, tuple(arrows or ()), arrow_head or crt.EMPTY_DICT),
+                     box)
+        return
+
+    def add_image(self, argb, x, y, width, height, filter=None, alpha=None):
+        """画像の命令を追加する．関数`crt.cr_draw_image()`に相当する．座標は根の空間の絶対座標である．
+        配列`argb`は複写せずに共有する．
+        """
+        self._append(OP_IMAGE, None, (argb, x, y, width, height, filter, alpha),
+                     (x, y, x + width, y + height))
+        return
+
+    def add_markers(self, marker, xs, ys, rs, style_id=None, fill=None):
+        """マーカーの列の命令を追加する．関数`crt.cr_markers()`に相当する．座標は根の空間の絶対座標である．
+        包含矩形は，配列の最小値と最大値から一度に求める．
+
+        Args:
+             marker (str) : マーカーの形．`crt.MARKER_SHAPES`のいずれか．
+
+             xs, ys, rs (numpy.ndarray) : マーカーの中心の座標と半径の配列．複写せずに共有する．
+        """
+        finish = crt.cr_resolve_stroke_or_fill(fill=fill)
+        box = None
+        if len(xs) > 0:
+            box = (float((xs - rs).min()), float((ys - rs).min()),
+                   float((xs + rs).max()), float((ys + rs).max()))
+        self._append(OP_MARKERS, style_id, (marker, xs, ys, rs, finish), box)
+        return
+
+    def add_call(self, func, ox=0.0, oy=0.0, box=None):
+        """代替の命令を追加する．再生時に，原点を`(ox, oy)`に移して，関数`func(cr)`を呼ぶ．
+        描画リストに変換できない描画（デバッグ表示など）に用いる．
+
+        Args:
+             func (callable) : 関数`func(cr)`
+
+             box (tuple(float,float,float,float)) : 根の空間の包含矩形．変換行列`matrix_`では写さない．Noneならば間引かない．
+        """
+        self._append(OP_CALL, None, (func, ox, oy), box, is_root=True)
+        return
+
+    def has_calls(self) -> bool:
+        """代替の命令（OP_CALL）を含むかを返す．代替の命令はボードのメソッドを保持するので，描画リストをpickleできない．
+        """
+        return any(op[0] == OP_CALL for op in self.ops)
+
+    #=====
+    # 再生
+    #=====
+    def box_array(self) -> np.ndarray:
+        """命令ごとの絶対座標の包含矩形を行とする形`(n, 4)`の配列を返す．包含矩形をもたない命令の行は無限大の矩形である．
+        """
+        if self.box_array_ is None:
+            self.box_array_ = np.array([ (-np.inf, -np.inf, np.inf, np.inf) if box == None else box
+                                         for box in self.boxes_ ], dtype=float).reshape(-1, 4)
+        return self.box_array_
+
+    def visible_mask(self, cr, margin=0.0):
+        """クリップ領域と交わる命令を真とする配列を返す．包含矩形をもたない命令は真とする．
+        """
+        #現在の利用者空間，すなわち根の空間でのクリップ領域
+        return geo.boxes_intersect(self.box_array(), cr.clip_extents(), margin=margin)
+
+    def replay(self, cr, culling=True, margin=0.0):
+        """描画リストを，cairo.Context `cr`の上で再生する．
+
+        Args:
+             cr (cairo.Context) : Cairoの文脈オブジェクト
+
+             culling (bool) : クリップ領域と交わらない命令を省くかのフラグ．default=True.
+
+             margin (float) : 間引きに用いる包含矩形の余白．default=0.0.
+        """
+        com.ensure(cr != None, f'cr must not be None!')
+        visible = None
+        if culling and len(self.ops) > 0:
+            visible = self.visible_mask(cr, margin=margin).tolist()
+            clip_x0, clip_y0, clip_x1, clip_y1 = cr.clip_extents()
+        styles = self.styles
+        state = crt.StyleState(context=cr) #基準の状態を保存する
+        matrix = None
+        for idx, (opcode, style_id, args) in enumerate(self.ops):
+            if visible != None and not visible[idx]:
+                continue
+            if opcode == OP_RECT:
+                x, y, width, height, finish, edge_rgb = args
+                state.apply(styles[style_id])
+                cr.rectangle(x, y, width, height)
+                if edge_rgb:
+                    cr.fill_preserve()
+                    cr.save()
+                    crt.cr_set_source_rgb(source_rgb=edge_rgb, context=cr)
+                    cr.stroke()
+                    cr.restore()
+                else:
+                    getattr(cr, finish)()
+            elif opcode == OP_CIRCLE:
+                x, y, r, finish = args
+                cr.new_sub_path()
+                state.apply(styles[style_id])
+                cr.arc(x, y, r, 0.0, 2.0*np.pi)
+                getattr(cr, finish)()
+            elif opcode == OP_POLYLINES:
+                moves, xs, ys, finish, arrows, arrow_head = args
+                state.apply(styles[style_id])
+                crt.cr_polylines(moves, xs, ys, context=cr)
+                getattr(cr, finish)()
+                for x0, y0, x1, y1 in arrows:
+                    crt.cr_arrow_head(x1, y1, x0, y0, context=cr, **arrow_head)
+            elif opcode == OP_IMAGE:
+                argb, x, y, width, height, filter, alpha = args
+                crt.cr_draw_image(argb, x, y, width, height, filter=filter, alpha=alpha,
+                                  context=cr)
+            elif opcode == OP_MARKERS:
+                marker, xs, ys, rs, finish = args
+                if visible != None and matrix == None: #クリップ領域と交わるマーカーだけを描く
+                    rm = rs + margin
+                    mask = ((clip_x0 <= xs + rm) & (xs - rm <= clip_x1) &
+                            (clip_y0 <= ys + rm) & (ys - rm <= clip_y1))
+                    if not mask.all():
+                        xs, ys, rs = xs[mask], ys[mask], rs[mask]
+                state.apply(styles[style_id])
+                crt.cr_markers(marker, xs, ys, rs, context=cr)
+                getattr(cr, finish)()
+            elif opcode == OP_MATRIX:
+                matrix = args
+                state.set_matrix(matrix)
+            elif opcode == OP_CALL:
+                func, ox, oy = args
+                state.reset() #代替の命令は，基準の状態で呼ぶ
+                cr.save()
+                cr.translate(ox, oy)
+                func(cr)
+                cr.restore()
+            else:
+                com.panic(f'no such opcode={opcode}!')
+        state.close()
+        return
+
+    def render_parallel(self, display_shape=None, scale=1.0, processes=None,
+                        tile_height=crt.DEFAULT_BAND_HEIGHT, margin=0.0) -> 'SharedImage':
+        """描画リストを，横長のタイルに分けてプロセスプールで並列に描画し，共有メモリ上の画像を返す．
+        各プロセスは，自分のタイルを共有メモリの該当する領域に直接描くので，画像の組み立てに複写は要らない．
+
+        Args:
+             display_shape (tuple(float, float)) : 拡大前の画像のサイズ `(xsize, ysize)`
+
+             scale (float) : 拡大率．default=1.0.
+
+             processes (int) : プロセス数．default=None. Noneならば`os.cpu_count()`．1ならば，このプロセスで描く．代替の命令を含み，開始方法`TILE_START_METHOD`が`'fork'`でなければ，常にこのプロセスで描く．
+
+             tile_height (int) : タイルの高さ（画素）．default=crt.DEFAULT_BAND_HEIGHT.
+
+             margin (float) : 間引きに用いる包含矩形の余白．default=0.0.
+
+        Returns:
+             (SharedImage) : 描画済みの画像．使用後に関数`close()`で共有メモリを解放すること．
+        """
+        width = int(math.ceil(display_shape[0]*scale))
+        height = int(math.ceil(display_shape[1]*scale))
+        tile_height = max(1, min(int(tile_height), crt.MAX_SURFACE_SIZE))
+        tile_width = min(width, crt.MAX_SURFACE_SIZE)
+        image = SharedImage(width, height)
+        tiles = [ (image.shm.name, image.stride, x0, y0,
+                   min(tile_width, width - x0), min(tile_height, height - y0), scale, margin)
+                  for y0 in range(0, height, tile_height)
+                  for x0 in range(0, width, tile_width) ]
+        try:
+            self._map_tiles(_render_tile, tiles, processes=processes)
+        except BaseException:
+            image.close()
+            raise
+        return image
+
+    def occupied_tiles(self, scale=1.0, tile_size=256, num_tiles=None, margin=0.0) -> np.ndarray:
+        """拡大率`scale`の画像を一辺`tile_size`のタイルに分けたとき，描画命令の包含矩形と交わるタイルを真とする配列を返す．
+        何も描かない命令，すなわち変換行列の命令（OP_MATRIX）と，点をもたず包含矩形のない線分列とマーカーの命令は除く．包含矩形のない代替の命令（OP_CALL）だけが，全てのタイルと交わる．
+
+        Args:
+             num_tiles (tuple(int, int)) : タイルの個数`(nx, ny)`
+
+        Returns:
+             (numpy.ndarray) : 形`(ny, nx)`の真理値の配列
+        """
+        nx, ny = num_tiles
+        boxes = self.box_array()
+        if len(boxes) > 0: 
+            boxes = boxes[np.array([ not (op[0] in _NOOP_WITHOUT_BOX and box == None)
+                                     for op, box in zip(self.ops, self.boxes_) ])]
+        if len(boxes) == 0: 
+            return np.zeros((ny, nx), dtype=bool)
+        #タイルの添字の範囲．包含矩形をもたない代替の命令は全てのタイルと交わる
+        with np.errstate(invalid='ignore'):
+            t = np.floor((boxes + np.array([-margin, -margin, margin, margin]))*scale/tile_size)
+        tx0 = np.clip(np.nan_to_num(t[:, 0], neginf=0), 0, nx).astype(int)
+        ty0 = np.clip(np.nan_to_num(t[:, 1], neginf=0), 0, ny).astype(int)
+        tx1 = np.clip(np.nan_to_num(t[:, 2], posinf=nx) + 1, 0, nx).astype(int)
+        ty1 = np.clip(np.nan_to_num(t[:, 3], posinf=ny) + 1, 0, ny).astype(int)
+        ok = (tx0 < tx1) & (ty0 < ty1)
+        #二次元の差分配列の累積和で，全ての範囲を一度に塗る
+        diff = np.zeros((ny + 1, nx + 1), dtype=np.int64)
+        np.add.at(diff, (ty0[ok], tx0[ok]), 1)
+        np.add.at(diff, (ty0[ok], tx1[ok]), -1)
+        np.add.at(diff, (ty1[ok], tx0[ok]), -1)
+        np.add.at(diff, (ty1[ok], tx1[ok]), 1)
+        return diff.cumsum(axis=0).cumsum(axis=1)[:ny, :nx] > 0
+
+    def render_pyramid(self, outdir=None, display_shape=None, tile_size=256,
+                       min_zoom=0, max_zoom=None, processes=None, margin=0.0) -> list:
+        """描画リストを，多重解像度のタイルのピラミッドとして，PNG画像`{outdir}/{z}/{x}/{y}.png`に書き出す．
+        ズーム`max_zoom`で原寸，ズームが1減るごとに半分の大きさである．
+        描画命令と交わらない空のタイルは書き出さない．タイルはプロセスプールで並列に描画する．
+
+        Args:
+             outdir (str) : 出力先のディレクトリ
+
+             display_shape (tuple(float, float)) : 原寸の画像のサイズ `(xsize, ysize)`
+
+             tile_size (int) : タイルの一辺（画素）．default=256.
+
+             min_zoom (int) : 最小のズーム．default=0.
+
+             max_zoom (int) : 最大のズーム．default=None. Noneならば，ズーム0で画像全体が一つのタイルに収まる値．
+
+             processes (int) : プロセス数．default=None. Noneならば`os.cpu_count()`．関数`render_parallel()`と同じく，代替の命令を含み，開始方法が`'fork'`でなければ，このプロセスで描く．
+
+             margin (float) : 空のタイルの判定に用いる包含矩形の余白．default=0.0.
+
+        Returns:
+             (list(tuple(int,int,int))) : 書き出したタイル`(z, x, y)`のリスト
+        """
+        com.ensure(tile_size != None and tile_size > 0, f'tile_size={tile_size} must be positive!')
+        width, height = display_shape
+        if max_zoom == None: 
+            max_zoom = max(0, int(math.ceil(math.log2(max(width, height, 1)/tile_size))))
+        com.ensure(0 <= min_zoom <= max_zoom, f'0 <= min_zoom={min_zoom} <= max_zoom={max_zoom} must hold!')
+        tiles, written = [], []
+        for z in range(min_zoom, max_zoom + 1):
+            scale = 2.0**(z - max_zoom)
+            w, h = int(math.ceil(width*scale)), int(math.ceil(height*scale))
+            nx, ny = -(-w // tile_size), -(-h // tile_size)
+            occupied = self.occupied_tiles(scale=scale, tile_size=tile_size,
+                                           num_tiles=(nx, ny), margin=margin)
+            for y, x in zip(*np.nonzero(occupied)):
+                x, y = int(x), int(y)
+                os.makedirs(os.path.join(outdir, str(z), str(x)), exist_ok=True)
+                x0, y0 = x*tile_size, y*tile_size
+                tiles.append((os.path.join(outdir, str(z), str(x), f'{y}.png'),
+                              x0, y0, min(tile_size, w - x0), min(tile_size, h - y0), scale, margin))
+                written.append((z, x, y))
+        self._map_tiles(_render_tile_png, tiles, processes=processes)
+        return written
+
+    def _map_tiles(self, func, tiles, processes=None):
+        #タイルの列に関数funcを適用する．processes > 1ならばプロセスプールで並列に行う
+        #fork以外の開始方法では描画リストをpickleして送るので，代替の命令を含むならば，このプロセスで行う
+        if len(tiles) == 0: 
+            return
+        if processes == None: 
+            processes = os.cpu_count() or 1
+        processes = min(processes, len(tiles))
+        if TILE_START_METHOD != 'fork' and self.has_calls(): 
+            processes = 1
+        if processes <= 1: 
+            _init_tile_worker(self)
+            try: 
+                for tile in tiles: 
+                    func(tile)
+            finally: 
+                _init_tile_worker(None) #描画リストへの参照を捨てる
+        else:
+            ctx = multiprocessing.get_context(TILE_START_METHOD)
+            with ctx.Pool(processes, initializer=_init_tile_worker,
+                          initargs=(self,)) as pool:
+                pool.map(func, tiles, chunksize=1)
+        return
+
+    pass ##class DisplayList
+
+#=====
+# タイルの並列描画
+#=====
+
+class SharedImage:
+    """共有メモリ（multiprocessing.shared_memory）の上のFORMAT_ARGB32の画像のクラス．
+    関数`DisplayList.render_parallel()`が返す．
+
+    Args:
+         width, height (int) : 画像のサイズ（画素）
+
+    Attributes:
+         shm (shared_memory.SharedMemory) : 画像の共有メモリ
+
+         stride (int) : 行のバイト数
+
+         array (numpy.ndarray) : 画素の形`(height, width, 4)`のuint8配列．共有メモリの上の複写なしの表示（view）である．
+    """
+    def __init__(self, width=None, height=None):
+        self.width, self.height = int(width), int(height)
+        self.stride = crt.cr_format_stride(self.width)
+        #末尾の1行は余白．タイルの部分バッファの長さを，常にタイルの行数分以上にするため
+        self.shm = shared_memory.SharedMemory(create=True, size=self.stride*(self.height + 1))
+        self.array = np.ndarray((self.height, self.stride // 4, 4), dtype=np.uint8,
+                                buffer=self.shm.buf)[:, :self.width]
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def write_png(self, target=None):
+        """画像をPNG画像として書き出す．cairoの画像面の大きさの上限を超えるときは，関数`crt.PngStreamWriter`で帯ごとに書き出す．
+        """
+        if self.width <= crt.MAX_SURFACE_SIZE and self.height <= crt.MAX_SURFACE_SIZE:
+            buf = self.shm.buf[:self.stride*self.height]
+            surface = crt.cr_surface_for_data(buf, self.width, self.height, self.stride)
+            surface.write_to_png(target)
+            surface.finish()
+            del surface
+            buf.release()
+        else:
+            with crt.PngStreamWriter(target, self.width, self.height) as png:
+                for y0 in range(0, self.height, crt.DEFAULT_BAND_HEIGHT):
+                    png.write_rows(crt.argb32_to_rgba(self.array[y0:y0 + crt.DEFAULT_BAND_HEIGHT]))
+        return target
+
+    def close(self):
+        """共有メモリを解放する．
+        """
+        if self.shm != None: 
+            self.array = None #共有メモリへの参照を先に捨てる
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+        return
+
+_tile_dlist = None #プロセスごとの描画リスト．関数`_init_tile_worker()`が設定する
+
+def _init_tile_worker(dlist):
+    global _tile_dlist
+    _tile_dlist = dlist
+    return
+
+def _render_tile(tile):
+    """タイル`tile`を，共有メモリの該当する領域に描く．プロセスプールの各プロセスで呼ばれる．
+    """
+    name, stride, x0, y0, width, height, scale, margin = tile
+    shm = shared_memory.SharedMemory(name=name)
+    buf = shm.buf[y0*stride + 4*x0:]
+    try:
+        surface = crt.cr_surface_for_data(buf, width, height, stride)
+        crt.cr_draw_tile(lambda cr: _tile_dlist.replay(cr, culling=True, margin=margin),
+                         context=crt.cr_create_context(surface),
+                         x0=x0, y0=y0, width=width, height=height, scale=scale)
+        surface.flush()
+        surface.finish()
+        del surface
+    finally:
+        buf.release()
+        shm.close()
+    return (x0, y0)
+
+def _render_tile_png(tile):
+    """タイル`tile`を描いて，PNG画像に書き出す．プロセスプールの各プロセスで呼ばれる．
+    """
+    path, x0, y0, width, height, scale, margin = tile
+    surface = crt.cr_create_surface(format='png', display_shape=(width, height))
+    crt.cr_draw_tile(lambda cr: _tile_dlist.replay(cr, culling=True, margin=margin),
+                     context=crt.cr_create_context(surface),
+                     x0=x0, y0=y0, width=width, height=height, scale=scale)
+    crt.cr_write_surface(surface, format='png', outfile=path)
+    return path
+
+##EOF
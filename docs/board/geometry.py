@@ -0,0 +1,194 @@
+# coding: utf_8
+# geometry.py
+"""点と矩形と変換のベクトル化された幾何計算のモジュール．
+
+* 関数`crt.vt_add()`, `crt.box_union()`, `crt.box_apply_trans()`などの，一つの組を扱う関数の一括版である．
+* 点の列は形`(n, 2)`の配列，矩形の列は形`(n, 4)`の配列，変換行列の列は形`(n, 6)`の配列で表す．
+* 入力の検査は，関数`as_points()`と`as_boxes()`で，配列全体に対して一度だけ行う．他の関数は，要素ごとの検査を行わない．
+
+Example::
+
+     import geometry as geo
+     boxes = geo.as_boxes(child_boxes)                     #一度だけ検査する
+     tboxes = geo.boxes_transform(boxes, matrices)         #子ごとの変換をまとめて適用する
+     box = geo.boxes_union(tboxes, initial=(0.0, 0.0, 0.0, 0.0))
+"""
+import numpy as np
+
+import common as com
+import crtool as crt
+
+#=====
+# 検査と変換
+#=====
+
+def as_points(points=None, name='points') -> np.ndarray:
+    """点の列を形`(n, 2)`の実数配列として返し，一度だけ検査する．
+
+    Args:
+         points (array_like) : 点`(x, y)`の列
+
+         name (str) : エラー表示の名前．default='points'.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    com.ensure(not np.isnan(points).any(), f'{name} must not contain nan!')
+    return points
+
+def as_boxes(boxes=None, name='boxes') -> np.ndarray:
+    """矩形の列を形`(n, 4)`の実数配列として返し，一度だけ検査する．点の列（形`(n, 2)`）は，大きさ0の矩形に正規化する．
+
+    Args:
+         boxes (array_like) : 矩形`(x0, y0, x1, y1)`の列
+
+         name (str) : エラー表示の名前．default='boxes'.
+
+    Note:
+         関数`crt.box_normalize()`と同じく，全ての矩形が`x0 <= x1`かつ`y0 <= y1`を満たすことを検査する．
+    """
+    boxes = np.asarray(boxes, dtype=float)
+    if boxes.ndim == 2 and boxes.shape[1] == 2:
+        boxes = np.tile(boxes, 2)
+    boxes = boxes.reshape(-1, 4)
+    com.ensure(np.all(boxes[:, 2:] >= boxes[:, :2]),
+               f'{name} must be proper boxes!')
+    return boxes
+
+def trans_matrices(transes=None) -> np.ndarray:
+    """変換の列を，変換行列を行とする形`(n, 6)`の配列に変換する．Noneは恒等変換とみなす．
+    関数`crt.trans_matrix()`を参照のこと．
+    """
+    return np.array([ crt.trans_matrix(trans) for trans in transes ],
+                    dtype=float).reshape(-1, 6)
+
+#=====
+# 点の列
+#=====
+
+def points_add(points, vec) -> np.ndarray:
+    """点の列`points`の各点にベクトル`vec`（または，ベクトルの列）を加える．関数`crt.vt_add()`の一括版．
+    """
+    return points + np.asarray(vec, dtype=float)
+
+def points_sub(points, vec) -> np.ndarray:
+    """点の列`points`の各点からベクトル`vec`（または，ベクトルの列）を引く．関数`crt.vt_sub()`の一括版．
+    """
+    return points - np.asarray(vec, dtype=float)
+
+def points_scale(points, scale=None) -> np.ndarray:
+    """点の列`points`の各点をスカラー`scale`倍する．関数`crt.vt_scale()`の一括版．
+    """
+    if scale == None:
+        return points
+    return points*scale
+
+def points_bbox(points, initial=None) -> tuple:
+    """点の列`points`の包含矩形を返す．
+
+    Args:
+         initial (tuple(float,float,float,float)) : 和をとる初期の矩形．default=None.
+
+    Returns:
+         (com.Box) : 包含矩形．点がなければ`initial`．
+    """
+    return boxes_union(np.tile(np.asarray(points, dtype=float).reshape(-1, 2), 2),
+                       initial=initial)
+
+def points_transform(points, matrix) -> np.ndarray:
+    """点の列`points`に，変換行列`matrix`を適用する．関数`GeoTransform.apply_point()`の一括版．
+
+    Args:
+         matrix (tuple, numpy.ndarray) : 一つの変換行列（形`(6,)`），または，点ごとの変換行列の列（形`(n, 6)`）．関数`crt.matrix_multiply()`を参照のこと．
+    """
+    m = np.asarray(matrix, dtype=float)
+    x, y = points[:, 0], points[:, 1]
+    return np.stack((m[..., 0]*x + m[..., 2]*y + m[..., 4],
+                     m[..., 1]*x + m[..., 3]*y + m[..., 5]), axis=-1)
+
+def points_in_boxes(points, boxes, margin=0.0) -> np.ndarray:
+    """点の列`points`の各点が，矩形`boxes`（一つ，または，点ごとの矩形の列）に含まれるかの真理値の配列を返す．
+    """
+    b = np.asarray(boxes, dtype=float)
+    x, y = points[:, 0], points[:, 1]
+    return ((b[..., 0] - margin <= x) & (x <= b[..., 2] + margin) &
+            (b[..., 1] - margin <= y) & (y <= b[..., 3] + margin))
+
+#=====
+# 矩形の列
+#=====
+
+def boxes_union(boxes, initial=None) -> tuple:
+    """矩形の列`boxes`全体の最小包含矩形を返す．関数`crt.box_union()`の畳み込みの一括版．
+
+    Args:
+         boxes (numpy.ndarray) : 矩形の列
+
+         initial (tuple(float,float,float,float)) : 和をとる初期の矩形．default=None.
+
+    Returns:
+         (com.Box) : 包含矩形．矩形がなければ`initial`．
+    """
+    if len(boxes) == 0:
+        return initial
+    x0, y0 = boxes[:, 0].min(), boxes[:, 1].min()
+    x1, y1 = boxes[:, 2].max(), boxes[:, 3].max()
+    if initial != None:
+        x0, y0 = min(x0, initial[0]), min(y0, initial[1])
+        x1, y1 = max(x1, initial[2]), max(y1, initial[3])
+    return com.Box(float(x0), float(y0), float(x1), float(y1))
+
+def boxes_shapes(boxes) -> np.ndarray:
+    """矩形の列`boxes`の幅と高さを行とする形`(n, 2)`の配列を返す．関数`crt.box_to_shape()`の一括版．
+    """
+    return boxes[:, 2:] - boxes[:, :2]
+
+def boxes_translate(boxes, moves) -> np.ndarray:
+    """矩形の列`boxes`を，並行移動ベクトル`moves`（一つ，または，矩形ごとの列）だけ移す．
+    """
+    return boxes + np.tile(np.asarray(moves, dtype=float), 2)
+
+def boxes_transform(boxes, matrix) -> np.ndarray:
+    """矩形の列`boxes`に変換行列`matrix`を適用した像の包含矩形の列を返す．関数`crt.box_apply_trans()`の一括版．
+    平行移動だけならば二隅を，そうでなければ四隅を写して包含矩形をとる．
+
+    Args:
+         matrix (tuple, numpy.ndarray) : 一つの変換行列（形`(6,)`），または，矩形ごとの変換行列の列（形`(n, 6)`）．
+    """
+    m = np.asarray(matrix, dtype=float)
+    if np.all(m[..., :4] == crt.MATRIX_IDENTITY[:4]):
+        return boxes_translate(boxes, m[..., 4:])
+    x0, y0, x1, y1 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    xs = np.stack((m[..., 0]*x0, m[..., 0]*x1)), np.stack((m[..., 2]*y0, m[..., 2]*y1))
+    ys = np.stack((m[..., 1]*x0, m[..., 1]*x1)), np.stack((m[..., 3]*y0, m[..., 3]*y1))
+    #各成分ごとに，最小と最大は独立にとれる
+    return np.stack((xs[0].min(axis=0) + xs[1].min(axis=0) + m[..., 4],
+                     ys[0].min(axis=0) + ys[1].min(axis=0) + m[..., 5],
+                     xs[0].max(axis=0) + xs[1].max(axis=0) + m[..., 4],
+                     ys[0].max(axis=0) + ys[1].max(axis=0) + m[..., 5]), axis=-1)
+
+def boxes_intersect(boxes, box, margin=0.0) -> np.ndarray:
+    """矩形の列`boxes`の各矩形が，矩形`box`と余白`margin`を加えて交わるかの真理値の配列を返す．描画リストの再生での間引きに用いる．
+    """
+    x0, y0, x1, y1 = box
+    return ~((boxes[:, 2] + margin < x0) | (x1 + margin < boxes[:, 0]) |
+             (boxes[:, 3] + margin < y0) | (y1 + margin < boxes[:, 1]))
+
+def boxes_intersection(boxes, box) -> tuple:
+    """矩形の列`boxes`の各矩形と，矩形`box`（一つ，または，矩形ごとの列）の共通部分を返す．
+
+    Returns:
+         (tuple) : 組`(iboxes, nonempty)`．`iboxes`は共通部分の矩形の列，`nonempty`は共通部分が空でないかの真理値の配列．空の行の値は意味をもたない．
+    """
+    b = np.asarray(box, dtype=float)
+    iboxes = np.concatenate((np.maximum(boxes[:, :2], b[..., :2]),
+                             np.minimum(boxes[:, 2:], b[..., 2:])), axis=-1)
+    nonempty = np.all(iboxes[:, 2:] >= iboxes[:, :2], axis=1)
+    return iboxes, nonempty
+
+def anchor_points(boxes, vects) -> np.ndarray:
+    """矩形の列`boxes`において，正規化アンカーベクトル`vects`（一つ，または，矩形ごとの列）が表すアンカー点の列を返す．関数`crt.anchor_point_by_vector()`の一括版．
+    """
+    v = np.asarray(vects, dtype=float)
+    lo, hi = boxes[:, :2], boxes[:, 2:]
+    return np.where(hi == lo, lo, lo*(1.0 - v) + hi*v)
+
+##EOF
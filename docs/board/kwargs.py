@@ -50,22 +50,18 @@ def get(kwargs=None, key=None, altkeys=None, required=False, default=None):
     Returns: 
     	object: 辞書におけるキーワードkeyの値．値がNoneの場合は上記の説明に従う． 
     """
-    keys_ = []
     ## keyを処理
-    if key != None: 
-        if isinstance(key, str):
-            keys_.append(key)
-        else: com.panic(f'key="{key}" must be str!')
-    ## altkeysを処理
+    if key != None and not isinstance(key, str):
+        com.panic(f'key="{key}" must be str!')
+    if key in kwargs: 
+        return kwargs[key]
+    ## altkeysを処理：順にテストする
     if altkeys != None: 
-        if com.is_typeof_seq(altkeys, etype=str, verbose=True): 
-            keys_.extend(altkeys)
-        else: com.panic(f'altkeys="{altkeys}" must be of sequence type (str, tuple, list, dict...)!')
-
-    #キーリストkeys_のメンバーを順にテストする
-    for key in keys_: 
-        if key in kwargs: 
-            return kwargs[key]
+        if not com.is_typeof_seq(altkeys, etype=str, verbose=True): 
+            com.panic(f'altkeys="{altkeys}" must be of sequence type (str, tuple, list, dict...)!')
+        for key in altkeys: 
+            if key in kwargs: 
+                return kwargs[key]
     
     #まだ見つからなければ，次を試す
     if default != None:
@@ -102,6 +98,75 @@ def require(kwargs=None, keys=None, verbose=False):
                 panic0(key0)
     return True 
             
+#======
+# 代替キーの表
+#======
+
+class AliasTable:
+    """キーワードの正規名と代替キー（alias）の表．オプションの族ごとに一度だけ宣言し，検査する．
+    関数`get()`のように，呼び出しごとにキーのリストを作り直して検査することをしない．
+
+    Args: 
+    	aliases (dict(str, list(str))): 正規名から代替キーの列への辞書．列の順が優先順位である．一つの代替キーを，複数の正規名が共有しても良い．
+
+    	name (str): 表の名前．default=None.
+
+    Attributes: 
+    	keys_ (dict(str, tuple(str))): 正規名から，正規名と代替キーを優先順に並べたタプルへの辞書．
+
+    	aliases_ (frozenset(str)): 正規名でない代替キーの集合．
+
+    Example::
+
+    	STYLE_ALIASES = kw.AliasTable({'linewidth': ['line_width', 'pen_width']}, name='style')
+    	kwargs1 = STYLE_ALIASES.resolve(kwargs)  #生成時に一度だけ，正規名に直す
+    	lw = kwargs1.get('linewidth')            #以後は，辞書を引くだけ
+    """
+    def __init__(self, aliases=None, name=None):
+        com.ensure(isinstance(aliases, dict), f'aliases={aliases} must be dict!')
+        self.name : str = name
+        self.keys_ : dict = {}
+        for key, altkeys in aliases.items():
+            com.ensure(isinstance(key, str), f'key="{key}" must be str!')
+            com.ensure(com.is_typeof_seq(altkeys, etype=str, verbose=True),
+                       f'altkeys="{altkeys}" must be a sequence of str!')
+            self.keys_[key] = (key,) + tuple(altkeys)
+        self.aliases_ : frozenset = frozenset(k for keys in self.keys_.values()
+                                              for k in keys[1:]) - frozenset(self.keys_)
+        return
+
+    def __repr__(self):
+        return f'AliasTable(name={self.name}, keys={list(self.keys_)})'
+
+    def get(self, kwargs=None, key=None, required=False, default=None):
+        """キーワード辞書kwargsから，正規名keyまたはその代替キーの値を，優先順に探して返す．関数`get(kwargs, key, altkeys)`と同じ規則に従う．
+        """
+        for key_ in self.keys_[key]: 
+            if key_ in kwargs: 
+                return kwargs[key_]
+        if default != None:
+            return default
+        elif required:
+            com.panic(f'key={key} is not defined!')
+        else:
+            return None
+
+    def resolve(self, kwargs=None) -> dict:
+        """キーワード辞書kwargsの代替キーを正規名に直した辞書を返す．同じ正規名のキーが複数あれば，優先順位の高いものをとる．表にないキーは，そのまま残す．
+        代替キーを含まなければ，元の辞書をそのまま返す．そうでなければ，元の辞書を変更せずにコピーを返す．
+        """
+        if self.aliases_.isdisjoint(kwargs): 
+            return kwargs
+        kwargs1 = { key: value for key, value in kwargs.items() if key not in self.aliases_ }
+        for name, keys in self.keys_.items():
+            for key in keys: 
+                if key in kwargs: 
+                    kwargs1[name] = kwargs[key]
+                    break
+        return kwargs1
+
+    pass ##class AliasTable
+
 ##キーワード引数辞書からの部分コピー
 def extract(kwargs=None, keys=[],
             required=[],
@@ -11,10 +11,56 @@
 	* ログ出力の管理
 """
 import sys
+import types
 from typing import Any, NoReturn
 import common as com
 import kwargs as kw
 
+#==========
+# 木の走査
+#==========
+
+def run_task(task=None) -> Any:
+    """再帰呼び出しを用いずに，入れ子のタスクを明示的なスタックで実行し，その返り値を返す．
+
+    * タスクは，ジェネレータとして書かれた処理である．
+    * タスクは，部分タスク（ジェネレータ）を`yield`すると，その部分タスクを実行し，返り値を`yield`の値として受け取る．これは，部分タスクの関数呼び出しに相当する．
+    * タスクが`return value`で終わると，その値が呼び出し元のタスクに送られる．
+
+    Args: 
+         task (generator) : 実行するタスク
+
+    Returns: 
+         (Any) : タスクの返り値
+
+    Example:: 
+
+         def count(node):
+             num = 1
+             for _, child in node.children():
+                 num += yield count(child) #部分タスクの呼び出し
+             return num
+
+         num = log.run_task(count(root)) #木の深さによらず，スタックは溢れない
+
+    Note: 
+         Pythonの再帰呼び出しの深さの上限と，呼び出しごとのフレームの生成を避けるために，木を走査する関数の実装に用いる．
+    """
+    com.ensure(isinstance(task, types.GeneratorType),
+               f'task={task} must be a generator!')
+    stack = [task] #実行中のタスクのスタック
+    value = None   #直前に終了した部分タスクの返り値
+    while stack:
+        try:
+            subtask = stack[-1].send(value)
+        except StopIteration as e:
+            stack.pop()
+            value = e.value
+            continue
+        stack.append(subtask) #部分タスクの呼び出し
+        value = None
+    return value
+
 #==========
 # 補助クラス
 #==========
@@ -75,6 +121,8 @@ class Loggable:
            tags (str, list(str)) : タグ文字列またはタグ文字列のリスト．実装者と利用者により，各種の用途に用いることができる．
 
            kwargs (dict) : オプション引数の辞書．オブジェクトの属性`kwargs`に保持されて，実装者と利用者により，各種の用途に用いることができる．
+
+           dirty_ (bool) : 前回の配置以降に，自身または子孫が変更されたかを表すフラグ．生成直後は`True`．関数`mark_dirty()`で設定し，配置関数`_arrange()`の終了時に解除される．
     """
     _freeLID : int = 0 #loggable id (lid)
     
@@ -118,6 +166,9 @@ class Loggable:
         self.children_ = [] # 子のリスト
         self.ord_ = -1  # 子ID (親の子リスト中の自身の添字)．外部アクセスに必要．
         self.max_children_ = max_children # 子数の上限（>=0）．-1 means unbounded
+
+        ## 配置の更新管理
+        self.dirty_ = True  # 再配置が必要か？ 生成直後は未配置なので真
 		
         #タグ
         if tags != None:
@@ -166,15 +217,42 @@ class Loggable:
             self.repo(msg=f'@debug:fetch: {self.myinfo()}.fetch:'+
                       f' key={key} => {key in vars(self)}: against'+
                       f' vars={kw.extract(self.vars(), deleted=["children_"])}')
-        if key in vars(self) and (vars(self)[key] != None):
-            return vars(self)[key]
-        elif self.parent == None or not (isinstance(self.parent, Loggable)):
-            return default
-        else: ## assuming isinstance(self.parent, Loggable)
-            val_ = self.parent.fetch(key=key, default=default)
-            if verbose: self.repo(msg=f'@debug:fetch: {self.myinfo()}.fetch => val={val_}')
-            com.ensure(val_ != None, f'fetch: val={val_} must not be None!')
-            return val_
+        #先祖を根に向かって順に調べる
+        node = self 
+        while node != None and isinstance(node, Loggable):
+            val_ = vars(node).get(key)
+            if val_ != None:
+                if verbose: self.repo(msg=f'@debug:fetch: {self.myinfo()}.fetch => val={val_} at {node.myinfo()}')
+                return val_
+            node = node.parent
+        return default
+
+    #=====
+    # 更新管理
+    #=====
+
+    def mark_dirty(self) -> 'Loggable':
+        """自身を再配置が必要な状態（dirty）にし，根までの先祖すべてに伝播する．
+
+        Returns:
+             (Loggable) : 自分自身．(cascading style API)
+
+        Note: 
+             不変条件として，dirtyなノードの先祖は全てdirtyである．よって，既にdirtyなノードに達した時点で伝播を打ち切る．子の追加や形状の変更など，配置に影響する変更を行う関数から呼び出す．属性を直接書き換えた場合は，利用者が呼び出すこと．
+        """
+        node = self
+        while node != None and not node.dirty_:
+            node.dirty_ = True
+            node = node.parent
+        return self
+
+    def is_dirty(self) -> bool:
+        """前回の配置以降に，自身または子孫が変更されたかを返す．
+
+        Returns:
+             (bool) : 再配置が必要ならば`True`
+        """
+        return self.dirty_
 
     #exp 親子関係の管理
     def _register_child(self, child=None): 
@@ -201,7 +279,7 @@ class Loggable:
         return 
 
     def _adjust_depth(parent=None, child=None, verbose=None):
-        """再帰的に，属性`depth`を調整し，自分と全ての子孫に正しく深さを設定する．
+        """属性`depth`を調整し，自分と全ての子孫に正しく深さを設定する．再帰呼び出しは用いない．
         
         Args: 
                parent (Loggable) : 継ぎ木される親
@@ -224,16 +302,18 @@ class Loggable:
                     type(parent.depth) in (int, float)),
                    f'parent.depth must be valid!: it={ parent.depth }')
         
-        if child.depth == parent.depth + 1:
-            pass 
-        else: 
+        #深さが整合しないノードだけを，明示的なスタックで順に調整する
+        stack = [(parent, child)]
+        while stack:
+            parent1, child1 = stack.pop()
+            if child1.depth == parent1.depth + 1:
+                continue 
             #親から子へ深さを引き継ぐ
-            child.depth = parent.depth + 1
-            
-            #すべての子に対して，再帰的に処理を行う
-            for value in child.children():
-                _, child1 = value
-                Loggable._adjust_depth(parent=child, child=child1, verbose=verbose) 
+            child1.depth = parent1.depth + 1
+            #すべての子を検査する
+            for value in child1.children():
+                _, child2 = value
+                stack.append((child1, child2))
         return
 
     #=====
@@ -278,6 +358,7 @@ class Loggable:
         else:
             child.ord_ = len(self.children_)      #子ID
             self.children_.append(pair) #子リスト
+            self.mark_dirty()           #再配置が必要
             
         #ログ
         if self.verbose: self.repo(msg=f'=> added: {self.myinfo()}.put(): trans={trans} child={ child } with vars={ child.vars() }...')
@@ -325,6 +406,7 @@ class Loggable:
         
         child.ord_ = idx    #子ID
         self.children_[idx] = (trans, child) #子リスト. 上書きなので注意!
+        self.mark_dirty() #再配置が必要
             
         #ログ
         if self.verbose: self.repo(msg=f'overwrite =>{self.myinfo()}.set(): idx={idx} trans={trans} child={ child } with vars={ child.vars() }...')
@@ -441,16 +523,20 @@ class Loggable:
         Args: 
              B (Loggable) : ボードオブジェクトの根
         """
-        print(f'{ "| "*dep }{ self.myinfo()}\t'+
-              f' depth={ self.depth }'+f' ord_={ self.ord_ }'
-              f' verbose={ self.verbose }', end='', file=file)
-        if self.get_tags() != None: 
-            print(f' tags={self.get_tags()}', end='', file=file)
-            print('', file=file)
-        for idx, pair in self.children_enumerated():
-            trans, child = pair #分解
-            if isinstance(child, Loggable):
-                child.dump(dep=dep+1, file=file)
+        #前順に，明示的なスタックで走査する
+        stack = [(dep, self)]
+        while stack:
+            dep1, node = stack.pop()
+            print(f'{ "| "*dep1 }{ node.myinfo()}\t'+
+                  f' depth={ node.depth }'+f' ord_={ node.ord_ }'
+                  f' verbose={ node.verbose }', end='', file=file)
+            if node.get_tags() != None: 
+                print(f' tags={node.get_tags()}', end='', file=file)
+                print('', file=file)
+            _children = [ child for idx, (trans, child) in node.children_enumerated()
+                          if isinstance(child, Loggable) ]
+            for child in reversed(_children): #先頭の子から取り出す
+                stack.append((dep1+1, child))
         return
 
     pass 